@@ -3,13 +3,18 @@ import os
 from dotenv import load_dotenv
 import time
 
+# Load .env before the utilities read their settings from the environment
+load_dotenv()
+
 # Import utility functions
-from utils.init import init_session_state, load_custom_css, setup_page_config
-from utils.api import generate_html_with_ai, stream_html_with_ai
+from utils.init import init_session_state, load_custom_css, setup_page_config, get_session_id
+from utils.jobs import get_job_queue
+from utils.similarity import get_prompt_index
+from utils.api import get_concurrency_key, plan_variants, MAX_VARIANTS
 
 # Import components
 from components.sidebar import render_sidebar
-from components.editor import render_editor, render_ai_prompt
+from components.editor import render_editor, render_ai_prompt, render_generation_job, render_similar_offer, render_variant_jobs
 from components.deployment import render_deployment
 from components.remix import render_remix
 from components.settings import render_settings
@@ -34,19 +39,124 @@ if page == "Home":
     prompt = render_ai_prompt()
     
     # Handle AI generation
+    # Generations run as background jobs, so a rerun, navigation or refresh
+    # does not lose them; the job ID in the URL lets a refreshed page reconnect
+    job_queue = get_job_queue()
+    prompt_index = get_prompt_index()
+    new_prompt = None
+    use_cache = not st.session_state.bypass_cache
+    
     if st.session_state.is_generating and prompt:
-        with st.spinner("Generating HTML with AI..."):
-            # Generate HTML with AI
-            generated_html = generate_html_with_ai(prompt, st.session_state.api_key)
+        st.session_state.is_generating = False
+        st.session_state.similar_offer = None
+        
+        # Offer the result of a near-identical earlier prompt instead of calling the model
+        if st.session_state.generation_mode == "New site" and use_cache:
+            st.session_state.similar_offer = prompt_index.lookup(prompt, get_concurrency_key(st.session_state.api_key))
+        
+        if st.session_state.similar_offer is None:
+            new_prompt = prompt
+    
+    if st.session_state.similar_offer:
+        choice = render_similar_offer(st.session_state.similar_offer)
+        
+        if choice == "use":
+            prompt_index.record_choice(True)
+            st.session_state.html_content = st.session_state.similar_offer["html"]
+            st.session_state.similar_offer = None
+            st.rerun()
+        
+        elif choice == "fresh":
+            prompt_index.record_choice(False)
+            new_prompt = st.session_state.similar_offer["query"]
+            use_cache = False
+            st.session_state.similar_offer = None
+    
+    if new_prompt:
+        # A new request supersedes the jobs this page is showing
+        for job_id in [st.session_state.job_id] + st.session_state.variant_job_ids:
+            if job_id:
+                job_queue.cancel(job_id)
+        st.session_state.job_id = None
+        st.session_state.variant_job_ids = []
+        for param in ("job", "variants"):
+            if param in st.query_params:
+                del st.query_params[param]
+        
+        if st.session_state.generation_mode == "Variants":
+            # The candidates run concurrently; each has its own owner so that
+            # they do not supersede one another
+            st.session_state.variant_job_ids = [
+                job_queue.submit(
+                    "generate",
+                    new_prompt,
+                    st.session_state.api_key,
+                    owner=f"{get_session_id()}:variant-{i}",
+                    use_cache=use_cache,
+                    model=variant["model"],
+                    temperature=variant["temperature"]
+                )
+                for i, variant in enumerate(plan_variants(st.session_state.variant_count))
+            ]
+            st.query_params["variants"] = ",".join(st.session_state.variant_job_ids)
+        
+        else:
+            st.session_state.job_id = job_queue.submit(
+                "edit" if st.session_state.generation_mode == "Edit current page" else "generate",
+                new_prompt,
+                st.session_state.api_key,
+                owner=get_session_id(),
+                use_cache=use_cache,
+                current_html=st.session_state.html_content,
+                prompt_history=st.session_state.prompt_history[:-1]
+            )
+            st.query_params["job"] = st.session_state.job_id
+    
+    elif not st.session_state.job_id and not st.session_state.variant_job_ids:
+        if "job" in st.query_params:
+            st.session_state.job_id = st.query_params["job"]
+        elif "variants" in st.query_params:
+            st.session_state.variant_job_ids = st.query_params["variants"].split(",")[:MAX_VARIANTS]
+    
+    if st.session_state.variant_job_ids:
+        choice, job = render_variant_jobs(st.session_state.variant_job_ids)
+        
+        if choice is not None:
+            # Picking a candidate or discarding them all cancels the ones still running
+            for job_id in st.session_state.variant_job_ids:
+                job_queue.cancel(job_id)
+            st.session_state.variant_job_ids = []
+            if "variants" in st.query_params:
+                del st.query_params["variants"]
             
-            if generated_html:
-                st.session_state.html_content = generated_html
-                st.session_state.is_generating = False
-                st.success("HTML generated successfully!")
-                st.rerun()
-            else:
-                st.error("Failed to generate HTML with AI. Please check your API key and try again.")
-                st.session_state.is_generating = False
+            if choice == "use":
+                st.session_state.html_content = job["html"]
+            st.rerun()
+    
+    if st.session_state.job_id:
+        job = render_generation_job(st.session_state.job_id, stream=st.session_state.stream_generation)
+        
+        st.session_state.job_id = None
+        if "job" in st.query_params:
+            del st.query_params["job"]
+        
+        if job is None:
+            st.warning("The generation could not be found. It may have expired.")
+        
+        elif job["status"] == "done":
+            st.session_state.html_content = job["html"]
+            if job["kind"] == "generate":
+                st.session_state.last_first_token_time = job["ttft"]
+            st.rerun()
+        
+        elif job["status"] == "failed":
+            st.error(job["error"] or "Failed to generate HTML with AI. Please check your API key and try again.")
+        
+        elif job["status"] == "cancelled":
+            st.info("Generation cancelled.")
+        
+        elif job["status"] == "interrupted":
+            st.warning("The generation was interrupted by a server restart. Please try again.")
 
 elif page == "Settings":
     st.markdown("<h1 class='main-header'>Settings</h1>", unsafe_allow_html=True)
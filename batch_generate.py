@@ -0,0 +1,279 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+from dotenv import load_dotenv
+
+# Load .env before the utilities read their settings from the environment
+load_dotenv()
+
+from utils.api import (
+    OpenRouterError,
+    agenerate_completion,
+    build_request_data,
+    configure_engine,
+    extract_html,
+    is_retryable_error,
+    run_sync
+)
+from utils.project import save_project
+from utils.telemetry import percentile
+
+class TokenBucket:
+    """
+    An asyncio token bucket that limits the request rate.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """
+        Wait until a token is available and take it.
+        """
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def load_prompts(path):
+    """
+    Load prompts from a JSONL or CSV file.
+    
+    Each row needs a "prompt" and may have an "id" and a "name". Rows without
+    an id are identified by a hash of their prompt, so reruns resume cleanly.
+    
+    Args:
+        path (str): The path of the input file
+        
+    Returns:
+        list: A list of {"id", "name", "prompt"} dictionaries
+    """
+    rows = []
+    
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    
+    for index, record in enumerate(records):
+        prompt = (record.get("prompt") or "").strip()
+        if not prompt:
+            print(f"Skipping row {index + 1}: no prompt")
+            continue
+        
+        row_id = str(record.get("id") or hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12])
+        rows.append({
+            "id": row_id,
+            "name": record.get("name") or f"batch-{row_id}",
+            "prompt": prompt
+        })
+    
+    return rows
+
+def load_progress(path):
+    """
+    Load the IDs of rows that already completed successfully.
+    
+    Args:
+        path (str): The path of the progress file
+        
+    Returns:
+        set: The completed row IDs
+    """
+    done = set()
+    
+    if not os.path.exists(path):
+        return done
+    
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    
+    return done
+
+def is_retryable(error):
+    """
+    Check whether a failed generation should be retried.
+    
+    The generation engine already retries each request (OPENROUTER_RETRIES),
+    so only throttling, server errors and network failures that outlasted
+    those retries are tried again, after a longer backoff. Errors such as a
+    reply without HTML or a prompt that is too large are final.
+    """
+    if isinstance(error, OpenRouterError):
+        return error.status_code == 429 or error.status_code >= 500
+    return is_retryable_error(error)
+
+async def generate_row(row, args, bucket):
+    """
+    Generate and save one row, retrying transient failures.
+    
+    Args:
+        row (dict): The row to generate
+        args: The parsed command-line arguments
+        bucket (TokenBucket): The rate limiter
+        
+    Returns:
+        dict: The progress record for the row
+    """
+    attempts = 0
+    start = time.monotonic()
+    
+    while True:
+        attempts += 1
+        await bucket.acquire()
+        
+        try:
+            request_start = time.monotonic()
+            reply = await agenerate_completion(build_request_data(row["prompt"]), args.api_key, not args.no_cache)
+            latency = time.monotonic() - request_start
+            html_content = extract_html(reply)
+            
+            if not html_content:
+                raise ValueError("The model returned no HTML.")
+            
+            project_id = await asyncio.get_running_loop().run_in_executor(
+                None, save_project, row["name"], html_content, [row["prompt"]]
+            )
+            
+            return {
+                "id": row["id"],
+                "status": "ok",
+                "project_id": project_id,
+                "attempts": attempts,
+                "latency": latency,
+                "total_time": time.monotonic() - start,
+                "reply_chars": len(reply)
+            }
+        
+        except Exception as e:
+            if attempts > args.retries or not is_retryable(e):
+                return {
+                    "id": row["id"],
+                    "status": "failed",
+                    "attempts": attempts,
+                    "total_time": time.monotonic() - start,
+                    "error": str(e)
+                }
+            
+            # Exponential backoff with full jitter
+            await asyncio.sleep(random.uniform(0, args.backoff * 2 ** (attempts - 1)))
+
+async def run_batch(rows, args):
+    """
+    Run all rows through a pool of workers, appending results to the progress file.
+    
+    Args:
+        rows (list): The rows to generate
+        args: The parsed command-line arguments
+        
+    Returns:
+        list: The progress records of this run
+    """
+    queue = asyncio.Queue()
+    for row in rows:
+        queue.put_nowait(row)
+    
+    bucket = TokenBucket(args.rate, max(1.0, args.burst))
+    results = []
+    
+    with open(args.progress, "a", encoding="utf-8") as progress:
+        async def worker():
+            while not queue.empty():
+                row = queue.get_nowait()
+                record = await generate_row(row, args, bucket)
+                results.append(record)
+                progress.write(json.dumps(record) + "\n")
+                progress.flush()
+                
+                status = "OK" if record["status"] == "ok" else f"FAILED ({record['error']})"
+                print(f"[{len(results)}/{len(rows)}] {row['id']}: {status}")
+        
+        await asyncio.gather(*[worker() for _ in range(min(args.concurrency, len(rows)))])
+    
+    return results
+
+def print_summary(results, elapsed):
+    """
+    Print a throughput and latency summary of the run.
+    """
+    succeeded = [r for r in results if r["status"] == "ok"]
+    failed = [r for r in results if r["status"] != "ok"]
+    latencies = [r["latency"] for r in succeeded]
+    # Roughly 4 characters per token
+    tokens = sum(r["reply_chars"] for r in succeeded) / 4
+    
+    print("\nSummary:")
+    print(f"  Generated: {len(succeeded)}")
+    print(f"  Failed: {len(failed)}")
+    print(f"  Retries: {sum(r['attempts'] - 1 for r in results)}")
+    print(f"  Wall time: {elapsed:.1f}s")
+    print(f"  Throughput: {len(succeeded) / elapsed if elapsed else 0:.2f} sites/s")
+    print(f"  Latency p50: {percentile(latencies, 0.50):.2f}s")
+    print(f"  Latency p95: {percentile(latencies, 0.95):.2f}s")
+    print(f"  Output tokens/s (estimated): {tokens / elapsed if elapsed else 0:.1f}")
+
+def main():
+    """
+    Generate sites in bulk from a file of prompts.
+    """
+    parser = argparse.ArgumentParser(description="Generate sites in bulk from a JSONL or CSV file of prompts.")
+    parser.add_argument("input", help="JSONL or CSV file with a 'prompt' column and optional 'id' and 'name'")
+    parser.add_argument("--api-key", default=os.getenv("OPENROUTER_API_KEY", ""), help="OpenRouter API key (default: OPENROUTER_API_KEY)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel workers (default: 8)")
+    parser.add_argument("--rate", type=float, default=2.0, help="Maximum requests per second (default: 2)")
+    parser.add_argument("--burst", type=float, default=4.0, help="Token bucket capacity (default: 4)")
+    parser.add_argument("--retries", type=int, default=1, help="Retries per prompt for throttling, server and network errors, on top of the engine's OPENROUTER_RETRIES per request (default: 1)")
+    parser.add_argument("--backoff", type=float, default=1.0, help="Base backoff in seconds (default: 1)")
+    parser.add_argument("--progress", help="Progress file used to resume (default: <input>.progress.jsonl)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    
+    args = parser.parse_args()
+    args.progress = args.progress or f"{args.input}.progress.jsonl"
+    
+    if not args.api_key:
+        print("OpenRouter API key not set. Use --api-key or set OPENROUTER_API_KEY.")
+        return False
+    
+    rows = load_prompts(args.input)
+    done = load_progress(args.progress)
+    pending = [row for row in rows if row["id"] not in done]
+    
+    print(f"{len(rows)} prompts, {len(rows) - len(pending)} already done, {len(pending)} to generate.")
+    if not pending:
+        return True
+    
+    # Let every worker have a generation slot
+    configure_engine(max_concurrent=args.concurrency, max_per_key=args.concurrency)
+    
+    start = time.monotonic()
+    results = run_sync(run_batch(pending, args))
+    print_summary(results, time.monotonic() - start)
+    
+    return all(r["status"] == "ok" for r in results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
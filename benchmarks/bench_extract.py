@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import tracemalloc
+import argparse
+
+# Add the project root to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.api import HtmlExtractor, extract_html
+
+def build_reply(size):
+    """
+    Build a model reply of roughly the given size.
+    
+    Args:
+        size (int): The approximate size of the HTML body in characters
+        
+    Returns:
+        str: A reply with prose around a fenced HTML block
+    """
+    section = "<section class=\"card\">\n  <h2>Feature</h2>\n  <p>Fast, `responsive` and accessible.</p>\n</section>\n"
+    body = section * (size // len(section) + 1)
+    return f"Here is your website:\n\n```html\n<!DOCTYPE html>\n<html>\n<body>\n{body}</body>\n</html>\n```\n\nLet me know if you need changes."
+
+def split_chunks(reply, chunk_size):
+    """
+    Split a reply into streaming-sized chunks.
+    """
+    return [reply[i:i + chunk_size] for i in range(0, len(reply), chunk_size)]
+
+def bench_incremental(chunks):
+    """
+    Feed chunks through an HtmlExtractor.
+    
+    Returns:
+        tuple: The elapsed seconds and the extracted HTML
+    """
+    start = time.perf_counter()
+    extractor = HtmlExtractor()
+    parts = [extractor.feed(chunk) for chunk in chunks]
+    parts.append(extractor.close())
+    elapsed = time.perf_counter() - start
+    return elapsed, "".join(parts)
+
+def bench_rescan(chunks):
+    """
+    Re-extract from the accumulated reply after every chunk, as a preview that
+    used split-based extraction would have to.
+    
+    Returns:
+        float: The elapsed seconds
+    """
+    start = time.perf_counter()
+    reply = ""
+    for chunk in chunks:
+        reply += chunk
+        extract_html(reply)
+    return time.perf_counter() - start
+
+def drain(chunks):
+    """
+    Feed chunks through an HtmlExtractor, discarding the output.
+    """
+    extractor = HtmlExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+    extractor.close()
+
+def peak_memory(chunks):
+    """
+    Measure the peak working memory of the extractor in bytes.
+    """
+    tracemalloc.start()
+    drain(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+    """
+    Run the extractor benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark incremental HTML extraction from model replies.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 200_000, 400_000, 800_000], help="HTML body sizes in characters")
+    parser.add_argument("--chunk-size", type=int, default=24, help="Characters per streamed chunk (default: 24)")
+    parser.add_argument("--rescan", action="store_true", help="Also time re-extracting the accumulated reply after every chunk")
+    args = parser.parse_args()
+    
+    print(f"{'size':>10} {'chunks':>8} {'time (ms)':>10} {'MB/s':>8} {'ns/char':>8} {'peak KB':>9}" + (f" {'rescan (ms)':>12}" if args.rescan else ""))
+    
+    for size in args.sizes:
+        reply = build_reply(size)
+        chunks = split_chunks(reply, args.chunk_size)
+        
+        elapsed, html = bench_incremental(chunks)
+        assert html == extract_html(reply), "incremental and whole-reply extraction differ"
+        
+        peak = peak_memory(chunks)
+        
+        line = f"{len(reply):>10} {len(chunks):>8} {elapsed * 1000:>10.2f} {len(reply) / elapsed / 1e6:>8.1f} {elapsed / len(reply) * 1e9:>8.1f} {peak / 1024:>9.1f}"
+        if args.rescan:
+            line += f" {bench_rescan(chunks) * 1000:>12.2f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Add the project root and this directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import utils.api as api
+from utils.telemetry import percentile
+from mock_openrouter import start_mock_server, add_settings_arguments, settings_from_args
+
+def run_generate(prompt, api_key):
+    """
+    Run one blocking generation.
+    
+    Returns:
+        dict: The outcome, latency and HTML size
+    """
+    start = time.perf_counter()
+    html = api.generate_html_with_ai(prompt, api_key, use_cache=False)
+    latency = time.perf_counter() - start
+    return {"ok": bool(html), "latency": latency, "ttft": None, "chars": len(html or "")}
+
+def run_stream(prompt, api_key):
+    """
+    Run one streamed generation, consuming every chunk.
+    
+    Returns:
+        dict: The outcome, latency, time to first chunk and reply size
+    """
+    start = time.perf_counter()
+    ttft = None
+    chars = 0
+    
+    for chunk in api.stream_html_with_ai(prompt, api_key, use_cache=False):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        chars += len(chunk)
+    
+    latency = time.perf_counter() - start
+    return {"ok": chars > 0, "latency": latency, "ttft": ttft, "chars": chars}
+
+def peak_rss_mb():
+    """
+    Get the peak resident set size of the process in MB, if available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_level(mode, concurrency, requests_per_level, api_key, stable=False):
+    """
+    Run a batch of generations at a fixed concurrency.
+    
+    Each prompt is unique so that neither the response cache nor request
+    coalescing serves a reply without an upstream call.
+    
+    Args:
+        stable (bool): Whether the prompts are the same in every run, so that
+            a cassette replay matches each request to its own recording
+            
+    Returns:
+        tuple: The list of results and the elapsed seconds
+    """
+    run = run_stream if mode == "stream" else run_generate
+    run_id = "" if stable else f" {time.time_ns()}"
+    prompts = [f"Benchmark site {mode} {concurrency}-{i}{run_id}" for i in range(requests_per_level)]
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda prompt: run(prompt, api_key), prompts))
+    return results, time.perf_counter() - start
+
+def main():
+    """
+    Run the generation load benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark generate_html_with_ai and stream_html_with_ai at increasing concurrency.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="Concurrency levels (default: 1 4 16 64)")
+    parser.add_argument("--requests", type=int, default=0, help="Generations per level (default: 4 x concurrency, at least 8)")
+    parser.add_argument("--mode", choices=["generate", "stream", "both"], default="both", help="Which entry point to drive (default: both)")
+    parser.add_argument("--base-url", help="Use an already running API instead of an in-process mock server")
+    parser.add_argument("--cassette", help="Replay the responses recorded in this cassette instead of calling any server; requests that were not recorded fail")
+    parser.add_argument("--record", action="store_true", help="Record the responses of the server into --cassette")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Cassette replay speed, 0 for no delays (default: 1)")
+    parser.add_argument("--api-key", default=os.getenv("OPENROUTER_API_KEY", "mock-key"), help="API key sent to the server")
+    parser.add_argument("--max-per-key", type=int, help="Engine limit per API key (default: the highest concurrency level; the app uses 4)")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also report peak traced Python allocations (slows the run)")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+    
+    # st.error() outside a Streamlit run only logs a warning per call
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    
+    if args.record and not args.cassette:
+        parser.error("--record needs --cassette")
+    
+    server = None
+    cassette = None
+    # Replays are strict: each request gets its own recording or fails, so
+    # responses never pair with other requests in a nondeterministic order
+    if args.cassette and not args.record:
+        cassette = api.use_cassette(args.cassette, "replay", args.replay_speed, strict=True)
+    elif args.base_url:
+        api.OPENROUTER_API_BASE = args.base_url.rstrip("/")
+    else:
+        server = start_mock_server(settings=settings_from_args(args))
+        api.OPENROUTER_API_BASE = server.base_url
+    
+    if args.record:
+        cassette = api.use_cassette(args.cassette, "record")
+    
+    highest = max(args.concurrency)
+    api.configure_engine(max_concurrent=highest, max_per_key=args.max_per_key or highest)
+    
+    modes = ["generate", "stream"] if args.mode == "both" else [args.mode]
+    print(f"API: {api.OPENROUTER_API_BASE}" if cassette is None or args.record else f"Cassette: {args.cassette} ({f'{args.replay_speed:g}x speed' if args.replay_speed > 0 else 'no delays'})")
+    print(f"{'mode':>9} {'conc':>5} {'reqs':>5} {'ok':>5} {'req/s':>7} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'ttft p50':>9} {'KB/s':>8} {'rss MB':>7}" + (f" {'heap MB':>8}" if args.tracemalloc else ""))
+    
+    for mode in modes:
+        for concurrency in args.concurrency:
+            requests_per_level = args.requests or max(8, 4 * concurrency)
+            
+            if args.tracemalloc:
+                tracemalloc.start()
+            
+            results, elapsed = run_level(mode, concurrency, requests_per_level, args.api_key, stable=bool(args.cassette))
+            
+            heap = None
+            if args.tracemalloc:
+                heap = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+            
+            succeeded = [r for r in results if r["ok"]]
+            latencies = [r["latency"] for r in succeeded]
+            ttfts = [r["ttft"] for r in succeeded if r["ttft"] is not None]
+            rss = peak_rss_mb()
+            
+            line = (
+                f"{mode:>9} {concurrency:>5} {len(results):>5} {len(succeeded):>5} "
+                f"{len(succeeded) / elapsed:>7.2f} "
+                f"{percentile(latencies, 0.50):>8.3f} {percentile(latencies, 0.95):>8.3f} {percentile(latencies, 0.99):>8.3f} "
+                f"{(f'{percentile(ttfts, 0.50):.3f}' if ttfts else '-'):>9} "
+                f"{sum(r['chars'] for r in succeeded) / elapsed / 1024:>8.1f} "
+                f"{(f'{rss:.1f}' if rss is not None else '-'):>7}"
+            )
+            if heap is not None:
+                line += f" {heap:>8.1f}"
+            print(line)
+    
+    if cassette is not None:
+        stats = cassette.info()
+        print(f"\nCassette: {stats['recorded']} recorded, {stats['replayed']} replayed ({stats['exact']} exact matches), {stats['missed']} missed")
+    
+    if server is not None:
+        stats = server.settings.stats
+        print(f"\nMock server: {stats['requests']} requests, {stats['errors']} injected errors, {stats['disconnects']} disconnects, peak {stats['peak_active']} concurrent")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
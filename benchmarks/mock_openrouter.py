@@ -0,0 +1,272 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Roughly 4 characters per token
+CHARS_PER_TOKEN = 4
+
+MOCK_MODELS = ["x-ai/grok-3-mini-beta", "mock/fast", "mock/slow"]
+
+class MockSettings:
+    """
+    Behaviour of the mock server.
+    
+    Args:
+        ttft (float): Seconds before the first token
+        tokens_per_second (float): Output speed once the first token is sent
+        chunk_tokens (int): Tokens per streamed event
+        html_size (int): Approximate size of the generated HTML in characters
+        error_rate (float): Fraction of requests answered with error_status
+        error_status (int): HTTP status of injected errors
+        disconnect_rate (float): Fraction of streams cut off halfway
+        seed (int, optional): Seed for the error injection
+    """
+    def __init__(self, ttft=0.2, tokens_per_second=1000, chunk_tokens=4, html_size=4000,
+                 error_rate=0.0, error_status=503, disconnect_rate=0.0, seed=None):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.html_size = html_size
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.disconnect_rate = disconnect_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "streams": 0, "errors": 0, "disconnects": 0, "active": 0, "peak_active": 0}
+    
+    def roll(self, rate):
+        """
+        Decide whether an injected failure happens.
+        """
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+def build_reply(prompt, size):
+    """
+    Build a model reply with a fenced HTML document of roughly the given size.
+    
+    Args:
+        prompt (str): The user prompt, echoed into the page title
+        size (int): The approximate size of the HTML in characters
+        
+    Returns:
+        str: The reply
+    """
+    section = "    <section class=\"card\">\n      <h2>Feature</h2>\n      <p>Fast, responsive and accessible.</p>\n    </section>\n"
+    title = prompt[:60].replace("<", "").replace(">", "").replace("\n", " ")
+    body = section * max(1, size // len(section))
+    return f"Here is your website:\n\n```html\n<!DOCTYPE html>\n<html>\n<head>\n  <title>{title}</title>\n</head>\n<body>\n{body}</body>\n</html>\n```\n\nLet me know if you need changes."
+
+class MockOpenRouterHandler(BaseHTTPRequestHandler):
+    """
+    Request handler for the OpenRouter endpoints used by the application.
+    """
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+    
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_error_json(self, status, message):
+        self.send_json(status, {"error": {"code": status, "message": message}})
+    
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+    
+    def do_GET(self):
+        if self.path.rstrip("/") != "/api/v1/models":
+            self.send_error_json(404, "Not found")
+            return
+        self.send_json(200, {"data": [{"id": model, "name": model} for model in MOCK_MODELS]})
+    
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/v1/chat/completions":
+            self.send_error_json(404, "Not found")
+            return
+        
+        settings = self.server.settings
+        length = int(self.headers.get("Content-Length", 0))
+        
+        try:
+            data = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_error_json(400, "Invalid JSON")
+            return
+        
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self.send_error_json(401, "No auth credentials found")
+            return
+        
+        with settings.lock:
+            settings.stats["requests"] += 1
+            settings.stats["active"] += 1
+            settings.stats["peak_active"] = max(settings.stats["peak_active"], settings.stats["active"])
+        
+        try:
+            if settings.roll(settings.error_rate):
+                with settings.lock:
+                    settings.stats["errors"] += 1
+                time.sleep(settings.ttft)
+                self.send_error_json(settings.error_status, "Injected error")
+                return
+            
+            prompt = data.get("messages", [{}])[-1].get("content", "")
+            reply = build_reply(prompt, settings.html_size)
+            
+            if data.get("stream"):
+                self.stream_reply(data, reply)
+            else:
+                self.send_reply(data, reply)
+        
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        
+        finally:
+            with settings.lock:
+                settings.stats["active"] -= 1
+    
+    def send_reply(self, data, reply):
+        settings = self.server.settings
+        completion_tokens = len(reply) // CHARS_PER_TOKEN
+        time.sleep(settings.ttft + completion_tokens / settings.tokens_per_second)
+        
+        self.send_json(200, {
+            "id": "mock-completion",
+            "model": data.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(json.dumps(data.get("messages", []))) // CHARS_PER_TOKEN, "completion_tokens": completion_tokens}
+        })
+    
+    def stream_reply(self, data, reply):
+        settings = self.server.settings
+        chunk_size = max(1, settings.chunk_tokens * CHARS_PER_TOKEN)
+        interval = settings.chunk_tokens / settings.tokens_per_second
+        cutoff = len(reply) // 2 if settings.roll(settings.disconnect_rate) else None
+        
+        with settings.lock:
+            settings.stats["streams"] += 1
+        
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        # OpenRouter sends keep-alive comments while the model is queued
+        self.write_chunk(b": OPENROUTER PROCESSING\n\n")
+        time.sleep(settings.ttft)
+        
+        for start in range(0, len(reply), chunk_size):
+            if cutoff is not None and start >= cutoff:
+                with settings.lock:
+                    settings.stats["disconnects"] += 1
+                self.close_connection = True
+                return
+            event = {"model": data.get("model"), "choices": [{"index": 0, "delta": {"content": reply[start:start + chunk_size]}}]}
+            self.write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            time.sleep(interval)
+        
+        if data.get("usage", {}).get("include"):
+            usage = {"prompt_tokens": len(json.dumps(data.get("messages", []))) // CHARS_PER_TOKEN, "completion_tokens": len(reply) // CHARS_PER_TOKEN}
+            self.write_chunk(f"data: {json.dumps({'model': data.get('model'), 'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+        
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+class MockOpenRouterServer(ThreadingHTTPServer):
+    """
+    A threaded HTTP server that ignores clients closing pooled connections.
+    """
+    daemon_threads = True
+    
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+def start_mock_server(host="127.0.0.1", port=0, settings=None, verbose=False):
+    """
+    Start the mock server on a background thread.
+    
+    Args:
+        host (str): The interface to listen on
+        port (int): The port to listen on, 0 for any free port
+        settings (MockSettings, optional): The server behaviour
+        verbose (bool): Whether to log every request
+        
+    Returns:
+        MockOpenRouterServer: The running server; its base_url attribute is the API base URL
+    """
+    server = MockOpenRouterServer((host, port), MockOpenRouterHandler)
+    server.settings = settings or MockSettings()
+    server.verbose = verbose
+    server.base_url = f"http://{host}:{server.server_address[1]}/api/v1"
+    
+    thread = threading.Thread(target=server.serve_forever, name="mock-openrouter", daemon=True)
+    thread.start()
+    return server
+
+def add_settings_arguments(parser):
+    """
+    Add the mock server behaviour options to an argument parser.
+    """
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token (default: 0.2)")
+    parser.add_argument("--tokens-per-second", type=float, default=1000, help="Output speed in tokens per second (default: 1000)")
+    parser.add_argument("--chunk-tokens", type=int, default=4, help="Tokens per streamed event (default: 4)")
+    parser.add_argument("--html-size", type=int, default=4000, help="Approximate HTML size in characters (default: 4000)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail (default: 0)")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected errors (default: 503)")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Fraction of streams cut off halfway (default: 0)")
+    parser.add_argument("--seed", type=int, help="Seed for error injection")
+
+def settings_from_args(args):
+    """
+    Build MockSettings from parsed add_settings_arguments() options.
+    """
+    return MockSettings(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        chunk_tokens=args.chunk_tokens,
+        html_size=args.html_size,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        disconnect_rate=args.disconnect_rate,
+        seed=args.seed
+    )
+
+def main():
+    """
+    Run the mock server in the foreground.
+    """
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the OpenRouter API.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+    
+    server = start_mock_server(args.host, args.port, settings_from_args(args), args.verbose)
+    print(f"Mock OpenRouter API listening on {server.base_url}")
+    print(f"Run the app against it with: OPENROUTER_API_BASE={server.base_url}")
+    
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\nServed: {json.dumps(server.settings.stats)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,18 @@
+import time
 import streamlit as st
 from utils.monaco import create_monaco_editor_with_preview
+from utils.api import HtmlExtractor, MAX_VARIANTS
+from utils.jobs import get_job_queue, ACTIVE_STATUSES
+
+# Minimum number of seconds between live code view and preview refreshes while streaming
+CODE_REFRESH_INTERVAL = 0.1
+PREVIEW_REFRESH_INTERVAL = 0.5
+
+# Seconds between checks of the candidates of a variants generation
+VARIANT_POLL_INTERVAL = 0.25
+
+# Generation modes offered on the Home page
+GENERATION_MODES = ["New site", "Edit current page", "Variants"]
 
 def render_editor():
     """
@@ -49,8 +62,43 @@ def render_ai_prompt():
     """
     st.markdown("<h2 class='sub-header'>AI Assistant</h2>", unsafe_allow_html=True)
     
+    st.session_state.generation_mode = st.radio(
+        "Mode",
+        GENERATION_MODES,
+        index=GENERATION_MODES.index(st.session_state.generation_mode),
+        horizontal=True,
+        key="generation_mode_radio",
+        help="Edit the current page sends only the requested change and applies it as a patch. "
+             "Variants generates several new sites at once, with different models and temperatures, to pick from."
+    )
+    
+    if st.session_state.generation_mode == "Variants":
+        st.session_state.variant_count = st.slider(
+            "Candidates",
+            min_value=2,
+            max_value=MAX_VARIANTS,
+            value=st.session_state.variant_count,
+            key="variant_count_slider"
+        )
+    
     prompt = st.text_area("Enter your prompt for the AI", height=100)
     
+    st.session_state.stream_generation = st.checkbox(
+        "Stream output live",
+        value=st.session_state.stream_generation,
+        key="stream_generation_checkbox"
+    )
+    
+    st.session_state.bypass_cache = st.checkbox(
+        "Bypass response cache",
+        value=st.session_state.bypass_cache,
+        key="bypass_cache_checkbox",
+        help="Always call the model, even if an identical prompt was answered before."
+    )
+    
+    if st.session_state.get("last_first_token_time") is not None:
+        st.caption(f"Last streamed generation: first token after {st.session_state.last_first_token_time:.2f}s")
+    
     if st.button("Generate with AI") and prompt:
         if not st.session_state.api_key:
             st.error("Please enter your OpenRouter API key in the sidebar.")
@@ -58,4 +106,247 @@ def render_ai_prompt():
             st.session_state.is_generating = True
             st.session_state.prompt_history.append(prompt)
     
-    return prompt 
\ No newline at end of file
+    return prompt
+
+def render_generation_stream(chunks):
+    """
+    Render a streamed generation into a live code view and preview.
+    
+    Chunks are passed through an incremental HtmlExtractor so that only HTML
+    reaches the views. The code view is refreshed at most every
+    CODE_REFRESH_INTERVAL seconds and the preview iframe at most every
+    PREVIEW_REFRESH_INTERVAL seconds.
+    
+    Args:
+        chunks (iterable): The chunks of the model reply
+        
+    Returns:
+        tuple: The extracted HTML content (or None if nothing was received) and
+            the time to first token in seconds (or None)
+    """
+    st.markdown("<div style='font-size: 1.2rem; font-weight: 600; margin-bottom: 0.5rem;'>Live Generation</div>", unsafe_allow_html=True)
+    status = st.empty()
+    col1, col2 = st.columns([5, 7], gap="large")
+    
+    with col1:
+        code_placeholder = st.empty()
+    
+    with col2:
+        preview_placeholder = st.empty()
+    
+    status.caption("Waiting for the first token...")
+    
+    extractor = HtmlExtractor()
+    start_time = time.monotonic()
+    first_token_time = None
+    last_code_refresh = 0.0
+    last_preview_refresh = 0.0
+    received = False
+    parts = []
+    
+    for chunk in chunks:
+        if not chunk:
+            continue
+        
+        now = time.monotonic()
+        if first_token_time is None:
+            first_token_time = now - start_time
+            status.caption(f"First token after {first_token_time:.2f}s, streaming...")
+        received = True
+        
+        html = extractor.feed(chunk)
+        if not html:
+            continue
+        parts.append(html)
+        
+        if now - last_code_refresh >= CODE_REFRESH_INTERVAL:
+            code_placeholder.code("".join(parts), language="html")
+            last_code_refresh = now
+        
+        if now - last_preview_refresh >= PREVIEW_REFRESH_INTERVAL:
+            with preview_placeholder.container():
+                st.components.v1.html("".join(parts), height=500, scrolling=True)
+            last_preview_refresh = now
+    
+    if not received:
+        status.empty()
+        return None, None
+    
+    parts.append(extractor.close())
+    html_content = "".join(parts)
+    code_placeholder.code(html_content, language="html")
+    with preview_placeholder.container():
+        st.components.v1.html(html_content, height=500, scrolling=True)
+    
+    total_time = time.monotonic() - start_time
+    status.caption(f"First token after {first_token_time:.2f}s, completed in {total_time:.2f}s.")
+    
+    return html_content, first_token_time
+
+def render_generation_progress():
+    """
+    Render a status line for a blocking generation.
+    
+    Returns:
+        callable: A poll function for run_sync() that updates the elapsed time.
+            Because it updates an element, a rerun or navigation interrupts
+            the wait, which lets the generation be cancelled.
+    """
+    status = st.empty()
+    start_time = time.monotonic()
+    
+    def poll():
+        status.caption(f"Waiting for the model... {time.monotonic() - start_time:.0f}s")
+    
+    return poll
+
+def render_generation_job(job_id, stream=True):
+    """
+    Render a background generation job until it is finished.
+    
+    The job keeps running if this script run is interrupted; the next run
+    picks it up again by its ID.
+    
+    Args:
+        job_id (str): The job ID
+        stream (bool): Whether to show the reply live or only a status line
+        
+    Returns:
+        dict: The job (see Job.to_dict()) or None if it does not exist
+    """
+    job_queue = get_job_queue()
+    job = job_queue.get(job_id)
+    
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        return job
+    
+    if st.button("Cancel generation", key="cancel_generation_button"):
+        job_queue.cancel(job_id)
+    
+    if stream and job["kind"] == "generate":
+        render_generation_stream(job_queue.follow(job_id))
+    else:
+        with st.spinner("Editing HTML with AI..." if job["kind"] == "edit" else "Generating HTML with AI..."):
+            job_queue.wait(job_id, poll=render_generation_progress())
+    
+    return job_queue.get(job_id)
+
+def render_similar_offer(offer):
+    """
+    Offer the previous generation of a near-identical prompt.
+    
+    Args:
+        offer (dict): The match returned by PromptIndex.lookup()
+        
+    Returns:
+        str: "use" to take the previous generation, "fresh" to generate
+            anyway, or None if the user has not decided yet
+    """
+    st.info(f"A very similar prompt was generated before ({offer['similarity']:.0%} similar): \"{offer['prompt']}\"")
+    
+    with st.expander("Preview the previous generation"):
+        st.components.v1.html(offer["html"], height=400, scrolling=True)
+    
+    col1, col2 = st.columns(2)
+    
+    if col1.button("Use previous result", key="use_similar_button"):
+        return "use"
+    
+    if col2.button("Generate fresh", key="generate_fresh_button"):
+        return "fresh"
+    
+    return None
+
+def render_variant_jobs(job_ids):
+    """
+    Render the candidates of a variants generation as they finish.
+    
+    The candidates run concurrently; each preview is shown as soon as its
+    job is done, without waiting for the others. Every check updates the
+    status line, so a click on a button interrupts the wait.
+    
+    Args:
+        job_ids (list): The job IDs of the candidates
+        
+    Returns:
+        tuple: ("use", job) for the picked candidate, ("discard", None) if the
+            candidates were dismissed, or (None, None) if the user has not
+            decided yet
+    """
+    job_queue = get_job_queue()
+    
+    st.markdown("<div style='font-size: 1.2rem; font-weight: 600; margin-bottom: 0.5rem;'>Candidates</div>", unsafe_allow_html=True)
+    col1, col2 = st.columns(2)
+    
+    if col1.button("Cancel remaining", key="cancel_variants_button"):
+        for job_id in job_ids:
+            job_queue.cancel(job_id)
+    
+    if col2.button("Discard candidates", key="discard_variants_button"):
+        return "discard", None
+    
+    status = st.empty()
+    columns = st.columns(2, gap="large")
+    placeholders = []
+    for i, job_id in enumerate(job_ids):
+        with columns[i % 2]:
+            placeholders.append(st.empty())
+    
+    shown = set()
+    start_time = time.monotonic()
+    
+    while True:
+        jobs = [job_queue.get(job_id) for job_id in job_ids]
+        
+        for i, job in enumerate(jobs):
+            if i in shown:
+                continue
+            
+            with placeholders[i].container():
+                if job is not None and job["status"] in ACTIVE_STATUSES:
+                    st.markdown(f"**Candidate {i + 1}**")
+                    st.caption(f"{job['model']}, temperature {job['temperature']}: generating...")
+                    continue
+                
+                shown.add(i)
+                if render_variant_candidate(i, job):
+                    return "use", job
+        
+        ready = sum(1 for job in jobs if job is not None and job["status"] == "done")
+        active = sum(1 for job in jobs if job is not None and job["status"] in ACTIVE_STATUSES)
+        
+        if not active:
+            status.caption(f"{ready} of {len(job_ids)} candidates ready. Pick one to open it in the editor.")
+            return None, None
+        
+        status.caption(f"{ready} of {len(job_ids)} candidates ready, {active} still generating... {time.monotonic() - start_time:.0f}s")
+        time.sleep(VARIANT_POLL_INTERVAL)
+
+def render_variant_candidate(index, job):
+    """
+    Render a finished candidate of a variants generation.
+    
+    Args:
+        index (int): The position of the candidate
+        job (dict): The job (see Job.to_dict()) or None if it expired
+        
+    Returns:
+        bool: True if the user picked this candidate
+    """
+    st.markdown(f"**Candidate {index + 1}**")
+    
+    if job is None:
+        st.warning("This candidate could not be found. It may have expired.")
+        return False
+    
+    if job["status"] == "failed":
+        st.error(job["error"] or "Failed to generate HTML with AI.")
+        return False
+    
+    if job["status"] != "done":
+        st.info("Cancelled." if job["status"] == "cancelled" else "Interrupted by a server restart.")
+        return False
+    
+    st.caption(f"{job['model']}, temperature {job['temperature']}, ready after {job['finished_at'] - job['created_at']:.1f}s")
+    st.components.v1.html(job["html"], height=400, scrolling=True)
+    return st.button(f"Use candidate {index + 1}", key=f"use_variant_{job['id']}")
@@ -1,5 +1,26 @@
+import os
+import re
+import time
+import datetime
+import tempfile
 import streamlit as st
-from utils.project import list_projects, load_project, delete_project
+from utils.project import PROJECTS_DIR, list_projects, search_projects, load_project, delete_project, add_project, get_project_store
+from utils.archive import export_projects, import_projects, project_zip
+from utils.search import escape_markdown, snippet_markdown
+
+# Archive formats offered for exports, with their file extensions
+EXPORT_FORMATS = {"zip": "zip", "tar.gz": "tar.gz", "tar": "tar"}
+
+# Library exports are written here and deleted once they are offered for
+# download; files left behind by an interrupted run go after EXPORT_RETENTION seconds
+EXPORTS_DIR = os.path.join(PROJECTS_DIR, ".cache", "exports")
+EXPORT_RETENTION = 3600
+
+# Projects shown per page; only the visible page is rendered
+PROJECTS_PAGE_SIZE = 20
+
+# Orders offered on the Projects page, by label (see utils.project.PROJECT_SORTS)
+PROJECT_SORT_OPTIONS = {"Last updated": "updated", "Date created": "created", "Name": "name", "Size": "size"}
 
 def render_projects():
     """
@@ -7,42 +28,205 @@ def render_projects():
     """
     st.markdown("<h2 class='sub-header'>Your Projects</h2>", unsafe_allow_html=True)
     
-    # Get all projects
-    projects = list_projects()
+    # Search and order; search results are ranked by relevance
+    col1, col2 = st.columns([3, 1])
+    query = col1.text_input("Search projects", key="projects_query", placeholder="Name, prompt or page text").strip()
+    sort = PROJECT_SORT_OPTIONS[col2.selectbox("Sort by", list(PROJECT_SORT_OPTIONS), key="projects_sort", disabled=bool(query))]
+    
+    # Start from the first page when the search or order changes
+    if st.session_state.projects_view != (query, sort):
+        st.session_state.projects_view = (query, sort)
+        st.session_state.projects_page = 0
+    
+    # Get the visible page of projects
+    projects = load_projects_page(query, sort)
+    
+    if not projects and projects.total:
+        # The page is past the end, e.g. after deleting its last project
+        st.session_state.projects_page = (projects.total - 1) // PROJECTS_PAGE_SIZE
+        projects = load_projects_page(query, sort)
+    
+    if not projects.total:
+        if query:
+            st.info(f"No projects match '{escape_markdown(query)}'.")
+        else:
+            st.info("You don't have any projects yet.")
+        render_library_transfer(query, projects.total)
+        return
+    
+    # Display the page of projects
+    col1, col2, col3 = st.columns([4, 2, 2])
+    col1.markdown("**Name**")
+    col2.markdown("**Last updated**")
+    col3.markdown("**Actions**")
+    
+    for project in projects:
+        render_project_row(project)
+    
+    render_pagination(projects)
+    render_library_transfer(query, projects.total)
+
+def load_projects_page(query, sort):
+    """
+    Get the current page of the project list or of the search results.
     
-    if not projects:
-        st.info("You don't have any projects yet.")
-    else:
-        # Display projects in a table
-        st.markdown("<table class='projects-table'>", unsafe_allow_html=True)
-        st.markdown("<tr><th>Name</th><th>Created</th><th>Actions</th></tr>", unsafe_allow_html=True)
+    Args:
+        query (str): The search, or an empty string to list every project
+        sort (str): The order of the project list
         
-        for project in projects:
-            st.markdown(f"<tr>", unsafe_allow_html=True)
-            st.markdown(f"<td>{project['name']}</td>", unsafe_allow_html=True)
-            st.markdown(f"<td>{project['created_at']}</td>", unsafe_allow_html=True)
-            st.markdown(f"<td>", unsafe_allow_html=True)
+    Returns:
+        ProjectPage: The projects on the page
+    """
+    offset = st.session_state.projects_page * PROJECTS_PAGE_SIZE
+    
+    if query:
+        return search_projects(query, offset, PROJECTS_PAGE_SIZE)
+    return list_projects(offset, PROJECTS_PAGE_SIZE, sort)
+
+def render_project_row(project):
+    """
+    Render one project of the Projects page.
+    
+    Args:
+        project (dict): The project metadata or search result
+    """
+    col1, col2, col3, col4, col5 = st.columns([4, 2, 1, 1, 1])
+    col1.markdown(escape_markdown(project["name"]))
+    if project.get("snippet"):
+        col1.caption(snippet_markdown(project["snippet"]))
+    col2.markdown(project["updated_at"][:16].replace("T", " "))
+    
+    with col3:
+        if st.button("Load", key=f"load-{project['id']}"):
+            project_data = load_project(project["id"])
             
-            col1, col2 = st.columns(2)
+            if project_data:
+                st.session_state.html_content = project_data["html_content"]
+                st.session_state.prompt_history = project_data["prompt_history"]
+                st.session_state.current_project = project["id"]
+                st.success(f"Project '{escape_markdown(project_data['name'])}' loaded successfully!")
+                st.rerun()
+            else:
+                st.error(f"Failed to load project '{escape_markdown(project['name'])}'.")
+    
+    with col4:
+        # The zip is only built when asked for, then offered for download
+        zip_state = st.session_state.project_zip
+        if zip_state and zip_state["id"] == project["id"]:
+            st.download_button("Download", zip_state["data"], file_name=zip_state["file_name"], mime="application/zip", key=f"download-{project['id']}")
+        elif st.button("Zip", key=f"zip-{project['id']}"):
+            project_data = load_project(project["id"])
             
-            with col1:
-                if st.button("Load", key=f"load-{project['id']}"):
-                    project_name, html_content, prompt_history = load_project(project['id'])
+            if project_data:
+                file_name = re.sub(r"[^\w-]+", "-", project_data["name"]).strip("-") or "project"
+                st.session_state.project_zip = {"id": project["id"], "file_name": f"{file_name}.zip", "data": project_zip(project_data)}
+                st.rerun()
+            else:
+                st.error(f"Failed to load project '{escape_markdown(project['name'])}'.")
+    
+    with col5:
+        if st.button("Delete", key=f"delete-{project['id']}"):
+            if delete_project(project["id"]):
+                st.success(f"Project '{escape_markdown(project['name'])}' deleted successfully!")
+                st.rerun()
+
+def render_pagination(projects):
+    """
+    Render the page navigation below the project list.
+    
+    Args:
+        projects (ProjectPage): The visible page of projects
+    """
+    page_count = (projects.total + PROJECTS_PAGE_SIZE - 1) // PROJECTS_PAGE_SIZE
+    page_number = st.session_state.projects_page
+    
+    col1, col2, col3 = st.columns([1, 4, 1])
+    
+    with col1:
+        if st.button("Previous", key="projects_previous", disabled=page_number == 0):
+            st.session_state.projects_page = page_number - 1
+            st.rerun()
+    
+    col2.caption(f"Projects {projects.offset + 1}-{projects.offset + len(projects)} of {projects.total} (page {page_number + 1} of {page_count})")
+    
+    with col3:
+        if st.button("Next", key="projects_next", disabled=page_number + 1 >= page_count):
+            st.session_state.projects_page = page_number + 1
+            st.rerun()
+
+def render_library_transfer(query, total):
+    """
+    Render the export and import of project archives.
+    
+    Args:
+        query (str): The current search; only matching projects are exported
+        total (int): The number of projects listed
+    """
+    with st.expander("Export and import"):
+        col1, col2 = st.columns([1, 3])
+        archive_type = col1.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+        label = f"Export {total} matching projects" if query else f"Export all {total} projects"
+        
+        with col2:
+            if st.button(label, key="export_button", disabled=not total):
+                project_ids = [result["id"] for result in search_projects(query, 0, total)] if query else None
+                progress = st.progress(0.0, text="Exporting projects...")
+                
+                def report_export(done, count):
+                    progress.progress(done / count, text=f"Exported {done} of {count} projects")
+                
+                prune_exports()
+                
+                # Projects are streamed into a file one at a time. Streamlit reads
+                # the file into memory when the download button is rendered, so the
+                # button is rendered once, in this run, and the file is deleted after
+                os.makedirs(EXPORTS_DIR, exist_ok=True)
+                fd, path = tempfile.mkstemp(suffix=f".{EXPORT_FORMATS[archive_type]}", dir=EXPORTS_DIR)
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        stats = export_projects(get_project_store(), f, archive_type, project_ids, progress=report_export)
+                    size = os.path.getsize(path)
                     
-                    if project_name and html_content and prompt_history:
-                        st.session_state.html_content = html_content
-                        st.session_state.prompt_history = prompt_history
-                        st.session_state.current_project = project['id']
-                        st.success(f"Project '{project_name}' loaded successfully!")
-                        st.rerun()
+                    with open(path, "rb") as f:
+                        st.download_button("Download Archive", f, file_name=f"projects-{datetime.datetime.now():%Y%m%d-%H%M%S}.{EXPORT_FORMATS[archive_type]}", key="download_export_button")
+                except Exception as e:
+                    st.error(f"Could not export the projects: {str(e)}")
+                    return
+                finally:
+                    os.remove(path)
+                
+                st.caption(f"Exported {stats['projects']} projects ({stats['bytes'] / (1024 * 1024):.1f} MB uncompressed, {size / (1024 * 1024):.1f} MB archive) in {stats['seconds']:.2f}s, {stats['projects'] / max(stats['seconds'], 1e-9):.0f} projects/s. The download is offered until the page changes; export again to download it later.")
+        
+        uploaded = st.file_uploader("Import an archive", type=["zip", "tar", "gz", "tgz"], key="import_file")
+        
+        if uploaded is not None and st.button("Import", key="import_button"):
+            progress = st.progress(0.0, text="Importing projects...")
             
-            with col2:
-                if st.button("Delete", key=f"delete-{project['id']}"):
-                    if delete_project(project['id']):
-                        st.success(f"Project '{project['name']}' deleted successfully!")
-                        st.rerun()
+            def report_import(done, count):
+                progress.progress(done / count, text=f"Checked {done} of {count} projects")
             
-            st.markdown(f"</td>", unsafe_allow_html=True)
-            st.markdown(f"</tr>", unsafe_allow_html=True)
-        
-        st.markdown("</table>", unsafe_allow_html=True) 
\ No newline at end of file
+            try:
+                stats = import_projects(get_project_store(), uploaded, save=add_project, delete=delete_project, progress=report_import)
+            except ValueError as e:
+                st.error(f"Could not import '{uploaded.name}': {str(e)}")
+                return
+            
+            st.success(f"Imported {stats['imported']} projects, skipped {stats['skipped']} already in the library, in {stats['seconds']:.2f}s ({stats['bytes'] / (1024 * 1024) / max(stats['seconds'], 1e-9):.1f} MB/s).")
+            for error in stats["errors"]:
+                st.warning(error)
+
+def prune_exports():
+    """
+    Delete library exports left behind by interrupted script runs.
+    """
+    if not os.path.isdir(EXPORTS_DIR):
+        return
+    
+    now = time.time()
+    for filename in os.listdir(EXPORTS_DIR):
+        path = os.path.join(EXPORTS_DIR, filename)
+        try:
+            if now - os.path.getmtime(path) > EXPORT_RETENTION:
+                os.remove(path)
+        except OSError:
+            pass
@@ -1,5 +1,9 @@
 import streamlit as st
-from utils.project import load_project
+from utils.project import load_project, search_projects
+from utils.search import escape_markdown, snippet_markdown
+
+# Search results shown on the Remix page
+REMIX_SEARCH_RESULTS = 5
 
 def render_remix():
     """
@@ -7,6 +11,27 @@ def render_remix():
     """
     st.markdown("<h2 class='sub-header'>Remix Options</h2>", unsafe_allow_html=True)
     
+    # Find a project by its name, prompts or page text
+    query = st.text_input("Search projects", key="remix_query", placeholder="Name, prompt or page text").strip()
+    
+    if query:
+        results = search_projects(query, limit=REMIX_SEARCH_RESULTS)
+        
+        if not results:
+            st.info(f"No projects match '{escape_markdown(query)}'.")
+        
+        for result in results:
+            col1, col2 = st.columns([5, 1])
+            col1.markdown(f"**{escape_markdown(result['name'])}**")
+            col1.caption(snippet_markdown(result["snippet"]))
+            
+            with col2:
+                if st.button("Load", key=f"remix-{result['id']}"):
+                    load_remix_project(result["id"])
+        
+        if results.total > len(results):
+            st.caption(f"Showing the best {len(results)} of {results.total} matches.")
+    
     # Project ID input
     project_id = st.text_input("Project ID")
     
@@ -15,15 +40,24 @@ def render_remix():
         if not project_id:
             st.error("Please enter a project ID.")
         else:
-            with st.spinner("Loading project..."):
-                # Load the project
-                project_name, html_content, prompt_history = load_project(project_id)
-                
-                if project_name and html_content and prompt_history:
-                    st.session_state.html_content = html_content
-                    st.session_state.prompt_history = prompt_history
-                    st.session_state.current_project = project_id
-                    st.success(f"Project '{project_name}' loaded successfully!")
-                    st.rerun()
-                else:
-                    st.error(f"Failed to load project '{project_id}'.") 
\ No newline at end of file
+            load_remix_project(project_id)
+
+def load_remix_project(project_id):
+    """
+    Load a project into the editor.
+    
+    Args:
+        project_id (str): The ID of the project to load
+    """
+    with st.spinner("Loading project..."):
+        # Load the project
+        project_data = load_project(project_id)
+        
+        if project_data:
+            st.session_state.html_content = project_data["html_content"]
+            st.session_state.prompt_history = project_data["prompt_history"]
+            st.session_state.current_project = project_id
+            st.success(f"Project '{escape_markdown(project_data['name'])}' loaded successfully!")
+            st.rerun()
+        else:
+            st.error(f"Failed to load project '{escape_markdown(project_id)}'.")
@@ -1,4 +1,10 @@
 import streamlit as st
+from utils.cache import get_response_cache
+from utils.api import get_generation_tracker, get_single_flight, get_model_router
+from utils.telemetry import get_telemetry
+from utils.jobs import get_job_queue
+from utils.similarity import get_prompt_index
+from utils.project import get_project_catalog
 
 def render_settings():
     """
@@ -23,6 +29,110 @@ def render_settings():
     if font_size != st.session_state.font_size:
         st.session_state.font_size = font_size
     
+    # Response cache
+    st.markdown("<h2 class='sub-header'>Response Cache</h2>", unsafe_allow_html=True)
+    
+    cache_info = get_response_cache().info()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Memory Hits", cache_info["memory_hits"])
+    col2.metric("Disk Hits", cache_info["disk_hits"])
+    col3.metric("Misses", cache_info["misses"])
+    col4.metric("Cached in Memory", cache_info["memory_entries"])
+    
+    if st.button("Clear Response Cache", key="clear_cache_button"):
+        get_response_cache().clear()
+        st.success("Response cache cleared!")
+    
+    similar_info = get_prompt_index().info()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Similar Prompt Hit Rate", f"{similar_info['hit_rate']:.0%}", help=f"{similar_info['hits']} of {similar_info['lookups']} lookups")
+    col2.metric("Offers Accepted", f"{similar_info['acceptance_rate']:.0%}", help=f"{similar_info['accepted']} accepted, {similar_info['declined']} declined")
+    col3.metric("Near Misses", similar_info["near_misses"], help="Lookups whose best match was just below the threshold")
+    col4.metric("Indexed Prompts", similar_info["entries"])
+    st.caption(f"New-site prompts at least {similar_info['threshold']:.0%} similar to an earlier one (word-shingle Jaccard similarity) are offered the earlier result. Median best similarity of recent lookups: {similar_info['median_best_similarity']:.0%}.")
+    
+    # Generation cancellations
+    st.markdown("<h2 class='sub-header'>Generations</h2>", unsafe_allow_html=True)
+    
+    generation_info = get_generation_tracker().info()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Started", generation_info["started"])
+    col2.metric("In Flight", generation_info["in_flight"])
+    col3.metric("Superseded", generation_info["superseded"])
+    col4.metric("Interrupted", generation_info["interrupted"])
+    st.caption("Superseded and interrupted generations were cancelled upstream instead of running to completion.")
+    
+    flight_info = get_single_flight().info()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Upstream Calls", flight_info["upstream"])
+    col2.metric("Coalesced", flight_info["coalesced"])
+    col3.metric("Abandoned Upstream", flight_info["abandoned"])
+    st.caption("Coalesced requests shared the upstream call of an identical request that was already in flight.")
+    
+    job_info = get_job_queue().info()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Queued Jobs", job_info["queued"])
+    col2.metric("Running Jobs", job_info["running"])
+    col3.metric("Recently Finished Jobs", job_info["finished"])
+    st.caption("Generations run as background jobs and survive reruns and page refreshes.")
+    
+    # Project listing cache
+    st.markdown("<h2 class='sub-header'>Projects</h2>", unsafe_allow_html=True)
+    
+    catalog_info = get_project_catalog().info()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Listing Hits", catalog_info["hits"])
+    col2.metric("Listing Loads", catalog_info["loads"])
+    col3.metric("Invalidations", catalog_info["invalidations"])
+    col4.metric("Cached Projects", catalog_info["projects"])
+    st.caption(f"Project listings are served from memory until a project is saved, updated or deleted; other processes' writes are picked up within {get_project_catalog().check_interval:g}s.")
+    
+    # Model routing
+    st.markdown("<h2 class='sub-header'>Models</h2>", unsafe_allow_html=True)
+    
+    router = get_model_router()
+    st.caption(f"Routing policy: {router.policy}. Models are tried in this order; a model that is slow to its first token is hedged with the next one.")
+    for stats in router.info():
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(stats["model"], "Healthy" if stats["healthy"] else "Cooling down")
+        col2.metric("Requests", stats["requests"])
+        col3.metric("Error Rate", f"{stats['error_rate']:.0%}")
+        col4.metric("TTFT", f"{stats['ttft']:.2f}s" if stats["ttft"] is not None else "-")
+    
+    # Request telemetry
+    st.markdown("<h2 class='sub-header'>Telemetry</h2>", unsafe_allow_html=True)
+    
+    telemetry = get_telemetry()
+    generations = telemetry.summary("generation")
+    upstream = telemetry.summary("upstream")
+    st.caption(f"Percentiles over the last {generations['count']} generations and {upstream['count']} upstream requests.")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Queue p50 / p99", f"{generations['queue_time']['p50']:.2f}s / {generations['queue_time']['p99']:.2f}s")
+    col2.metric("Connect p50 / p99", f"{upstream['connect_time']['p50']:.2f}s / {upstream['connect_time']['p99']:.2f}s")
+    col3.metric("TTFT p50 / p99", f"{upstream['ttft']['p50']:.2f}s / {upstream['ttft']['p99']:.2f}s")
+    col4.metric("Duration p50 / p99", f"{generations['duration']['p50']:.1f}s / {generations['duration']['p99']:.1f}s")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Tokens/s p50", f"{upstream['tokens_per_second']['p50']:.0f}")
+    col2.metric("Tokens In / Out", f"{upstream['prompt_tokens']:,} / {upstream['completion_tokens']:,}")
+    col3.metric("Received", f"{upstream['bytes_received'] / (1024 * 1024):.1f} MB")
+    col4.metric("Upstream Errors", f"{upstream['error_rate']:.0%}")
+    
+    if upstream["cost"]:
+        st.caption(f"Cost reported by OpenRouter: {upstream['cost']:.4f} credits")
+    
+    st.download_button(
+        "Download Prometheus Metrics",
+        telemetry.prometheus(),
+        file_name="metrics.prom",
+        mime="text/plain",
+        key="download_metrics_button"
+    )
+    
+    with st.expander("Recent Requests"):
+        st.json(telemetry.events()[-20:])
+    
     # Save settings
     if st.button("Save Settings", key="save_settings_button"):
         st.success("Settings saved!") 
\ No newline at end of file
@@ -1,6 +1,9 @@
 import streamlit as st
 from utils.project import list_projects
 
+# Most recent projects listed in the sidebar; the rest are on the Projects page
+SIDEBAR_PROJECTS = 10
+
 def render_sidebar():
     """
     Render the sidebar for the application.
@@ -31,15 +34,18 @@ def render_sidebar():
         if page == "Projects":
             st.markdown("<div class='sidebar-section'>", unsafe_allow_html=True)
             st.markdown("### Your Projects")
-            projects = list_projects()
+            query = st.text_input("Find a project", key="sidebar_projects_query")
+            projects = list_projects(limit=SIDEBAR_PROJECTS, query=query)
             
-            if not projects:
-                st.info("You don't have any projects yet.")
+            if not projects.total:
+                st.info(f"No projects match '{query}'." if query else "You don't have any projects yet.")
             else:
                 for project in projects:
                     if st.button(f"📁 {project['name']}", key=f"project-{project['id']}"):
                         st.session_state.current_project = project['id']
                         st.rerun()
+                if projects.total > len(projects):
+                    st.caption(f"Showing the {len(projects)} most recent of {projects.total} projects.")
             st.markdown("</div>", unsafe_allow_html=True)
         
         # About
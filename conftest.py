@@ -0,0 +1,2 @@
+# The Streamlit test page is run with `streamlit run test_app.py`, not by pytest
+collect_ignore = ["test_app.py"]
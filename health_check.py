@@ -1,9 +1,13 @@
 import os
 import sys
 import json
-import requests
 from dotenv import load_dotenv
 
+# Load .env before the utilities read their settings from the environment
+load_dotenv()
+
+from utils.api import OPENROUTER_API_BASE, get_http_client
+
 def check_directories():
     """
     Check if all required directories exist.
@@ -98,8 +102,8 @@ def check_openrouter_api():
             "Content-Type": "application/json"
         }
         
-        response = requests.get(
-            "https://openrouter.ai/api/v1/models",
+        response = get_http_client().get(
+            f"{OPENROUTER_API_BASE}/models",
             headers=headers
         )
         
@@ -0,0 +1,301 @@
+import sys
+import time
+import argparse
+
+from utils.project import PROJECT_STORE, PROJECT_STORES, PROJECT_SORTS, SEARCH_INDEX_FILE, create_project_store, migrate_projects
+from utils.search import SearchIndex
+from utils.archive import archive_format, export_projects, import_projects
+
+def command_rebuild(args):
+    """
+    Rebuild the project index from the stored projects.
+    """
+    start = time.perf_counter()
+    count = create_project_store(args.store).rebuild_index()
+    print(f"Indexed {count} projects in {time.perf_counter() - start:.2f}s.")
+    return True
+
+def command_check(args):
+    """
+    Report differences between the project index and the stored projects,
+    and repair them with --repair.
+    """
+    store = create_project_store(args.store)
+    issues = store.check_index()
+    
+    for kind, label in [("missing", "not in the index"), ("orphaned", "indexed without a project file"), ("stale", "with stale metadata")]:
+        print(f"{len(issues[kind])} projects {label}")
+        if args.verbose:
+            for project_id in issues[kind]:
+                print(f"  {project_id}")
+    
+    if not any(issues.values()):
+        print("The index is up to date.")
+        return True
+    
+    if args.repair:
+        print(f"Repaired: indexed {store.rebuild_index()} projects.")
+        return True
+    
+    print("Run with --repair to rebuild the index.")
+    return False
+
+def command_list(args):
+    """
+    List a page of the projects from the index.
+    """
+    projects = create_project_store(args.store).page(args.offset, args.limit or None, args.sort, args.query)
+    
+    for project in projects:
+        print(f"{project['id']}  {project['updated_at'][:19]}  {project['size']:>9}  {project['name']}")
+    
+    print(f"{len(projects)} of {projects.total} projects")
+    return True
+
+def command_info(args):
+    """
+    Print the number and total size of the stored projects.
+    """
+    info = create_project_store(args.store).info()
+    print(f"{info['backend']}: {info['projects']} projects, {info['bytes'] / 1024:.1f} KB")
+    if "blobs" in info:
+        print(f"HTML: {info['blobs']} distinct pages, {info['stored_bytes'] / 1024:.1f} KB compressed")
+    return True
+
+def command_gc(args):
+    """
+    Delete stored HTML that no project references any more.
+    """
+    start = time.perf_counter()
+    counts = create_project_store(args.store).collect_garbage()
+    print(f"Removed {counts['removed']} unreferenced blobs in {time.perf_counter() - start:.2f}s.")
+    return True
+
+def command_migrate(args):
+    """
+    Copy every project from one backend to another.
+    """
+    if args.source == args.target:
+        print("The source and target backends are the same.")
+        return False
+    
+    start = time.perf_counter()
+    counts = migrate_projects(create_project_store(args.source), create_project_store(args.target), args.overwrite)
+    print(f"Copied {counts['copied']} projects from {args.source} to {args.target} ({counts['skipped']} already there) in {time.perf_counter() - start:.2f}s.")
+    
+    if args.target != PROJECT_STORE:
+        print(f"Set PROJECT_STORE={args.target} to use the migrated projects.")
+    return True
+
+def command_reindex(args):
+    """
+    Bring the full-text search index up to date, or rebuild it with --full.
+    """
+    store = create_project_store(args.store)
+    search_index = SearchIndex(SEARCH_INDEX_FILE)
+    start = time.perf_counter()
+    
+    if args.full:
+        print(f"Indexed {search_index.rebuild(store)} projects in {time.perf_counter() - start:.2f}s.")
+    else:
+        counts = search_index.sync(store)
+        print(f"Added {counts['added']}, updated {counts['updated']} and removed {counts['removed']} projects in {time.perf_counter() - start:.2f}s.")
+    return True
+
+def command_search(args):
+    """
+    Search the projects, best matches first.
+    """
+    results, total = SearchIndex(SEARCH_INDEX_FILE).search(args.query, 0, args.limit)
+    
+    for result in results:
+        print(f"{result['id']}  {result['score']:>6.2f}  {result['name']}")
+        print(f"    {result['snippet']}")
+    
+    print(f"{len(results)} of {total} matches")
+    return True
+
+def command_export(args):
+    """
+    Export all or matching projects to a zip or tar archive.
+    """
+    store = create_project_store(args.store)
+    
+    try:
+        archive_type = archive_format(args.path)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return False
+    
+    project_ids = [project["id"] for project in store.page(query=args.query)] if args.query else None
+    
+    with open(args.path, "wb") as f:
+        stats = export_projects(store, f, archive_type, project_ids)
+    
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"Exported {stats['projects']} projects ({stats['bytes'] / (1024 * 1024):.1f} MB uncompressed) to {args.path} in {stats['seconds']:.2f}s: "
+          f"{stats['projects'] / seconds:.0f} projects/s, {stats['bytes'] / (1024 * 1024) / seconds:.1f} MB/s.")
+    return True
+
+def command_import(args):
+    """
+    Import the projects of an archive, skipping projects that are already there.
+    """
+    store = create_project_store(args.store)
+    
+    try:
+        with open(args.path, "rb") as f:
+            stats = import_projects(store, f)
+    except (OSError, ValueError) as e:
+        print(f"Could not import {args.path}: {e}", file=sys.stderr)
+        return False
+    
+    # Imported projects bypass utils.project, so catch the search index up
+    SearchIndex(SEARCH_INDEX_FILE).sync(store)
+    
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"Imported {stats['imported']} projects, skipped {stats['skipped']} already there, {stats['failed']} failed, in {stats['seconds']:.2f}s: "
+          f"{stats['bytes'] / (1024 * 1024) / seconds:.1f} MB/s.")
+    for error in stats["errors"]:
+        print(f"  {error}")
+    return not stats["failed"]
+
+def command_history(args):
+    """
+    List the revisions of a project.
+    """
+    revisions = create_project_store(args.store).revisions(args.project_id)
+    
+    for revision in revisions:
+        print(f"{revision['revision']:>4}  {revision['created_at'][:19]}  {revision['kind']:<8}  {revision['size']:>9}  {revision['hash'][:12]}")
+    
+    print(f"{len(revisions)} revisions")
+    return bool(revisions)
+
+def command_checkout(args):
+    """
+    Write the HTML of a project revision to a file or stdout.
+    """
+    html_content = create_project_store(args.store).checkout(args.project_id, args.revision)
+    
+    if html_content is None:
+        print(f"Project {args.project_id} has no revision {args.revision}.", file=sys.stderr)
+        return False
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(html_content)
+        print(f"Wrote revision {args.revision} to {args.output}.")
+    else:
+        sys.stdout.write(html_content)
+    return True
+
+def command_diff(args):
+    """
+    Print a unified diff between two revisions of a project.
+    """
+    diff = create_project_store(args.store).diff(args.project_id, args.old, args.new)
+    
+    if diff is None:
+        print(f"Project {args.project_id} has no revision {args.old} or {args.new}.", file=sys.stderr)
+        return False
+    
+    sys.stdout.write(diff)
+    return True
+
+def command_compact(args):
+    """
+    Re-encode the revision histories, optionally keeping only the latest revisions.
+    """
+    store = create_project_store(args.store)
+    project_ids = [args.project] if args.project else [project["id"] for project in store.list()]
+    totals = {"revisions": 0, "removed": 0}
+    start = time.perf_counter()
+    
+    for project_id in project_ids:
+        counts = store.compact_revisions(project_id, args.keep)
+        totals["revisions"] += counts["revisions"]
+        totals["removed"] += counts["removed"]
+    
+    print(f"Compacted {len(project_ids)} projects: kept {totals['revisions']} revisions, removed {totals['removed']} in {time.perf_counter() - start:.2f}s.")
+    return True
+
+def main():
+    """
+    Maintain the project library.
+    """
+    parser = argparse.ArgumentParser(description="Maintain the project library.")
+    parser.add_argument("--store", choices=PROJECT_STORES, default=PROJECT_STORE, help=f"Storage backend (default: PROJECT_STORE, currently {PROJECT_STORE})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    rebuild_parser = subparsers.add_parser("rebuild", help="Rebuild the project index from the stored projects")
+    rebuild_parser.set_defaults(handler=command_rebuild)
+    
+    check_parser = subparsers.add_parser("check", help="Compare the project index with the stored projects")
+    check_parser.add_argument("--repair", action="store_true", help="Rebuild the index if it is out of date")
+    check_parser.add_argument("--verbose", action="store_true", help="Print the affected project IDs")
+    check_parser.set_defaults(handler=command_check)
+    
+    list_parser = subparsers.add_parser("list", help="List the projects, newest first")
+    list_parser.add_argument("--limit", type=int, default=0, help="Maximum number of projects to print (default: all)")
+    list_parser.add_argument("--offset", type=int, default=0, help="Number of projects to skip")
+    list_parser.add_argument("--sort", choices=list(PROJECT_SORTS), default="updated", help="Order of the projects (default: updated)")
+    list_parser.add_argument("--query", help="Only list projects whose name contains this")
+    list_parser.set_defaults(handler=command_list)
+    
+    info_parser = subparsers.add_parser("info", help="Print the number and size of the stored projects")
+    info_parser.set_defaults(handler=command_info)
+    
+    gc_parser = subparsers.add_parser("gc", help="Delete stored HTML that no project references")
+    gc_parser.set_defaults(handler=command_gc)
+    
+    reindex_parser = subparsers.add_parser("reindex", help="Update the full-text search index from the stored projects")
+    reindex_parser.add_argument("--full", action="store_true", help="Rebuild the index from scratch")
+    reindex_parser.set_defaults(handler=command_reindex)
+    
+    search_parser = subparsers.add_parser("search", help="Search the names, prompts and page text of the projects")
+    search_parser.add_argument("query", help="Words to search for")
+    search_parser.add_argument("--limit", type=int, default=20, help="Maximum number of results (default: 20)")
+    search_parser.set_defaults(handler=command_search)
+    
+    export_parser = subparsers.add_parser("export", help="Export the projects to a zip or tar archive")
+    export_parser.add_argument("path", help="Archive to write (.zip, .tar, .tar.gz or .tgz)")
+    export_parser.add_argument("--query", help="Only export projects whose name contains this")
+    export_parser.set_defaults(handler=command_export)
+    
+    import_parser = subparsers.add_parser("import", help="Import the projects of an exported archive")
+    import_parser.add_argument("path", help="Archive to read")
+    import_parser.set_defaults(handler=command_import)
+    
+    history_parser = subparsers.add_parser("history", help="List the revisions of a project")
+    history_parser.add_argument("project_id", help="ID of the project")
+    history_parser.set_defaults(handler=command_history)
+    
+    checkout_parser = subparsers.add_parser("checkout", help="Print the HTML of a project revision")
+    checkout_parser.add_argument("project_id", help="ID of the project")
+    checkout_parser.add_argument("revision", type=int, help="Revision number")
+    checkout_parser.add_argument("--output", help="File to write the HTML to (default: stdout)")
+    checkout_parser.set_defaults(handler=command_checkout)
+    
+    diff_parser = subparsers.add_parser("diff", help="Compare two revisions of a project")
+    diff_parser.add_argument("project_id", help="ID of the project")
+    diff_parser.add_argument("old", type=int, help="Revision to compare from")
+    diff_parser.add_argument("new", type=int, help="Revision to compare to")
+    diff_parser.set_defaults(handler=command_diff)
+    
+    compact_parser = subparsers.add_parser("compact", help="Re-encode the revision histories")
+    compact_parser.add_argument("--project", help="Only compact this project (default: all)")
+    compact_parser.add_argument("--keep", type=int, default=None, help="Number of latest revisions to keep (default: all)")
+    compact_parser.set_defaults(handler=command_compact)
+    
+    migrate_parser = subparsers.add_parser("migrate", help="Copy every project to another storage backend")
+    migrate_parser.add_argument("--from", dest="source", choices=PROJECT_STORES, default="json", help="Backend to copy from (default: json)")
+    migrate_parser.add_argument("--to", dest="target", choices=PROJECT_STORES, default="sqlite", help="Backend to copy to (default: sqlite)")
+    migrate_parser.add_argument("--overwrite", action="store_true", help="Replace projects that already exist in the target")
+    migrate_parser.set_defaults(handler=command_migrate)
+    
+    args = parser.parse_args()
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,195 @@
+import io
+import json
+import sqlite3
+import zipfile
+import pytest
+from utils.archive import MANIFEST_NAME, checksum, export_projects, import_projects
+from utils.project import JsonProjectStore
+
+def make_store(path):
+    return JsonProjectStore(str(path), str(path / ".index.json"))
+
+def make_project(number, html_content=None):
+    return {
+        "id": f"00000000-0000-4000-8000-{number:012d}",
+        "name": f"Project {number}",
+        "html_content": html_content or f"<html><body><h1>Project {number}</h1></body></html>",
+        "prompt_history": [f"Make project {number}"],
+        "created_at": f"2024-01-{number:02d}T10:00:00",
+        "updated_at": f"2024-01-{number:02d}T10:00:00",
+    }
+
+@pytest.fixture
+def source(tmp_path):
+    store = make_store(tmp_path / "source")
+    for number in range(1, 6):
+        store.save(make_project(number))
+    store.update(make_project(1)["id"], html_content="<html><body><h1>Project 1, edited</h1></body></html>")
+    return store
+
+def export(store, archive_type="zip"):
+    buffer = io.BytesIO()
+    stats = export_projects(store, buffer, archive_type)
+    buffer.seek(0)
+    return buffer, stats
+
+@pytest.mark.parametrize("archive_type", ["zip", "tar", "tar.gz"])
+def test_round_trip(source, tmp_path, archive_type):
+    archive, stats = export(source, archive_type)
+    target = make_store(tmp_path / "target")
+    result = import_projects(target, archive)
+    
+    assert stats["projects"] == 5
+    assert (result["imported"], result["skipped"], result["failed"]) == (5, 0, 0)
+    for entry in source.list():
+        assert target.load(entry["id"]) == source.load(entry["id"])
+        assert target.revisions(entry["id"]) == source.revisions(entry["id"])
+    assert target.checkout(make_project(1)["id"], 1) == make_project(1)["html_content"]
+
+def test_import_skips_existing_projects(source, tmp_path):
+    archive, _ = export(source)
+    target = make_store(tmp_path / "target")
+    target.save(make_project(9, make_project(2)["html_content"]))
+    
+    result = import_projects(target, archive)
+    assert (result["imported"], result["skipped"]) == (4, 1)
+    
+    archive.seek(0)
+    result = import_projects(target, archive)
+    assert (result["imported"], result["skipped"]) == (0, 5)
+
+def rewrite_member(archive, name, change):
+    members = {}
+    with zipfile.ZipFile(archive) as source_zip:
+        for info in source_zip.infolist():
+            members[info.filename] = source_zip.read(info.filename)
+    members[name] = change(members[name])
+    
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as target_zip:
+        for member, data in members.items():
+            target_zip.writestr(member, data)
+    buffer.seek(0)
+    return buffer
+
+def test_import_rejects_checksum_mismatch(source, tmp_path):
+    archive, _ = export(source)
+    project_id = make_project(3)["id"]
+    archive = rewrite_member(archive, f"projects/{project_id}.json", lambda data: data.replace(b"Project 3", b"Project X"))
+    target = make_store(tmp_path / "target")
+    
+    result = import_projects(target, archive)
+    assert (result["imported"], result["failed"]) == (4, 1)
+    assert "checksum" in result["errors"][0]
+    assert target.load(project_id) is None
+
+def test_import_rejects_mismatched_project_id(source, tmp_path):
+    archive, _ = export(source)
+    project_id = make_project(3)["id"]
+    
+    def change(data):
+        project_data = json.loads(data)
+        project_data["id"] = "../../evil"
+        return json.dumps(project_data, indent=2).encode("utf-8")
+    
+    # A consistent archive: the checksum matches the changed member
+    archive = rewrite_member(archive, f"projects/{project_id}.json", change)
+    member = zipfile.ZipFile(archive).read(f"projects/{project_id}.json")
+    
+    def update_checksum(data):
+        manifest = json.loads(data)
+        manifest["checksums"][f"projects/{project_id}.json"] = checksum(member)
+        return json.dumps(manifest).encode("utf-8")
+    
+    archive = rewrite_member(archive, MANIFEST_NAME, update_checksum)
+    target = make_store(tmp_path / "target" / "projects")
+    
+    result = import_projects(target, archive)
+    assert (result["imported"], result["failed"]) == (4, 1)
+    assert "does not match the manifest" in result["errors"][0]
+    assert not (tmp_path / "evil.json").exists()
+    assert target.load(project_id) is None
+
+def test_import_rejects_invalid_project_ids(source, tmp_path):
+    archive, _ = export(source)
+    
+    def change(data):
+        manifest = json.loads(data)
+        manifest["projects"][0]["id"] = "../../evil"
+        return json.dumps(manifest).encode("utf-8")
+    
+    result = import_projects(make_store(tmp_path / "target"), rewrite_member(archive, MANIFEST_NAME, change))
+    assert (result["imported"], result["failed"]) == (4, 1)
+    assert "not valid" in result["errors"][0]
+
+def test_store_errors_fail_one_project(source, tmp_path):
+    archive, _ = export(source)
+    target = make_store(tmp_path / "target")
+    
+    def save(project_data):
+        if project_data["id"] == make_project(2)["id"]:
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: projects.id")
+        target.save(project_data)
+    
+    result = import_projects(target, archive, save=save)
+    assert (result["imported"], result["failed"]) == (4, 1)
+    assert "UNIQUE constraint" in result["errors"][0]
+
+def test_import_rejects_malformed_revisions(source, tmp_path):
+    archive, _ = export(source)
+    project_id = make_project(1)["id"]
+    member = f"revisions/{project_id}.jsonl"
+    
+    def change(data):
+        entries = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+        entries[-1]["kind"] = "unknown"
+        return "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+    
+    archive = rewrite_member(archive, member, change)
+    changed = zipfile.ZipFile(archive).read(member)
+    
+    def update_checksum(data):
+        manifest = json.loads(data)
+        manifest["checksums"][member] = checksum(changed)
+        return json.dumps(manifest).encode("utf-8")
+    
+    target = make_store(tmp_path / "target")
+    result = import_projects(target, rewrite_member(archive, MANIFEST_NAME, update_checksum))
+    assert (result["imported"], result["failed"]) == (4, 1)
+    assert "revision history is not valid" in result["errors"][0]
+    assert target.load(project_id) is None
+
+def test_rejected_revisions_undo_the_save(source, tmp_path, monkeypatch):
+    archive, _ = export(source)
+    target = make_store(tmp_path / "target")
+    project_id = make_project(1)["id"]
+    
+    replace_revisions = target.replace_revisions
+    
+    def replace_or_fail(revised_id, entries):
+        if revised_id == project_id:
+            raise OSError("No space left on device")
+        replace_revisions(revised_id, entries)
+    
+    monkeypatch.setattr(target, "replace_revisions", replace_or_fail)
+    result = import_projects(target, archive)
+    assert (result["imported"], result["failed"]) == (4, 1)
+    assert "No space left" in result["errors"][0]
+    assert target.load(project_id) is None
+    
+    # A second import is not skipped as a duplicate
+    monkeypatch.undo()
+    archive.seek(0)
+    result = import_projects(target, archive)
+    assert (result["imported"], result["skipped"]) == (1, 4)
+    assert target.revisions(project_id) == source.revisions(project_id)
+
+def test_import_rejects_non_archives(tmp_path):
+    with pytest.raises(ValueError):
+        import_projects(make_store(tmp_path), io.BytesIO(b"not an archive"))
+
+def test_import_requires_manifest(source, tmp_path):
+    archive = rewrite_member(export(source)[0], MANIFEST_NAME, lambda data: json.dumps({"version": 99}).encode("utf-8"))
+    
+    with pytest.raises(ValueError):
+        import_projects(make_store(tmp_path / "target"), archive)
@@ -0,0 +1,53 @@
+import utils.cache
+from utils.cache import ResponseCache, make_cache_key
+
+def test_cache_key_covers_sampling_parameters():
+    data = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.7, "max_tokens": 100}
+    
+    assert make_cache_key(data) == make_cache_key(dict(data, stream=True))
+    assert make_cache_key(data) != make_cache_key(dict(data, temperature=0.2))
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60, max_entries=2)
+    cache.put("a", "reply a")
+    cache.put("b", "reply b")
+    assert cache.get("a") == "reply a"
+    cache.put("c", "reply c")
+    
+    assert cache.info()["memory_entries"] == 2
+    assert cache.get("a") == "reply a"
+    assert cache.get("c") == "reply c"
+    assert cache.info()["disk_hits"] == 0
+    
+    # The evicted entry is still on disk
+    assert cache.get("b") == "reply b"
+    assert cache.info()["disk_hits"] == 1
+
+def test_memory_tier_is_bounded_by_size(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60, max_entries=10, max_bytes=10)
+    cache.put("a", "123456")
+    cache.put("b", "123456")
+    
+    assert cache.info()["memory_entries"] == 1
+    assert cache.info()["memory_bytes"] == 6
+
+def test_entries_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(utils.cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    cache.put("a", "reply a")
+    
+    now[0] += 30
+    assert cache.get("a") == "reply a"
+    
+    now[0] += 31
+    assert cache.get("a") is None
+    assert ResponseCache(str(tmp_path), ttl=60).get("a") is None
+    assert not list(tmp_path.iterdir())
+
+def test_disk_tier_is_shared(tmp_path):
+    ResponseCache(str(tmp_path), ttl=60).put("a", "reply a")
+    
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    assert cache.get("a") == "reply a"
+    assert cache.info()["disk_hits"] == 1
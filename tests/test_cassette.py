@@ -0,0 +1,55 @@
+import json
+import pytest
+from utils.cassette import Cassette, request_key
+
+def interaction(prompt):
+    body = json.dumps({"model": "m", "messages": [{"role": "user", "content": prompt}]})
+    return body, {
+        "method": "POST",
+        "path": "/chat/completions",
+        "key": request_key("POST", "/chat/completions", body),
+        "stream": False,
+        "request": json.loads(body),
+        "status": 200,
+        "headers_after": 0,
+        "body": f"reply to {prompt}",
+        "lines": None
+    }
+
+def record(path, prompts):
+    cassette = Cassette(str(path), "record")
+    for prompt in prompts:
+        cassette.add(interaction(prompt)[1])
+    return cassette
+
+def test_recordings_are_appended(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    record(path, ["coffee", "tea"])
+    
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+    
+    cassette = Cassette(str(path), "replay")
+    assert cassette.find("POST", "/chat/completions", interaction("tea")[0], False)["body"] == "reply to tea"
+    assert cassette.info()["exact"] == 1
+
+def test_replay_skips_a_cut_off_last_line(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    record(path, ["coffee", "tea"])
+    path.write_text(path.read_text(encoding="utf-8")[:-20], encoding="utf-8")
+    
+    assert Cassette(str(path), "replay").info()["interactions"] == 1
+
+def test_strict_replay_does_not_fall_back(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    record(path, ["coffee"])
+    body = interaction("juice")[0]
+    
+    assert Cassette(str(path), "replay").find("POST", "/chat/completions", body, False)["body"] == "reply to coffee"
+    assert Cassette(str(path), "replay", strict=True).find("POST", "/chat/completions", body, False) is None
+
+def test_replay_rejects_other_versions(tmp_path):
+    path = tmp_path / "cassette.json"
+    path.write_text(json.dumps({"version": 1, "interactions": []}), encoding="utf-8")
+    
+    with pytest.raises(ValueError):
+        Cassette(str(path), "replay")
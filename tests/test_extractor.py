@@ -0,0 +1,54 @@
+import pytest
+from utils.api import HtmlExtractor, extract_html
+
+REPLIES = [
+    "Here is your page:\n```html\n<!DOCTYPE html>\n<html><body><h1>Hi</h1></body></html>\n```\nEnjoy!",
+    "```\n<div>untagged</div>\n```",
+    "<html><body>bare</body></html>\n",
+    "```css\nbody { color: red; }\n```\nThen the page:\n```html\n<p>after css</p>\n```",
+    "```css\nbody { color: red; }\n```",
+    "Use `code` and ``double`` spans.\n```html\n<pre>a ` b `` c</pre>\n```",
+    "No code in this reply at all.",
+    "```html\n<p>never closed</p>\n",
+    "  \n\n```HTML\n  <p>indented</p>  \n\n```",
+    "```html<p>x</p>```",
+    "Text ```html <p>inline</p>```",
+    "Run ```npm start``` first, then open the page.",
+]
+
+def feed_chunks(reply, size):
+    extractor = HtmlExtractor()
+    html = "".join(extractor.feed(reply[i:i + size]) for i in range(0, len(reply), size))
+    return html + extractor.close()
+
+@pytest.mark.parametrize("reply", REPLIES)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_chunked_matches_whole_reply(reply, size):
+    assert feed_chunks(reply, size) == extract_html(reply)
+
+def test_extracts_first_html_block():
+    assert extract_html(REPLIES[0]) == "<!DOCTYPE html>\n<html><body><h1>Hi</h1></body></html>"
+    assert extract_html(REPLIES[3]) == "<p>after css</p>"
+
+def test_untagged_and_bare_html():
+    assert extract_html(REPLIES[1]) == "<div>untagged</div>"
+    assert extract_html(REPLIES[2]) == "<html><body>bare</body></html>"
+
+def test_fallbacks():
+    assert extract_html(REPLIES[4]) == "body { color: red; }"
+    assert extract_html(REPLIES[6]) == "No code in this reply at all."
+    assert extract_html(REPLIES[7]) == "<p>never closed</p>"
+
+def test_inline_fences():
+    assert extract_html("```html<p>x</p>```") == "<p>x</p>"
+    assert extract_html("Text ```html <p>inline</p>```") == "<p>inline</p>"
+    assert extract_html("```<p>untagged</p>``` and more") == "<p>untagged</p>"
+
+def test_block_wins_over_inline_fence():
+    assert extract_html("Try ```html<b>x</b>``` or:\n```html\n<p>block</p>\n```") == "<p>block</p>"
+
+def test_other_inline_fences_fall_back_to_the_reply():
+    assert extract_html(REPLIES[-1]) == REPLIES[-1]
+
+def test_surrounding_whitespace_is_stripped():
+    assert extract_html(REPLIES[8]) == "<p>indented</p>"
@@ -0,0 +1,30 @@
+from utils.api import GenerationTracker
+
+def test_every_generation_is_counted_once():
+    tracker = GenerationTracker()
+    first = tracker.begin("session")
+    second = tracker.begin("session")
+    
+    assert first.cancelled and first.reason == "superseded"
+    tracker.end("session", first, "interrupted")
+    
+    assert tracker.cancel("session")
+    tracker.end("session", second, "interrupted")
+    
+    third = tracker.begin("session")
+    tracker.end("session", third, "finished")
+    
+    info = tracker.info()
+    assert (info["started"], info["superseded"], info["interrupted"], info["finished"]) == (3, 1, 1, 1)
+    assert tracker.in_flight() == 0
+
+def test_cancel_with_a_stale_token():
+    tracker = GenerationTracker()
+    first = tracker.begin("session")
+    second = tracker.begin("session")
+    
+    assert not tracker.cancel("session", first)
+    assert not second.cancelled
+    assert tracker.cancel("session", second)
+    assert second.cancelled and second.reason == "interrupted"
+    assert not tracker.cancel("session", second)
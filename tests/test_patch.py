@@ -0,0 +1,81 @@
+import pytest
+import utils.api
+from utils.api import PatchError, apply_patch, edit_html_with_ai, parse_patch
+
+DOCUMENT = "<html>\n<body>\n<h1>Old title</h1>\n<p>Text</p>\n<p>Text</p>\n</body>\n</html>"
+
+def block(search, replace):
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
+
+def test_parse_patch():
+    reply = "Sure:\n" + block("<h1>Old title</h1>", "<h1>New title</h1>") + "\n" + block("</body>", "<footer></footer>\n</body>")
+    
+    assert parse_patch(reply) == [
+        ("<h1>Old title</h1>", "<h1>New title</h1>"),
+        ("</body>", "<footer></footer>\n</body>"),
+    ]
+
+def test_parse_patch_normalizes_line_endings():
+    reply = block("<h1>Old title</h1>", "<h1>New</h1>").replace("\n", "\r\n")
+    assert parse_patch(reply) == [("<h1>Old title</h1>", "<h1>New</h1>")]
+
+def test_parse_patch_without_blocks():
+    with pytest.raises(PatchError):
+        parse_patch("```html\n<p>a full page instead</p>\n```")
+
+def test_parse_patch_with_empty_search():
+    with pytest.raises(PatchError):
+        parse_patch(block("", "<p>new</p>"))
+
+def test_apply_patch():
+    blocks = parse_patch(block("<h1>Old title</h1>", "<h1>New title</h1>"))
+    assert apply_patch(DOCUMENT, blocks) == DOCUMENT.replace("Old title", "New title")
+
+def test_apply_patch_with_missing_search():
+    with pytest.raises(PatchError, match="not found"):
+        apply_patch(DOCUMENT, [("<h2>Missing</h2>", "<h2>New</h2>")])
+
+def test_apply_patch_with_ambiguous_search():
+    with pytest.raises(PatchError, match="ambiguous"):
+        apply_patch(DOCUMENT, [("<p>Text</p>", "<p>Changed</p>")])
+
+def test_apply_patch_is_all_or_nothing():
+    blocks = [("<h1>Old title</h1>", "<h1>New</h1>"), ("<h2>Missing</h2>", "")]
+    
+    with pytest.raises(PatchError):
+        apply_patch(DOCUMENT, blocks)
+
+def fake_model(monkeypatch, edit_reply, regenerated_reply):
+    requests = []
+    
+    async def fake_completion(data, api_key, use_cache=True, cancel_token=None):
+        requests.append("edit")
+        return edit_reply
+    
+    async def fake_stream(data, api_key, use_cache=True, cancel_token=None):
+        requests.append("regenerate")
+        for start in range(0, len(regenerated_reply), 10):
+            yield regenerated_reply[start:start + 10]
+    
+    monkeypatch.setattr(utils.api, "agenerate_completion", fake_completion)
+    monkeypatch.setattr(utils.api, "astream_completion", fake_stream)
+    return requests
+
+def test_edit_applies_the_patch(monkeypatch):
+    requests = fake_model(monkeypatch, block("<h1>Old title</h1>", "<h1>New title</h1>"), "")
+    
+    assert edit_html_with_ai("Rename", DOCUMENT, "key") == DOCUMENT.replace("Old title", "New title")
+    assert requests == ["edit"]
+
+def test_edit_falls_back_to_a_full_page(monkeypatch):
+    page = "<html><body><h1>Rebuilt</h1></body></html>"
+    requests = fake_model(monkeypatch, block("<h2>Missing</h2>", ""), f"```html\n{page}\n```")
+    errors = []
+    chunks = []
+    
+    html = edit_html_with_ai("Rename", DOCUMENT, "key", on_fallback=errors.append, on_chunk=chunks.append)
+    
+    assert html == page
+    assert requests == ["edit", "regenerate"]
+    assert len(errors) == 1 and isinstance(errors[0], PatchError)
+    assert "".join(chunks) == f"```html\n{page}\n```"
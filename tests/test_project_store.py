@@ -0,0 +1,72 @@
+import os
+import pytest
+from utils.project import JsonProjectStore, SqliteProjectStore
+from utils.revisions import REVISION_SNAPSHOT_INTERVAL
+
+PAGE = "<html>\n<body>\n" + "".join(f"<p>Paragraph {i} of a long page.</p>\n" for i in range(500)) + "</body>\n</html>\n"
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        return JsonProjectStore(str(tmp_path), str(tmp_path / ".index.json"))
+    return SqliteProjectStore(str(tmp_path / "projects.db"))
+
+def make_project(number, html_content=PAGE):
+    return {
+        "id": f"00000000-0000-4000-8000-{number:012d}",
+        "name": f"Project {number}",
+        "html_content": html_content,
+        "prompt_history": [f"Make project {number}"],
+        "created_at": f"2024-01-{number:02d}T10:00:00",
+        "updated_at": f"2024-01-{number:02d}T10:00:00",
+    }
+
+def revision_log_bytes(store):
+    if isinstance(store, JsonProjectStore):
+        revisions_dir = store.revision_log.revisions_dir
+        return sum(os.path.getsize(os.path.join(revisions_dir, name)) for name in os.listdir(revisions_dir))
+    return store._connection().execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM project_revisions").fetchone()[0]
+
+def test_first_revisions_share_the_blob(store):
+    for number in range(1, 11):
+        store.save(make_project(number))
+    
+    assert store.info()["blobs"] == 1
+    assert revision_log_bytes(store) < len(PAGE)
+    assert store.checkout(make_project(3)["id"], 1) == PAGE
+
+def test_history_survives_updates_and_deletes(store):
+    project_id = make_project(1)["id"]
+    store.save(make_project(1))
+    store.save(make_project(2))
+    versions = [PAGE] + [PAGE.replace("Paragraph 7 ", f"Edit {i} ") for i in range(1, REVISION_SNAPSHOT_INTERVAL + 3)]
+    for text in versions[1:]:
+        assert store.update(project_id, html_content=text)
+    
+    assert store.load(project_id)["html_content"] == versions[-1]
+    assert [entry["revision"] for entry in store.revisions(project_id)] == list(range(1, len(versions) + 1))
+    assert "snapshot" in [entry["kind"] for entry in store.revisions(project_id)[1:]]
+    
+    # The first revision's blob outlives the project that was saved with it
+    store.delete(make_project(2)["id"])
+    for revision, text in enumerate(versions, 1):
+        assert store.checkout(project_id, revision) == text
+    assert store.collect_garbage()["removed"] == 0
+    
+    store.delete(project_id)
+    assert store.info()["blobs"] == 0
+
+def test_compaction_releases_snapshots(store):
+    project_id = make_project(1)["id"]
+    store.save(make_project(1))
+    versions = [PAGE] + [PAGE.replace("Paragraph 7 ", f"Edit {i} ") for i in range(1, REVISION_SNAPSHOT_INTERVAL + 3)]
+    for text in versions[1:]:
+        store.update(project_id, html_content=text)
+    
+    assert store.compact_revisions(project_id, keep=2) == {"revisions": 2, "removed": len(versions) - 2}
+    assert store.checkout(project_id, len(versions) - 1) == versions[-2]
+    assert store.checkout(project_id, 1) is None
+    assert store.info()["blobs"] == 2
+    
+    store.replace_revisions(project_id, [])
+    assert store.info()["blobs"] == 1
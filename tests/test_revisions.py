@@ -0,0 +1,68 @@
+import pytest
+from utils.revisions import apply_delta, check_entries, make_delta, rebuild_entries, replay, revision_entry
+
+VERSIONS = [
+    "<html>\n<body>\n<h1>One</h1>\n</body>\n</html>\n",
+    "<html>\n<body>\n<h1>Two</h1>\n<p>New paragraph</p>\n</body>\n</html>\n",
+    "<html>\n<body>\n<p>New paragraph</p>\n</body>\n</html>",
+    "",
+    "<html>\n<head><title>Back</title></head>\n<body>\n<p>New paragraph</p>\n</body>\n</html>\n",
+]
+
+@pytest.mark.parametrize("old_text", VERSIONS)
+@pytest.mark.parametrize("new_text", VERSIONS)
+def test_delta_round_trip(old_text, new_text):
+    assert apply_delta(old_text, make_delta(old_text, new_text)) == new_text
+
+def encode(versions):
+    entries = []
+    for number, text in enumerate(versions, 1):
+        last = entries[-1] if entries else None
+        previous_text = versions[number - 2] if number > 1 else None
+        entries.append(revision_entry(number, f"2024-01-{number:02d}", text, last, previous_text))
+    return entries
+
+def test_replay_every_revision():
+    versions = [VERSIONS[0].replace("One", f"Page {i}") + "<footer>" * 50 for i in range(25)]
+    entries = encode(versions)
+    
+    assert entries[0]["kind"] == "snapshot"
+    assert any(entry["kind"] == "delta" for entry in entries)
+    for number, text in enumerate(versions, 1):
+        assert replay(entries, number) == text
+    assert replay(entries, 26) is None
+
+def test_replay_detects_corruption():
+    versions = [VERSIONS[0] * 20, VERSIONS[0] * 20 + "<p>more</p>\n"]
+    entries = encode(versions)
+    entries[1]["data"] = [[0, 1]]
+    
+    with pytest.raises(ValueError):
+        replay(entries, 2)
+
+def test_rebuild_keeps_latest_revisions():
+    versions = [VERSIONS[0].replace("One", f"Page {i}") * 10 for i in range(8)]
+    rebuilt = rebuild_entries(encode(versions), keep=3)
+    
+    assert [entry["revision"] for entry in rebuilt] == [6, 7, 8]
+    assert rebuilt[0]["kind"] == "snapshot"
+    for number in (6, 7, 8):
+        assert replay(rebuilt, number) == versions[number - 1]
+
+@pytest.mark.parametrize("change", [
+    lambda entries: entries[1].update(kind="unknown"),
+    lambda entries: entries[1].update(revision=1),
+    lambda entries: entries[1].update(base=5),
+    lambda entries: entries[0].update(data=None),
+    lambda entries: entries[1].update(data=[[0, "1"]]),
+    lambda entries: entries[1].update(hash="0" * 64),
+    lambda entries: entries.pop(0),
+])
+def test_check_entries_rejects_malformed_logs(change):
+    versions = [VERSIONS[0] * 20, VERSIONS[0] * 20 + "<p>more</p>\n"]
+    entries = encode(versions)
+    check_entries(entries)
+    
+    change(entries)
+    with pytest.raises(ValueError):
+        check_entries(entries)
@@ -0,0 +1,11 @@
+from utils.search import escape_markdown, snippet_markdown
+
+def test_escape_markdown_disables_markup():
+    assert escape_markdown("[Home](http://example.com)") == r"\[Home\]\(http\://example\.com\)"
+    assert escape_markdown("# **Big** :red[text] $x$") == r"\# \*\*Big\*\* \:red\[text\] \$x\$"
+    assert escape_markdown(r"C:\path") == r"C\:\\path"
+    assert escape_markdown(None) == ""
+
+def test_snippet_markdown_keeps_only_the_match_markers():
+    assert snippet_markdown("…a **coffee** [shop](x)…") == r"…a **coffee** \[shop\]\(x\)…"
+    assert snippet_markdown("**_tea_**") == r"**\_tea\_**"
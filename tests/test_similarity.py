@@ -0,0 +1,38 @@
+import pytest
+import utils.similarity
+from utils.similarity import PromptIndex
+
+REPLIES = {"coffee": "```html\n<h1>Coffee</h1>\n```", "tea": "```html\n<h1>Tea</h1>\n```"}
+
+class FakeCache:
+    def get(self, key):
+        return REPLIES.get(key)
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils.similarity, "get_response_cache", FakeCache)
+    return PromptIndex(str(tmp_path / "similar_prompts.json"), threshold=0.5)
+
+def test_lookup_finds_near_duplicates(index):
+    index.add("A landing page for a coffee shop", "coffee", "key-a")
+    
+    match = index.lookup("landing page for coffee shop!", "key-a")
+    assert match["prompt"] == "A landing page for a coffee shop"
+    assert match["html"] == "<h1>Coffee</h1>"
+    assert index.lookup("an online store for shoes", "key-a") is None
+
+def test_lookup_only_matches_the_same_api_key(index):
+    index.add("A landing page for a coffee shop", "coffee", "key-a")
+    
+    assert index.lookup("A landing page for a coffee shop", "key-b") is None
+    
+    index.add("A landing page for a coffee shop", "coffee", "key-b")
+    assert index.lookup("A landing page for a coffee shop", "key-b")["html"] == "<h1>Coffee</h1>"
+    assert index.info()["entries"] == 2
+
+def test_owners_survive_a_reload(index, tmp_path):
+    index.add("A landing page for a tea shop", "tea", "key-a")
+    
+    reloaded = PromptIndex(str(tmp_path / "similar_prompts.json"), threshold=0.5)
+    assert reloaded.lookup("A landing page for a tea shop", "key-a")["html"] == "<h1>Tea</h1>"
+    assert reloaded.lookup("A landing page for a tea shop", "key-b") is None
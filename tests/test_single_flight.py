@@ -0,0 +1,45 @@
+import threading
+import utils.api
+from utils.api import CancelToken, SingleFlight
+
+def start_streams(monkeypatch, api_keys):
+    release = threading.Event()
+    calls = []
+    
+    def fake_stream(data, api_key, use_cache, cancel_token):
+        calls.append(api_key)
+        release.wait(5)
+        yield f"reply for {api_key}"
+    
+    monkeypatch.setattr(utils.api, "hedged_stream_completion", fake_stream)
+    single_flight = SingleFlight()
+    data = {"model": "m", "messages": [{"role": "user", "content": "A bakery"}]}
+    replies = [None] * len(api_keys)
+    
+    def subscribe(index, api_key):
+        replies[index] = "".join(single_flight.stream(data, api_key, False, CancelToken()))
+    
+    threads = [threading.Thread(target=subscribe, args=(i, key)) for i, key in enumerate(api_keys)]
+    for thread in threads:
+        thread.start()
+    while single_flight.info()["upstream"] + single_flight.info()["coalesced"] < len(api_keys):
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    
+    return single_flight.info(), calls, replies
+
+def test_identical_requests_share_one_call(monkeypatch):
+    info, calls, replies = start_streams(monkeypatch, ["key-a", "key-a", "key-a"])
+    
+    assert calls == ["key-a"]
+    assert (info["upstream"], info["coalesced"]) == (1, 2)
+    assert replies == ["reply for key-a"] * 3
+
+def test_requests_with_other_api_keys_are_not_shared(monkeypatch):
+    info, calls, replies = start_streams(monkeypatch, ["key-a", "key-b", "key-a"])
+    
+    assert sorted(calls) == ["key-a", "key-b"]
+    assert (info["upstream"], info["coalesced"]) == (2, 1)
+    assert sorted(replies) == ["reply for key-a", "reply for key-a", "reply for key-b"]
@@ -0,0 +1,44 @@
+import re
+import time
+from utils.telemetry import Telemetry
+
+def event(duration, outcome="ok"):
+    return {
+        "time": time.time(), "kind": "upstream", "model": "m", "outcome": outcome, "status": 200,
+        "queue_time": None, "connect_time": 0.1, "ttft": 0.2, "duration": duration,
+        "prompt_tokens": 10, "completion_tokens": 20, "tokens_estimated": False,
+        "bytes_received": 100, "cost": None
+    }
+
+def sample(text, name, labels='kind="upstream"'):
+    return float(re.search(rf"^deepsite_{name}{{{re.escape(labels)}}} (\S+)$", text, re.MULTILINE).group(1))
+
+def test_counters_survive_buffer_eviction():
+    telemetry = Telemetry(max_events=2, metrics_file="")
+    for duration in (1.0, 2.0, 3.0, 4.0):
+        telemetry.record(event(duration))
+    telemetry.record(event(5.0, outcome="error"))
+    
+    text = telemetry.prometheus()
+    assert len(telemetry.events()) == 2
+    assert sample(text, "duration_seconds_count") == 4
+    assert sample(text, "duration_seconds_sum") == 10.0
+    assert sample(text, "completion_tokens_total", 'kind="upstream",model="m",outcome="ok"') == 80
+
+def test_metrics_file_is_written_on_an_interval(tmp_path):
+    path = tmp_path / "metrics.prom"
+    telemetry = Telemetry(metrics_file=str(path), metrics_interval=0.2)
+    telemetry.record(event(1.0))
+    
+    for _ in range(100):
+        if path.exists():
+            break
+        time.sleep(0.01)
+    assert sample(path.read_text(), "duration_seconds_count") == 1
+    
+    telemetry.record(event(2.0))
+    telemetry.record(event(3.0))
+    assert sample(path.read_text(), "duration_seconds_count") == 1
+    
+    time.sleep(0.5)
+    assert sample(path.read_text(), "duration_seconds_count") == 3
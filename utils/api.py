@@ -1,148 +1,1943 @@
+import os
+import re
+import queue
+import random
+import asyncio
+import hashlib
 import requests
 import json
+import threading
 import streamlit as st
 import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager
+from requests.adapters import HTTPAdapter
+from utils.cache import get_response_cache, make_cache_key
+from utils.telemetry import track_request, estimate_tokens
+from utils.cassette import Cassette, CassetteClient, CASSETTE_FILE, CASSETTE_MODE, CASSETTE_SPEED, CASSETTE_STRICT
 
-def generate_html_with_ai(prompt, api_key):
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# OpenRouter endpoint and HTTP client settings
+OPENROUTER_API_BASE = os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1").rstrip("/")
+CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "120"))
+POOL_MAXSIZE = int(os.getenv("OPENROUTER_POOL_MAXSIZE", "32"))
+USE_HTTP2 = os.getenv("OPENROUTER_HTTP2", "").lower() in ("1", "true", "yes")
+
+# Number of characters per chunk when replaying a cached reply
+REPLAY_CHUNK_SIZE = 64
+
+# Models in order of preference, and how generations are routed between them
+DEFAULT_MODEL = "x-ai/grok-3-mini-beta"
+MODELS = [m.strip() for m in os.getenv("OPENROUTER_MODELS", DEFAULT_MODEL).split(",") if m.strip()] or [DEFAULT_MODEL]
+ROUTING_POLICY = os.getenv("OPENROUTER_ROUTING", "ordered")
+HEDGE_DEADLINE = float(os.getenv("OPENROUTER_HEDGE_DEADLINE", "8"))
+MAX_HEDGES = int(os.getenv("OPENROUTER_MAX_HEDGES", "1"))
+GENERATION_RETRIES = int(os.getenv("OPENROUTER_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("OPENROUTER_RETRY_BACKOFF", "0.5"))
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUSES = (408, 409, 425, 429, 500, 502, 503, 504)
+
+# A model is skipped while its recent error rate is above this threshold
+ERROR_RATE_THRESHOLD = 0.5
+ERROR_COOLDOWN = 60
+
+# Generation engine limits
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "16"))
+MAX_CONCURRENT_PER_KEY = int(os.getenv("MAX_CONCURRENT_PER_KEY", "4"))
+
+# Marks the end of a stream handed from a worker thread to the engine
+_STREAM_END = object()
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+class HttpClient:
     """
-    Generate HTML content using OpenRouter API.
+    A pooled, keep-alive HTTP client shared by every OpenRouter call.
+    
+    Wraps an httpx client when HTTP/2 is requested and available, and a
+    requests session otherwise, behind the small surface used in this module.
+    """
+    
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, pool_maxsize=POOL_MAXSIZE, http2=USE_HTTP2):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = False
+        self._client = None
+        self._session = None
+        
+        if http2 and httpx is not None:
+            try:
+                self._client = httpx.Client(
+                    http2=True,
+                    timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                    limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+                )
+                self.http2 = True
+            except ImportError:
+                # httpx is installed without the h2 extra
+                self._client = None
+        
+        if self._client is None:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+    
+    def post(self, url, headers, data, stream=False):
+        """
+        Send a POST request.
+        
+        Args:
+            url (str): The request URL
+            headers (dict): The request headers
+            data (str): The encoded request body
+            stream (bool): Whether to stream the response body
+            
+        Returns:
+            The response object of the underlying client
+        """
+        if self._client is not None:
+            request = self._client.build_request("POST", url, headers=headers, content=data)
+            return self._client.send(request, stream=stream)
+        
+        return self._session.post(
+            url,
+            headers=headers,
+            data=data,
+            stream=stream,
+            timeout=(self.connect_timeout, self.read_timeout)
+        )
+    
+    def get(self, url, headers):
+        """
+        Send a GET request.
+        
+        Args:
+            url (str): The request URL
+            headers (dict): The request headers
+            
+        Returns:
+            The response object of the underlying client
+        """
+        if self._client is not None:
+            return self._client.get(url, headers=headers)
+        
+        return self._session.get(url, headers=headers, timeout=(self.connect_timeout, self.read_timeout))
+    
+    def iter_lines(self, response):
+        """
+        Iterate over the lines of a streamed response as text.
+        
+        Args:
+            response: A response returned by post(..., stream=True)
+            
+        Returns:
+            generator: A generator that yields decoded lines
+        """
+        for line in response.iter_lines():
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            yield line
+    
+    def text(self, response):
+        """
+        Read the body of a (possibly streamed) response as text.
+        """
+        if self._client is not None:
+            response.read()
+        return response.text
+    
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        if self._client is not None:
+            self._client.close()
+        if self._session is not None:
+            self._session.close()
+
+def get_http_client():
+    """
+    Get the shared, process-wide HTTP client.
+    
+    The client is created on first use and reused across Streamlit reruns and
+    sessions so that TCP and TLS connections to OpenRouter are kept alive.
+    With OPENROUTER_CASSETTE set, it records to or replays from that cassette.
+    
+    Returns:
+        HttpClient: The shared HTTP client
+    """
+    global _http_client
+    
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                if CASSETTE_FILE:
+                    cassette = Cassette(CASSETTE_FILE, CASSETTE_MODE, CASSETTE_SPEED, CASSETTE_STRICT)
+                    _http_client = CassetteClient(cassette, HttpClient() if cassette.mode == "record" else None)
+                else:
+                    _http_client = HttpClient()
+    
+    return _http_client
+
+def use_cassette(path, mode="replay", speed=1.0, strict=False):
+    """
+    Record every OpenRouter call to a cassette, or replay them from one.
+    
+    Replays need no network or API key, so benchmarks and UI tests run
+    offline and deterministically. Pair it with use_cache=False (or an empty
+    response cache) to exercise the full request path.
+    
+    Args:
+        path (str): The cassette file
+        mode (str): "record" or "replay"
+        speed (float): Replay speed, 1 for the recorded timing, 0 for no delays
+        strict (bool): Whether requests that were not recorded fail with a 404
+        
+    Returns:
+        Cassette: The cassette, whose info() reports what was recorded or replayed
+    """
+    global _http_client
+    
+    cassette = Cassette(path, mode, speed, strict)
+    
+    with _http_client_lock:
+        previous = _http_client
+        _http_client = CassetteClient(cassette, HttpClient() if mode == "record" else None)
+    
+    if previous is not None:
+        previous.close()
+    
+    return cassette
+
+SYSTEM_PROMPT = (
+    "You are an expert frontend developer. Build complete, responsive, accessible and visually polished "
+    "websites following modern, minimal UI/UX principles: clear typographic hierarchy, consistent spacing, "
+    "smooth animations and transitions, and interactive components (cards, modals, sliders) that work on "
+    "every device. Reply with ONLY the complete HTML document, with all CSS and JavaScript inline, and no explanations."
+)
+
+# Token budgets. Input sizes are estimated (see estimate_tokens), so the
+# context window is never filled to the last token
+CONTEXT_TOKENS = int(os.getenv("OPENROUTER_CONTEXT_TOKENS", "131072"))
+NEW_SITE_MAX_TOKENS = int(os.getenv("NEW_SITE_MAX_TOKENS", "4000"))
+EDIT_MIN_TOKENS = 1024
+EDIT_MAX_TOKENS = 4000
+REGENERATION_MAX_TOKENS = 16000
+MIN_OUTPUT_TOKENS = 512
+
+# Tokens of chat formatting added to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Sampling temperature of new sites, and of each candidate in variants mode
+DEFAULT_TEMPERATURE = 0.7
+VARIANT_TEMPERATURES = [0.7, 1.0, 0.4, 1.2]
+MAX_VARIANTS = len(VARIANT_TEMPERATURES)
+
+class PromptTooLargeError(Exception):
+    """
+    A request whose input does not fit in the model's context window.
+    """
+    
+    def __init__(self, input_tokens, limit):
+        self.input_tokens = input_tokens
+        self.limit = limit
+        super().__init__(f"The request is too large: about {input_tokens} input tokens, but at most {limit} fit in the model's context window.")
+
+def compact_text(text):
+    """
+    Compact free-form instruction text before it is sent.
+    
+    Trailing whitespace and runs of blank lines are removed, and paragraphs
+    that repeat an earlier one are dropped. Indentation is kept, so code
+    pasted into a prompt is sent unchanged.
+    
+    Args:
+        text (str): The text to compact
+        
+    Returns:
+        str: The compacted text
+    """
+    paragraphs = []
+    seen = set()
+    
+    for paragraph in re.split(r"\n[ \t]*\n", (text or "").replace("\r\n", "\n")):
+        paragraph = "\n".join(line.rstrip() for line in paragraph.split("\n")).strip("\n")
+        key = " ".join(paragraph.split()).lower()
+        if key and key not in seen:
+            seen.add(key)
+            paragraphs.append(paragraph)
+    
+    return "\n\n".join(paragraphs)
+
+def estimate_message_tokens(messages):
+    """
+    Estimate the input tokens of a list of chat messages.
+    
+    Args:
+        messages (list): The chat messages
+        
+    Returns:
+        int: The estimated token count
+    """
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+def build_chat_request(messages, max_tokens, temperature, stream=False, model=None):
+    """
+    Build a chat completion request body that fits the context window.
+    
+    max_tokens is lowered if the input and the output together would not fit.
+    
+    Args:
+        messages (list): The chat messages
+        max_tokens (int): The output budget for this type of request
+        temperature (float): The sampling temperature
+        stream (bool): Whether to request a streamed response
+        model (str, optional): The preferred model, the first configured one by default
+        
+    Returns:
+        dict: The request body
+        
+    Raises:
+        PromptTooLargeError: If fewer than MIN_OUTPUT_TOKENS would be left for the reply
+    """
+    input_tokens = estimate_message_tokens(messages)
+    available = CONTEXT_TOKENS - input_tokens
+    
+    if available < MIN_OUTPUT_TOKENS:
+        raise PromptTooLargeError(input_tokens, CONTEXT_TOKENS - MIN_OUTPUT_TOKENS)
+    
+    data = {
+        "model": model or MODELS[0],
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": min(max_tokens, available),
+        "usage": {"include": True}
+    }
+    
+    if stream:
+        data["stream"] = True
+    
+    return data
+
+def build_request_data(prompt, stream=False, temperature=None, model=None):
+    """
+    Build the chat completion request body for a prompt.
+    
+    The blocking and streaming paths share this so that both send the same
+    system prompt and parameters and produce the same HTML.
     
     Args:
         prompt (str): The user's prompt for generating HTML
-        api_key (str): The OpenRouter API key
+        stream (bool): Whether to request a streamed response
+        temperature (float, optional): The sampling temperature, DEFAULT_TEMPERATURE by default
+        model (str, optional): The preferred model, the first configured one by default
         
     Returns:
-        str: The generated HTML content or None if generation failed
+        dict: The request body
+        
+    Raises:
+        PromptTooLargeError: If the prompt does not fit in the context window
     """
-    if not api_key:
-        st.error("API key is required for AI generation.")
-        return None
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": compact_text(prompt)}
+    ]
+    if temperature is None:
+        temperature = DEFAULT_TEMPERATURE
+    
+    return build_chat_request(messages, NEW_SITE_MAX_TOKENS, temperature, stream, model)
+
+def plan_variants(count):
+    """
+    Pick the model and temperature of each candidate in a variants generation.
     
-    # Add context to the prompt
-    full_prompt = f"""
-    You are an expert web developer. Create a complete HTML website based on the following description:
+    Candidates cycle through the configured models and VARIANT_TEMPERATURES,
+    so no two of them send the same request and none is coalesced with another.
+    
+    Args:
+        count (int): The number of candidates, at most MAX_VARIANTS
+        
+    Returns:
+        list: A dict with the model and temperature of each candidate
+    """
+    return [
+        {"model": MODELS[i % len(MODELS)], "temperature": VARIANT_TEMPERATURES[i]}
+        for i in range(min(count, MAX_VARIANTS))
+    ]
+
+# Fence languages that are never treated as the page body
+NON_HTML_FENCES = ("css", "js", "javascript", "json", "bash", "sh", "shell", "python", "py")
+
+# Extractor states
+_PROSE = 0
+_INFO = 1
+_BODY = 2
+_SKIP = 3
+_RAW = 4
+_DONE = 5
+
+class HtmlExtractor:
+    """
+    Incremental extractor for the HTML in a model reply.
     
-    {prompt}
+    Chunks of the reply are fed in as they arrive and only HTML is emitted:
+    prose around the code fence and the fence markers themselves are dropped
+    on the fly. Each character is examined once, and at most two trailing
+    backticks and a run of trailing whitespace are held back between chunks.
     
-    Provide ONLY the HTML code without any explanations or markdown formatting.
-    The HTML should be complete and ready to use, including all necessary CSS and JavaScript.
+    A reply is handled as follows:
+        - The first fenced block tagged html (or untagged) is the HTML.
+        - A reply starting with "<" and no fence is HTML as a whole.
+        - Otherwise, the first inline fence on a single line
+          ("```html<p>...</p>```") is the HTML.
+        - Otherwise, the first block with another language, or failing
+          that the whole reply, is returned at close().
     """
     
-    try:
-        # Call OpenRouter API
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "x-ai/grok-3-mini-beta",
-            "messages": [
-                {"role": "system", "content": "You are an expert web developer who specializes in crafting complete, highly functional, and visually stunning frontend interfaces. Your designs follow modern UI/UX principles with a strong focus on responsiveness, minimalism, and aesthetic elegance. You build sleek, interactive, and performance-optimized web applications that integrate smooth animations, motion effects, and dynamic transitions to enhance user experience. Each component you create—whether it's cards, modals, sliders, or interactive sections—is polished, visually engaging, and highly intuitive. You maintain clear typographic hierarchy, consistent spacing, and organized content flow throughout. The goal is to deliver seamless digital experiences with immersive visuals and fluid interactions that work flawlessly across all devices."},
-                {"role": "user", "content": full_prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 4000
-        }
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            data=json.dumps(data)
-        )
+    def __init__(self):
+        self._state = _PROSE
+        self._carry = ""
+        self._info = []
+        self._reply = []
+        self._inline = None
+        self._skipped = None
+        self._skipping_first = False
+        self._fenced = False
+        self._seen_text = False
+        self._started = False
+        self._pending = ""
+    
+    def feed(self, chunk):
+        """
+        Feed the next chunk of the reply.
         
-        if response.status_code == 200:
-            result = response.json()
-            generated_content = result["choices"][0]["message"]["content"]
+        Args:
+            chunk (str): The next chunk of the model reply
             
-            # Extract HTML from the response
-            # The model might wrap the HTML in markdown code blocks
-            if "```html" in generated_content:
-                html_content = generated_content.split("```html")[1].split("```")[0].strip()
-            elif "```" in generated_content:
-                html_content = generated_content.split("```")[1].split("```")[0].strip()
-            else:
-                html_content = generated_content.strip()
+        Returns:
+            str: The HTML that can be emitted so far (possibly empty)
+        """
+        if not self._started:
+            # The reply is kept as a fallback until the HTML starts
+            self._reply.append(chunk)
+        
+        text = self._carry + chunk if self._carry else chunk
+        self._carry = ""
+        out = []
+        
+        while text and self._state != _DONE:
+            if self._state == _PROSE:
+                if not self._fenced and not self._seen_text:
+                    stripped = text.lstrip()
+                    if not stripped:
+                        break
+                    self._seen_text = True
+                    if stripped[0] == "<":
+                        # Bare HTML without a code fence
+                        self._state = _RAW
+                        text = stripped
+                        continue
+                
+                index = text.find("```")
+                if index == -1:
+                    self._hold_backticks(text)
+                    break
+                
+                self._fenced = True
+                self._state = _INFO
+                text = text[index + 3:]
             
-            return html_content
-        else:
-            st.error(f"API error: {response.status_code} - {response.text}")
-            return None
+            elif self._state == _INFO:
+                newline = text.find("\n")
+                fence = text.find("```")
+                
+                if fence != -1 and (newline == -1 or fence < newline):
+                    # An inline ```...``` span rather than a block
+                    if self._inline is None:
+                        self._inline = self._inline_html("".join(self._info) + text[:fence])
+                    self._info = []
+                    self._state = _PROSE
+                    text = text[fence + 3:]
+                    continue
+                
+                if newline == -1:
+                    text = self._hold_backticks(text)
+                    self._info.append(text)
+                    break
+                
+                self._info.append(text[:newline])
+                language = "".join(self._info).strip().lower()
+                self._info = []
+                self._state = _SKIP if language in NON_HTML_FENCES else _BODY
+                if self._state == _SKIP:
+                    self._skipping_first = self._skipped is None
+                    if self._skipping_first:
+                        self._skipped = []
+                text = text[newline + 1:]
+            
+            elif self._state == _SKIP:
+                index = text.find("```")
+                if index == -1:
+                    text = self._hold_backticks(text)
+                    self._append_skipped(text)
+                    break
+                
+                self._append_skipped(text[:index])
+                self._state = _PROSE
+                text = text[index + 3:]
+            
+            elif self._state == _BODY:
+                index = text.find("```")
+                if index == -1:
+                    out.append(self._emit(self._hold_backticks(text)))
+                    break
+                
+                out.append(self._emit(text[:index]))
+                self._state = _DONE
+            
+            else:
+                out.append(self._emit(text))
+                break
+        
+        return "".join(out)
     
-    except Exception as e:
-        st.error(f"Error generating HTML: {str(e)}")
-        return None
+    def close(self):
+        """
+        Signal the end of the reply.
+        
+        Returns:
+            str: The remaining HTML, or the whole reply if it had no usable fence
+        """
+        carry = self._carry
+        self._carry = ""
+        
+        if self._state in (_BODY, _RAW):
+            # Backticks held back at the very end were part of the body
+            return self._emit(carry) if carry else ""
+        
+        if self._state == _DONE or self._started:
+            return ""
+        
+        if self._inline:
+            return self._inline
+        
+        if self._skipped is not None:
+            # Only non-HTML fences: fall back to the first one
+            return "".join(self._skipped).strip()
+        
+        return "".join(self._reply).strip()
+    
+    def _hold_backticks(self, text):
+        # Keep up to two trailing backticks for the next chunk, they may start a fence
+        count = 0
+        while count < 2 and count < len(text) and text[-1 - count] == "`":
+            count += 1
+        if count:
+            self._carry = text[-count:]
+            return text[:-count]
+        return text
+    
+    def _inline_html(self, span):
+        # The content of an inline fence, without its html tag
+        match = re.match(r"([A-Za-z]*)(.*)$", span.strip(), re.S)
+        if match.group(1).lower() not in ("", "html"):
+            return ""
+        return match.group(2).strip()
+    
+    def _append_skipped(self, text):
+        # Only the first non-HTML fence is kept as a fallback
+        if self._skipping_first:
+            self._skipped.append(text)
+    
+    def _emit(self, body):
+        # Strip leading whitespace of the body and hold back trailing whitespace
+        if not self._started:
+            body = body.lstrip()
+            if not body:
+                return ""
+            self._started = True
+            self._reply = []
+        
+        stripped = body.rstrip()
+        if not stripped:
+            self._pending += body
+            return ""
+        
+        out = self._pending + stripped if self._pending else stripped
+        self._pending = body[len(stripped):]
+        return out
 
-def stream_html_with_ai(prompt, api_key):
+def extract_html(generated_content):
     """
-    Stream HTML content generation using OpenRouter API.
+    Extract the HTML from a complete model reply.
     
     Args:
-        prompt (str): The user's prompt for generating HTML
-        api_key (str): The OpenRouter API key
+        generated_content (str): The full text of the model reply
         
     Returns:
-        generator: A generator that yields chunks of the generated HTML
+        str: The HTML content
     """
-    if not api_key:
-        st.error("API key is required for AI generation.")
-        return None
+    extractor = HtmlExtractor()
+    return extractor.feed(generated_content) + extractor.close()
+
+class OpenRouterError(Exception):
+    """
+    An error response from the OpenRouter API.
+    """
+    
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code} - {message}")
+        self.status_code = status_code
+        self.message = message
+
+class GenerationCancelled(Exception):
+    """
+    Raised when a generation is cancelled through its CancelToken.
+    """
+
+class CancelToken:
+    """
+    A handle for cooperatively cancelling a generation.
+    
+    Cancelling sets a flag that generation code checks between steps and
+    closes any response registered with the token, which interrupts a
+    streaming read in progress on another thread.
+    """
+    
+    def __init__(self):
+        self._event = threading.Event()
+        self._responses = []
+        self._lock = threading.Lock()
+        self.reason = None
+    
+    @property
+    def cancelled(self):
+        """
+        bool: Whether the token has been cancelled.
+        """
+        return self._event.is_set()
+    
+    def cancel(self, reason="cancelled"):
+        """
+        Cancel the generation and close its open responses.
+        
+        Args:
+            reason (str): Why the generation was cancelled, kept from the first call
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self.reason = reason
+            self._event.set()
+            responses, self._responses = self._responses, []
+        
+        for response in responses:
+            try:
+                response.close()
+            except Exception:
+                pass
+    
+    def wait(self, timeout):
+        """
+        Sleep for up to timeout seconds, waking early on cancellation.
+        
+        Returns:
+            bool: Whether the token has been cancelled
+        """
+        return self._event.wait(timeout)
     
-    # Add context to the prompt
-    full_prompt = f"""
-    You are an expert web developer. Create a complete HTML website based on the following description:
+    def check(self):
+        """
+        Raise GenerationCancelled if the token has been cancelled.
+        """
+        if self._event.is_set():
+            raise GenerationCancelled()
     
-    {prompt}
+    def register(self, response):
+        """
+        Register an open response to be closed on cancellation.
+        
+        Args:
+            response: The response object of the HTTP client
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._responses.append(response)
+                return
+        
+        response.close()
+        raise GenerationCancelled()
     
-    Provide ONLY the HTML code without any explanations or markdown formatting.
-    The HTML should be complete and ready to use, including all necessary CSS and JavaScript.
+    def unregister(self, response):
+        """
+        Forget a response that has been closed.
+        """
+        with self._lock:
+            if response in self._responses:
+                self._responses.remove(response)
+
+def replay_chunks(content, chunk_size=REPLAY_CHUNK_SIZE):
     """
+    Split a complete reply into chunks as if it were being streamed.
     
-    try:
-        # Call OpenRouter API with streaming
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "x-ai/grok-3-mini-beta",
-            "messages": [
-                {"role": "system", "content": "You are an expert web developer who creates complete, functional HTML websites."},
-                {"role": "user", "content": full_prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 4000,
-            "stream": True
-        }
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+    Args:
+        content (str): The complete model reply
+        chunk_size (int): The number of characters per chunk
+        
+    Returns:
+        generator: A generator that yields chunks of the reply
+    """
+    for i in range(0, len(content), chunk_size):
+        yield content[i:i + chunk_size]
+
+def request_completion(data, api_key, use_cache=True, cancel_token=None):
+    """
+    Send a chat completion request and wait for the whole reply.
+    
+    The reply is streamed and assembled, so that the upstream connection can
+    be closed in the middle of a generation, and identical concurrent
+    requests share one upstream call.
+    
+    Args:
+        data (dict): The request body
+        api_key (str): The OpenRouter API key
+        use_cache (bool): Whether to serve and store the reply in the response cache
+        cancel_token (CancelToken, optional): A token to cancel the request with
+        
+    Returns:
+        str: The raw model reply
+        
+    Raises:
+        OpenRouterError: If the API returns an error status
+        GenerationCancelled: If the request was cancelled
+    """
+    return "".join(get_single_flight().stream(data, api_key, use_cache, cancel_token or CancelToken()))
+
+def stream_completion(data, api_key, use_cache=True, cancel_token=None):
+    """
+    Send a streaming chat completion request.
+    
+    Cache hits are replayed through the same generator so callers see the
+    same chunked output either way. Only replies that were streamed to the
+    end are cached.
+    
+    Args:
+        data (dict): The request body
+        api_key (str): The OpenRouter API key
+        use_cache (bool): Whether to serve and store the reply in the response cache
+        cancel_token (CancelToken, optional): A token to cancel the stream with
+        
+    Returns:
+        generator: A generator that yields chunks of the model reply
+        
+    Raises:
+        OpenRouterError: If the API returns an error status
+        GenerationCancelled: If the stream was cancelled
+    """
+    if cancel_token is not None:
+        cancel_token.check()
+    
+    data = dict(data, stream=True)
+    cache_key = make_cache_key(data)
+    
+    if use_cache:
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            yield from replay_chunks(cached)
+            return
+    
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    
+    client = get_http_client()
+    
+    with track_request("upstream", data, cancel_token) as request:
+        response = client.post(
+            f"{OPENROUTER_API_BASE}/chat/completions",
             headers=headers,
             data=json.dumps(data),
             stream=True
         )
+        request.connected(response.status_code)
         
-        if response.status_code == 200:
-            for line in response.iter_lines():
+        if cancel_token is not None:
+            cancel_token.register(response)
+        
+        try:
+            if response.status_code != 200:
+                raise OpenRouterError(response.status_code, client.text(response))
+            
+            parts = []
+            for line in client.iter_lines(response):
+                if cancel_token is not None:
+                    cancel_token.check()
+                request.received(len(line) + 1)
                 if line:
-                    line = line.decode('utf-8')
                     if line.startswith('data: '):
-                        data = line[6:]
-                        if data == '[DONE]':
+                        event = line[6:]
+                        if event == '[DONE]':
                             break
                         try:
-                            chunk = json.loads(data)
+                            chunk = json.loads(event)
+                            if chunk.get('usage'):
+                                request.usage = chunk['usage']
                             if 'choices' in chunk and len(chunk['choices']) > 0:
                                 delta = chunk['choices'][0].get('delta', {})
-                                if 'content' in delta:
+                                if delta.get('content'):
+                                    request.content(delta['content'])
+                                    parts.append(delta['content'])
                                     yield delta['content']
                         except json.JSONDecodeError:
                             continue
+            
+            if use_cache and parts:
+                get_response_cache().put(cache_key, "".join(parts))
+        
+        except Exception:
+            # A read interrupted by cancel() surfaces as a connection error
+            if cancel_token is not None:
+                cancel_token.check()
+            raise
+        
+        finally:
+            # Release the connection back to the pool even if the consumer stops early
+            if cancel_token is not None:
+                cancel_token.unregister(response)
+            response.close()
+
+def is_retryable_error(error):
+    """
+    Check whether a failed request is worth retrying.
+    
+    Args:
+        error (Exception): The error raised by the request
+        
+    Returns:
+        bool: True for throttling, server errors and network failures
+    """
+    if isinstance(error, OpenRouterError):
+        return error.status_code in RETRYABLE_STATUSES
+    return isinstance(error, (requests.ConnectionError, requests.Timeout)) or (
+        httpx is not None and isinstance(error, httpx.TransportError)
+    )
+
+class ModelStats:
+    """
+    Rolling statistics of one model, used to route generations.
+    """
+    
+    # Weight of the newest sample in the moving averages
+    ALPHA = 0.2
+    
+    def __init__(self, model):
+        self.model = model
+        self.requests = 0
+        self.errors = 0
+        self.ttft = None
+        self.error_rate = 0.0
+        self.last_error_at = 0.0
+    
+    def record_success(self, ttft):
+        self.requests += 1
+        self.ttft = ttft if self.ttft is None else self.ALPHA * ttft + (1 - self.ALPHA) * self.ttft
+        self.error_rate = (1 - self.ALPHA) * self.error_rate
+    
+    def record_error(self):
+        self.requests += 1
+        self.errors += 1
+        self.error_rate = self.ALPHA + (1 - self.ALPHA) * self.error_rate
+        self.last_error_at = time.time()
+    
+    def is_healthy(self):
+        return self.error_rate <= ERROR_RATE_THRESHOLD or time.time() - self.last_error_at > ERROR_COOLDOWN
+
+class ModelRouter:
+    """
+    Orders the configured models for each generation.
+    
+    With the "ordered" policy the model named in the request comes first,
+    then the configured order is kept; with "fastest" models are ordered by
+    their moving-average time to first token. Either way, models whose recent
+    error rate is above ERROR_RATE_THRESHOLD move to the back until
+    ERROR_COOLDOWN seconds after their last error.
+    """
+    
+    def __init__(self, models=None, policy=ROUTING_POLICY):
+        self.models = list(models or MODELS)
+        self.policy = policy
+        self._stats = {}
+        self._lock = threading.Lock()
+    
+    def order(self, preferred=None):
+        """
+        Get the models to try for a generation, best first.
+        
+        Args:
+            preferred (str, optional): The model named in the request
+            
+        Returns:
+            list: The model IDs in the order they should be tried
+        """
+        models = list(self.models)
+        if preferred:
+            if preferred in models:
+                models.remove(preferred)
+            models.insert(0, preferred)
+        
+        with self._lock:
+            stats = [self._stats.get(model) for model in models]
+            healthy = [stat is None or stat.is_healthy() for stat in stats]
+            ttfts = [stat.ttft if stat is not None and stat.ttft is not None else float("inf") for stat in stats]
+        
+        if self.policy == "fastest":
+            keys = [(not healthy[i], ttfts[i], i) for i in range(len(models))]
         else:
-            st.error(f"API error: {response.status_code} - {response.text}")
-            return None
+            keys = [(not healthy[i], i) for i in range(len(models))]
+        
+        return [models[key[-1]] for key in sorted(keys)]
     
-    except Exception as e:
-        st.error(f"Error generating HTML: {str(e)}")
-        return None 
\ No newline at end of file
+    def record_success(self, model, ttft):
+        """
+        Record a request that produced its first token after ttft seconds.
+        """
+        with self._lock:
+            self._stats.setdefault(model, ModelStats(model)).record_success(ttft)
+    
+    def record_error(self, model):
+        """
+        Record a failed request.
+        """
+        with self._lock:
+            self._stats.setdefault(model, ModelStats(model)).record_error()
+    
+    def info(self):
+        """
+        Get the statistics of every model.
+        
+        Returns:
+            list: One dictionary per model
+        """
+        with self._lock:
+            return [
+                {
+                    "model": model,
+                    "requests": stat.requests,
+                    "errors": stat.errors,
+                    "error_rate": round(stat.error_rate, 3),
+                    "ttft": round(stat.ttft, 3) if stat.ttft is not None else None,
+                    "healthy": stat.is_healthy()
+                }
+                for model, stat in ((m, self._stats.get(m) or ModelStats(m)) for m in self.models)
+            ]
+
+_model_router = ModelRouter()
+
+def get_model_router():
+    """
+    Get the process-wide model router.
+    
+    Returns:
+        ModelRouter: The model router
+    """
+    return _model_router
+
+class _QueueCloser:
+    """
+    Puts a cancellation event on a queue when the CancelToken it is registered with is cancelled.
+    """
+    
+    def __init__(self, events):
+        self.events = events
+    
+    def close(self):
+        self.events.put((None, "cancel", None))
+
+def _run_attempt(index, model, data, api_key, token, events):
+    # Stream one model, retrying failures that happen before the first token
+    router = get_model_router()
+    retries = 0
+    
+    while True:
+        start = time.monotonic()
+        received = False
+        
+        try:
+            for chunk in stream_completion(data, api_key, False, token):
+                if not received:
+                    received = True
+                    router.record_success(model, time.monotonic() - start)
+                events.put((index, "chunk", chunk))
+            
+            if not received:
+                router.record_success(model, time.monotonic() - start)
+            events.put((index, "done", None))
+            return
+        
+        except Exception as e:
+            if token.cancelled:
+                events.put((index, "error", GenerationCancelled()))
+                return
+            
+            router.record_error(model)
+            
+            if not received and retries < GENERATION_RETRIES and is_retryable_error(e):
+                retries += 1
+                # Exponential backoff with full jitter
+                if token.wait(random.uniform(0, RETRY_BACKOFF * 2 ** (retries - 1))):
+                    events.put((index, "error", GenerationCancelled()))
+                    return
+                continue
+            
+            events.put((index, "error", e))
+            return
+
+def hedged_stream_completion(data, api_key, use_cache=True, cancel_token=None):
+    """
+    Stream a chat completion across the configured models.
+    
+    The best model (see ModelRouter) is tried first. If it has not produced
+    its first token within HEDGE_DEADLINE seconds, the next model is started
+    as a hedge, up to MAX_HEDGES at a time. Whichever streams first wins and
+    the others are cancelled. Failures before the first token are retried
+    with jittered backoff, then fall back to the next model.
+    
+    Args:
+        data (dict): The request body; its model is the preferred one
+        api_key (str): The OpenRouter API key
+        use_cache (bool): Whether to serve and store the reply in the response cache
+        cancel_token (CancelToken, optional): A token to cancel the stream with
+        
+    Returns:
+        generator: A generator that yields chunks of the model reply
+        
+    Raises:
+        OpenRouterError: If every model failed with an error status
+        GenerationCancelled: If the stream was cancelled
+    """
+    cache_key = make_cache_key(data)
+    
+    if use_cache:
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            yield from replay_chunks(cached)
+            return
+    
+    models = get_model_router().order(data.get("model"))
+    events = queue.Queue()
+    tokens = []
+    running = set()
+    
+    def launch():
+        index = len(tokens)
+        token = CancelToken()
+        tokens.append(token)
+        running.add(index)
+        threading.Thread(
+            target=_run_attempt,
+            args=(index, models[index], dict(data, model=models[index]), api_key, token, events),
+            name="generation-attempt",
+            daemon=True
+        ).start()
+    
+    closer = _QueueCloser(events)
+    if cancel_token is not None:
+        cancel_token.register(closer)
+    
+    winner = None
+    last_error = None
+    parts = []
+    
+    try:
+        launch()
+        deadline = time.monotonic() + HEDGE_DEADLINE
+        
+        while True:
+            timeout = None
+            if winner is None and len(tokens) < len(models) and len(running) <= MAX_HEDGES:
+                timeout = max(0.0, deadline - time.monotonic())
+            
+            try:
+                index, kind, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                # No first token yet: hedge with the next model
+                launch()
+                deadline = time.monotonic() + HEDGE_DEADLINE
+                continue
+            
+            if kind == "cancel":
+                cancel_token.check()
+                continue
+            
+            if winner is not None and index != winner:
+                continue
+            
+            if kind == "chunk":
+                if winner is None:
+                    winner = index
+                    for other, token in enumerate(tokens):
+                        if other != index:
+                            token.cancel("lost")
+                parts.append(payload)
+                yield payload
+            
+            elif kind == "done":
+                winner = index
+                break
+            
+            else:
+                running.discard(index)
+                if winner == index:
+                    raise payload
+                
+                if not isinstance(payload, GenerationCancelled):
+                    last_error = payload
+                
+                if not running:
+                    if len(tokens) == len(models):
+                        raise last_error or payload
+                    # Every attempt so far failed: fall back to the next model
+                    launch()
+                    deadline = time.monotonic() + HEDGE_DEADLINE
+        
+        if use_cache and parts:
+            get_response_cache().put(cache_key, "".join(parts))
+    
+    finally:
+        if cancel_token is not None:
+            cancel_token.unregister(closer)
+        for index, token in enumerate(tokens):
+            if index != winner:
+                token.cancel("lost")
+            else:
+                token.cancel("finished")
+
+class _Waker:
+    """
+    Wakes the waiters of a condition when the CancelToken it is registered with is cancelled.
+    """
+    
+    def __init__(self, condition):
+        self.condition = condition
+    
+    def close(self):
+        with self.condition:
+            self.condition.notify_all()
+
+class Flight:
+    """
+    One upstream stream shared by every subscriber of the same request.
+    
+    Chunks are buffered for the lifetime of the flight, so subscribers that
+    join late first receive the prefix they missed.
+    """
+    
+    def __init__(self, key):
+        self.key = key
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.token = CancelToken()
+        self.condition = threading.Condition()
+    
+    def publish(self, chunk):
+        """
+        Append a chunk and wake the subscribers.
+        """
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+    
+    def finish(self, error=None):
+        """
+        Mark the flight as done, optionally with the error that ended it.
+        """
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+    
+    def iterate(self, cancel_token=None):
+        """
+        Iterate over the chunks of the flight from the beginning.
+        
+        Args:
+            cancel_token (CancelToken, optional): The subscriber's own token
+            
+        Returns:
+            generator: A generator that yields the chunks of the reply
+        """
+        waker = _Waker(self.condition)
+        if cancel_token is not None:
+            cancel_token.register(waker)
+        
+        index = 0
+        try:
+            while True:
+                with self.condition:
+                    while index == len(self.chunks) and not self.done:
+                        if cancel_token is not None:
+                            cancel_token.check()
+                        self.condition.wait()
+                    
+                    if cancel_token is not None:
+                        cancel_token.check()
+                    
+                    new_chunks = self.chunks[index:]
+                    index = len(self.chunks)
+                    finished = self.done and index == len(self.chunks)
+                    error = self.error
+                
+                for chunk in new_chunks:
+                    yield chunk
+                
+                if finished:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            if cancel_token is not None:
+                cancel_token.unregister(waker)
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests into one upstream stream.
+    
+    Requests are identical when their cache keys match (model, messages and
+    sampling parameters) and they use the same API key, so a request is
+    never served by a call authorized and billed through another user's
+    key. The first subscriber starts the upstream stream on
+    its own thread; everyone else attaches to it. The upstream is cancelled
+    only when its last subscriber leaves before it is done.
+    """
+    
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {"upstream": 0, "coalesced": 0, "abandoned": 0}
+    
+    def stream(self, data, api_key, use_cache=True, cancel_token=None):
+        """
+        Stream a chat completion, sharing the upstream with identical requests.
+        
+        Args:
+            data (dict): The request body
+            api_key (str): The OpenRouter API key, used if this request leads the flight
+            use_cache (bool): Whether to serve and store the reply in the response cache
+            cancel_token (CancelToken, optional): A token to detach this subscriber with
+            
+        Returns:
+            generator: A generator that yields chunks of the model reply
+        """
+        key = (get_concurrency_key(api_key), make_cache_key(data))
+        
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight(key)
+                self.stats["upstream"] += 1
+            else:
+                self.stats["coalesced"] += 1
+            flight.subscribers += 1
+        
+        if leader:
+            threading.Thread(
+                target=self._run,
+                args=(flight, data, api_key, use_cache),
+                name="generation-flight",
+                daemon=True
+            ).start()
+        
+        try:
+            yield from flight.iterate(cancel_token)
+        finally:
+            with self._lock:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.done
+                if abandoned:
+                    self._forget(flight)
+                    self.stats["abandoned"] += 1
+            
+            if abandoned:
+                flight.token.cancel("abandoned")
+    
+    def info(self):
+        """
+        Get the coalescing counters.
+        
+        Returns:
+            dict: The counters plus the number of flights in progress
+        """
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._flights))
+    
+    def _run(self, flight, data, api_key, use_cache):
+        try:
+            for chunk in hedged_stream_completion(data, api_key, use_cache, flight.token):
+                flight.publish(chunk)
+            error = None
+        except BaseException as e:
+            error = e
+        
+        # Later identical requests start a new flight (or hit the cache)
+        with self._lock:
+            self._forget(flight)
+        flight.finish(error)
+    
+    def _forget(self, flight):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+_single_flight = SingleFlight()
+
+def get_single_flight():
+    """
+    Get the process-wide request coalescer.
+    
+    Returns:
+        SingleFlight: The request coalescer
+    """
+    return _single_flight
+
+_engine_loop = None
+_engine_thread = None
+_engine_lock = threading.Lock()
+_engine_executor = None
+_global_semaphore = None
+_key_semaphores = {}
+
+def get_engine_loop():
+    """
+    Get the event loop of the generation engine.
+    
+    The loop runs in a daemon thread shared by the whole process, so every
+    session submits its generations to the same bounded engine.
+    
+    Returns:
+        asyncio.AbstractEventLoop: The engine's event loop
+    """
+    global _engine_loop, _engine_thread, _engine_executor
+    
+    if _engine_loop is None:
+        with _engine_lock:
+            if _engine_loop is None:
+                loop = asyncio.new_event_loop()
+                _engine_executor = ThreadPoolExecutor(
+                    max_workers=MAX_CONCURRENT_GENERATIONS,
+                    thread_name_prefix="generation"
+                )
+                loop.set_default_executor(_engine_executor)
+                _engine_thread = threading.Thread(target=loop.run_forever, name="generation-engine", daemon=True)
+                _engine_thread.start()
+                _engine_loop = loop
+    
+    return _engine_loop
+
+def configure_engine(max_concurrent=None, max_per_key=None):
+    """
+    Change the engine's concurrency limits.
+    
+    Must be called before the first generation, e.g. by command-line tools
+    that want more parallelism than the interactive defaults.
+    
+    Args:
+        max_concurrent (int, optional): Generations in flight per process
+        max_per_key (int, optional): Generations in flight per API key
+    """
+    global MAX_CONCURRENT_GENERATIONS, MAX_CONCURRENT_PER_KEY
+    
+    if _engine_loop is not None:
+        raise RuntimeError("configure_engine() must be called before the engine is started.")
+    
+    if max_concurrent is not None:
+        MAX_CONCURRENT_GENERATIONS = max_concurrent
+    if max_per_key is not None:
+        MAX_CONCURRENT_PER_KEY = max_per_key
+
+def get_concurrency_key(api_key):
+    """
+    Get the key that per-key concurrency limits are applied to.
+    
+    Args:
+        api_key (str): The OpenRouter API key
+        
+    Returns:
+        str: A short digest of the API key, so raw keys are never kept
+    """
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+@asynccontextmanager
+async def generation_slot(concurrency_key):
+    """
+    Hold one global and one per-key generation slot.
+    
+    Args:
+        concurrency_key (str): The key the per-key limit applies to
+    """
+    global _global_semaphore
+    
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+    
+    key_semaphore = _key_semaphores.get(concurrency_key)
+    if key_semaphore is None:
+        key_semaphore = _key_semaphores[concurrency_key] = asyncio.Semaphore(MAX_CONCURRENT_PER_KEY)
+    
+    async with _global_semaphore:
+        async with key_semaphore:
+            yield
+
+async def agenerate_completion(data, api_key, use_cache=True, cancel_token=None, concurrency_key=None):
+    """
+    Send a blocking chat completion request from the generation engine.
+    
+    The request runs on a worker thread once a slot is free and is streamed
+    under the hood, so that cancelling the caller (or the token) closes the
+    upstream connection instead of waiting for the reply.
+    
+    Args:
+        data (dict): The request body
+        api_key (str): The OpenRouter API key
+        use_cache (bool): Whether to serve and store the reply in the response cache
+        cancel_token (CancelToken, optional): A token to cancel the request with
+        concurrency_key (str, optional): The per-key limit to apply, the API key by default
+        
+    Returns:
+        str: The raw model reply
+    """
+    token = cancel_token or CancelToken()
+    loop = asyncio.get_running_loop()
+    
+    with track_request("generation", data, token) as request:
+        async with generation_slot(concurrency_key or get_concurrency_key(api_key)):
+            request.queued()
+            token.check()
+            try:
+                generated_content = await loop.run_in_executor(None, request_completion, data, api_key, use_cache, token)
+            except asyncio.CancelledError:
+                token.cancel()
+                raise
+        
+        request.completion_chars = len(generated_content)
+        return generated_content
+
+async def astream_completion(data, api_key, use_cache=True, cancel_token=None, concurrency_key=None):
+    """
+    Stream a chat completion from the generation engine.
+    
+    A worker thread reads the stream and hands chunks to the event loop.
+    Identical concurrent requests share one upstream stream (see SingleFlight).
+    When the consumer is cancelled or stops early, the token is cancelled,
+    which detaches it and closes the upstream response if nobody else is
+    reading it.
+    
+    Args:
+        data (dict): The request body
+        api_key (str): The OpenRouter API key
+        use_cache (bool): Whether to serve and store the reply in the response cache
+        cancel_token (CancelToken, optional): A token to cancel the stream with
+        concurrency_key (str, optional): The per-key limit to apply, the API key by default
+        
+    Returns:
+        async generator: An async generator that yields chunks of the model reply
+    """
+    token = cancel_token or CancelToken()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    
+    def pump():
+        try:
+            for chunk in get_single_flight().stream(data, api_key, use_cache, token):
+                loop.call_soon_threadsafe(queue.put_nowait, (chunk, None))
+            loop.call_soon_threadsafe(queue.put_nowait, (_STREAM_END, None))
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (_STREAM_END, e))
+    
+    with track_request("generation", data, token) as request:
+        async with generation_slot(concurrency_key or get_concurrency_key(api_key)):
+            request.queued()
+            token.check()
+            loop.run_in_executor(None, pump)
+            finished = False
+            
+            try:
+                while True:
+                    chunk, error = await queue.get()
+                    if error is not None:
+                        finished = True
+                        raise error
+                    if chunk is _STREAM_END:
+                        finished = True
+                        return
+                    request.content(chunk)
+                    yield chunk
+            finally:
+                if not finished:
+                    token.cancel()
+
+def run_sync(coro, poll=None, poll_interval=0.25):
+    """
+    Run a coroutine on the generation engine and wait for its result.
+    
+    Args:
+        coro: The coroutine to run
+        poll (callable, optional): Called every poll_interval seconds while
+            waiting. Streamlit interrupts a script run at its next st call, so a
+            poll that updates an element makes the wait interruptible.
+        poll_interval (float): Seconds between calls to poll
+        
+    Returns:
+        The result of the coroutine
+    """
+    loop = get_engine_loop()
+    
+    if threading.current_thread() is _engine_thread:
+        raise RuntimeError("run_sync() cannot be called from the generation engine thread.")
+    
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        if poll is not None:
+            while True:
+                try:
+                    return future.result(timeout=poll_interval)
+                except FutureTimeoutError:
+                    poll()
+        return future.result()
+    except BaseException:
+        # Interrupted while waiting: cancel the coroutine on the engine
+        future.cancel()
+        raise
+
+def iter_sync(agen):
+    """
+    Iterate an async generator on the generation engine from synchronous code.
+    
+    Closing the returned generator early closes the async generator too.
+    
+    Args:
+        agen: The async generator to iterate
+        
+    Returns:
+        generator: A generator that yields the items of the async generator
+    """
+    loop = get_engine_loop()
+    
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+class GenerationTracker:
+    """
+    Tracks the in-flight generation of each session.
+    
+    Starting a generation supersedes and cancels the session's previous one.
+    Background jobs (see utils.jobs) register here when they are submitted,
+    are cancelled through cancel() and end here when they finish.
+    Counters record how many requests were cut short; every generation is
+    counted once, as finished, failed, superseded or interrupted.
+    """
+    
+    def __init__(self):
+        self._active = {}
+        self._lock = threading.Lock()
+        self.counts = {"started": 0, "finished": 0, "failed": 0, "superseded": 0, "interrupted": 0}
+    
+    def begin(self, session_id):
+        """
+        Register a new generation for a session, cancelling the previous one.
+        
+        Args:
+            session_id (str): The Streamlit session ID
+            
+        Returns:
+            CancelToken: The token of the new generation
+        """
+        token = CancelToken()
+        
+        with self._lock:
+            previous = self._active.get(session_id)
+            self._active[session_id] = token
+            self.counts["started"] += 1
+            if previous is not None and not previous.cancelled:
+                self.counts["superseded"] += 1
+        
+        if previous is not None:
+            previous.cancel("superseded")
+        
+        return token
+    
+    def end(self, session_id, token, outcome):
+        """
+        Record the end of a generation.
+        
+        Args:
+            session_id (str): The Streamlit session ID
+            token (CancelToken): The token returned by begin()
+            outcome (str): "finished", "failed" or "interrupted"
+        """
+        with self._lock:
+            if self._active.get(session_id) is token:
+                del self._active[session_id]
+            # A cancelled generation was counted when it was superseded or cancelled
+            if token.cancelled:
+                return
+            self.counts[outcome] += 1
+        
+        if outcome == "interrupted":
+            token.cancel("interrupted")
+    
+    def cancel(self, session_id, token=None):
+        """
+        Cancel a session's in-flight generation, if any.
+        
+        Args:
+            session_id (str): The Streamlit session ID
+            token (CancelToken, optional): Only cancel the generation if it is
+                the one started with this token
+            
+        Returns:
+            bool: True if a generation was cancelled
+        """
+        with self._lock:
+            active = self._active.get(session_id)
+            if active is None or active.cancelled or (token is not None and active is not token):
+                return False
+            del self._active[session_id]
+            token = active
+            self.counts["interrupted"] += 1
+        
+        token.cancel("interrupted")
+        return True
+    
+    def in_flight(self):
+        """
+        Get the number of generations currently in flight.
+        """
+        with self._lock:
+            return len(self._active)
+    
+    def info(self):
+        """
+        Get the generation counters.
+        
+        Returns:
+            dict: The counters plus the number in flight
+        """
+        with self._lock:
+            return dict(self.counts, in_flight=len(self._active))
+
+_generation_tracker = GenerationTracker()
+
+def get_generation_tracker():
+    """
+    Get the process-wide generation tracker.
+    
+    Returns:
+        GenerationTracker: The generation tracker
+    """
+    return _generation_tracker
+
+def generate_html_with_ai(prompt, api_key, use_cache=True, cancel_token=None, poll=None):
+    """
+    Generate HTML content using OpenRouter API.
+    
+    Args:
+        prompt (str): The user's prompt for generating HTML
+        api_key (str): The OpenRouter API key
+        use_cache (bool): Whether to serve and store the reply in the response cache
+        cancel_token (CancelToken, optional): A token to cancel the generation with
+        poll (callable, optional): Called periodically while waiting, see run_sync()
+        
+    Returns:
+        str: The generated HTML content or None if generation failed
+    """
+    if not api_key:
+        st.error("API key is required for AI generation.")
+        return None
+    
+    try:
+        generated_content = run_sync(
+            agenerate_completion(build_request_data(prompt), api_key, use_cache, cancel_token),
+            poll=poll
+        )
+        return extract_html(generated_content)
+    
+    except GenerationCancelled:
+        return None
+    
+    except OpenRouterError as e:
+        st.error(f"API error: {e.status_code} - {e.message}")
+        return None
+    
+    except Exception as e:
+        st.error(f"Error generating HTML: {str(e)}")
+        return None
+
+def stream_html_with_ai(prompt, api_key, use_cache=True, cancel_token=None):
+    """
+    Stream HTML content generation using OpenRouter API.
+    
+    Args:
+        prompt (str): The user's prompt for generating HTML
+        api_key (str): The OpenRouter API key
+        use_cache (bool): Whether to serve and store the reply in the response cache
+        cancel_token (CancelToken, optional): A token to cancel the stream with
+        
+    Returns:
+        generator: A generator that yields chunks of the model reply
+    """
+    if not api_key:
+        st.error("API key is required for AI generation.")
+        return None
+    
+    try:
+        yield from iter_sync(astream_completion(build_request_data(prompt), api_key, use_cache, cancel_token))
+    
+    except GenerationCancelled:
+        return None
+    
+    except OpenRouterError as e:
+        st.error(f"API error: {e.status_code} - {e.message}")
+        return None
+    
+    except Exception as e:
+        st.error(f"Error generating HTML: {str(e)}")
+        return None
+
+class PatchError(Exception):
+    """
+    A patch returned by the model that could not be parsed or applied.
+    """
+
+EDIT_SYSTEM_PROMPT = """You are an expert web developer editing an existing HTML document.
+Reply ONLY with one or more search/replace blocks in exactly this format:
+
+<<<<<<< SEARCH
+lines copied exactly from the current document
+=======
+the lines that replace them
+>>>>>>> REPLACE
+
+Each SEARCH section must match the current document exactly, including indentation, and must be unique in it. Keep blocks as small as possible. Do not repeat unchanged parts of the document and do not add explanations."""
+
+# Number of previous prompts sent as context with an edit
+EDIT_HISTORY_LENGTH = 5
+
+_PATCH_BLOCK_PATTERN = re.compile(
+    r"<<<<<<< SEARCH\n(.*?)\n?=======\n(.*?)>>>>>>> REPLACE",
+    re.DOTALL
+)
+
+def build_edit_request_data(instruction, current_html, prompt_history=None):
+    """
+    Build the chat completion request body for an edit of the current page.
+    
+    The output budget grows with the size of the document. If the request is
+    too large, the oldest previous prompts are left out first.
+    
+    Args:
+        instruction (str): The user's edit instruction
+        current_html (str): The current HTML document
+        prompt_history (list, optional): The previous prompts for this page
+        
+    Returns:
+        dict: The request body
+        
+    Raises:
+        PromptTooLargeError: If the document and instruction alone do not fit
+    """
+    instruction = compact_text(instruction)
+    max_tokens = min(EDIT_MAX_TOKENS, max(EDIT_MIN_TOKENS, estimate_tokens(current_html) // 4 + 512))
+    
+    # The most recent distinct prompts, oldest first, without the instruction itself
+    recent = []
+    for previous in reversed(prompt_history or []):
+        previous = " ".join(compact_text(previous).split())
+        if previous and previous != " ".join(instruction.split()) and previous not in recent:
+            recent.insert(0, previous)
+        if len(recent) == EDIT_HISTORY_LENGTH:
+            break
+    
+    while True:
+        history = ""
+        if recent:
+            history = "Previous instructions for this page:\n" + "\n".join(f"- {p}" for p in recent) + "\n\n"
+        
+        user_prompt = f"""{history}Current document:
+```html
+{current_html}
+```
+
+Instruction: {instruction}"""
+        
+        messages = [
+            {"role": "system", "content": EDIT_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+        
+        try:
+            return build_chat_request(messages, max_tokens, 0.2)
+        except PromptTooLargeError:
+            if not recent:
+                raise
+            recent.pop(0)
+
+def parse_patch(reply):
+    """
+    Parse the search/replace blocks of a model reply.
+    
+    Args:
+        reply (str): The raw model reply
+        
+    Returns:
+        list: A list of (search, replace) tuples
+        
+    Raises:
+        PatchError: If the reply contains no valid block
+    """
+    reply = reply.replace("\r\n", "\n")
+    blocks = []
+    
+    for match in _PATCH_BLOCK_PATTERN.finditer(reply):
+        search, replace = match.group(1), match.group(2)
+        if not search.strip():
+            raise PatchError("A search block is empty.")
+        if replace.endswith("\n"):
+            replace = replace[:-1]
+        blocks.append((search, replace))
+    
+    if not blocks:
+        raise PatchError("The reply contains no search/replace blocks.")
+    
+    return blocks
+
+def apply_patch(html_content, blocks):
+    """
+    Apply search/replace blocks to a document.
+    
+    Every block must match exactly once, otherwise nothing is applied.
+    
+    Args:
+        html_content (str): The current HTML document
+        blocks (list): A list of (search, replace) tuples
+        
+    Returns:
+        str: The patched document
+        
+    Raises:
+        PatchError: If a block does not match exactly once
+    """
+    patched = html_content.replace("\r\n", "\n")
+    
+    for search, replace in blocks:
+        count = patched.count(search)
+        if count == 0:
+            raise PatchError(f"Search block not found: {search[:80]!r}")
+        if count > 1:
+            raise PatchError(f"Search block is ambiguous ({count} matches): {search[:80]!r}")
+        patched = patched.replace(search, replace, 1)
+    
+    return patched
+
+def build_regeneration_request_data(instruction, current_html, stream=False):
+    """
+    Build the request body for a full regeneration of an edit whose patch failed.
+    
+    The output budget is sized to the current document, which is rewritten
+    in full.
+    
+    Args:
+        instruction (str): The user's edit instruction
+        current_html (str): The current HTML document
+        stream (bool): Whether to request a streamed response
+        
+    Returns:
+        dict: The request body
+        
+    Raises:
+        PromptTooLargeError: If the document does not fit in the context window
+    """
+    user_prompt = f"""Apply this change to the website below and reply with the complete updated HTML.
+
+Change: {compact_text(instruction)}
+
+Current HTML:
+```html
+{current_html}
+```"""
+    
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+    max_tokens = min(REGENERATION_MAX_TOKENS, max(NEW_SITE_MAX_TOKENS, estimate_tokens(current_html) * 5 // 4 + 512))
+    return build_chat_request(messages, max_tokens, 0.7, stream)
+
+def edit_html_with_ai(instruction, current_html, api_key, prompt_history=None, use_cache=True, cancel_token=None, poll=None, on_fallback=None, on_chunk=None):
+    """
+    Edit the current HTML by asking the model for a patch.
+    
+    Only the changed parts of the document are generated. If the reply cannot
+    be parsed or applied, the whole page is regenerated instead.
+    
+    Args:
+        instruction (str): The user's edit instruction
+        current_html (str): The current HTML document
+        api_key (str): The OpenRouter API key
+        prompt_history (list, optional): The previous prompts for this page
+        use_cache (bool): Whether to serve and store the reply in the response cache
+        cancel_token (CancelToken, optional): A token to cancel the edit with
+        poll (callable, optional): Called periodically while waiting, see run_sync()
+        on_fallback (callable, optional): Called with the PatchError before the
+            full page is regenerated
+        on_chunk (callable, optional): Called with each chunk of the model
+            reply while the full page is regenerated
+            
+    Returns:
+        str: The edited HTML content
+        
+    Raises:
+        OpenRouterError: If the API returns an error status
+        GenerationCancelled: If the edit was cancelled
+        PromptTooLargeError: If the document does not fit in the context window
+    """
+    reply = run_sync(
+        agenerate_completion(
+            build_edit_request_data(instruction, current_html, prompt_history),
+            api_key,
+            use_cache,
+            cancel_token
+        ),
+        poll=poll
+    )
+    
+    try:
+        return apply_patch(current_html, parse_patch(reply))
+    except PatchError as e:
+        if on_fallback is not None:
+            on_fallback(e)
+    
+    chunks = []
+    for chunk in iter_sync(astream_completion(build_regeneration_request_data(instruction, current_html), api_key, use_cache, cancel_token)):
+        chunks.append(chunk)
+        if on_chunk is not None:
+            on_chunk(chunk)
+    
+    return extract_html("".join(chunks))
@@ -0,0 +1,335 @@
+import io
+import json
+import time
+import uuid
+import tarfile
+import zipfile
+import hashlib
+import datetime
+from utils.blobs import blob_key
+from utils.deployment import generate_readme
+from utils.revisions import check_entries
+
+# Layout version of exported archives
+ARCHIVE_VERSION = 1
+
+# Archive formats by file extension
+ARCHIVE_FORMATS = {".zip": "zip", ".tar": "tar", ".tar.gz": "tar.gz", ".tgz": "tar.gz"}
+
+MANIFEST_NAME = "manifest.json"
+
+def archive_format(path):
+    """
+    Get the archive format of a file name.
+    
+    Args:
+        path (str): The archive file name
+        
+    Returns:
+        str: "zip", "tar" or "tar.gz"
+        
+    Raises:
+        ValueError: If the extension is not a supported archive format
+    """
+    for extension, archive_type in sorted(ARCHIVE_FORMATS.items(), key=lambda item: -len(item[0])):
+        if path.lower().endswith(extension):
+            return archive_type
+    raise ValueError(f"Unsupported archive format: {path} (use .zip, .tar or .tar.gz)")
+
+def checksum(data):
+    """
+    Get the SHA-256 hex digest of a member's bytes.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def is_project_id(project_id):
+    """
+    Check that an ID has the form save_project() gives it.
+    
+    Project IDs become file names, so IDs from an archive are only accepted
+    as canonical UUIDs.
+    """
+    try:
+        return str(uuid.UUID(project_id)) == project_id
+    except (TypeError, ValueError, AttributeError):
+        return False
+
+def _project_member(project_id):
+    return f"projects/{project_id}.json"
+
+def _revisions_member(project_id):
+    return f"revisions/{project_id}.jsonl"
+
+class ArchiveWriter:
+    """
+    Write members to a zip or tar archive one at a time.
+    
+    Args:
+        fileobj (file): A binary file opened for writing
+        archive_type (str): "zip", "tar" or "tar.gz"
+    """
+    
+    def __init__(self, fileobj, archive_type):
+        self.archive_type = archive_type
+        self.bytes = 0
+        
+        if archive_type == "zip":
+            self._archive = zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            self._archive = tarfile.open(fileobj=fileobj, mode="w:gz" if archive_type == "tar.gz" else "w")
+    
+    def add(self, name, data):
+        """
+        Add a member.
+        
+        Args:
+            name (str): The member path
+            data (bytes): The member content
+        """
+        if self.archive_type == "zip":
+            self._archive.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._archive.addfile(info, io.BytesIO(data))
+        self.bytes += len(data)
+    
+    def close(self):
+        self._archive.close()
+
+class ArchiveReader:
+    """
+    Read members of a zip or tar archive by name, one at a time.
+    
+    Args:
+        fileobj (file): A seekable binary file opened for reading
+        
+    Raises:
+        ValueError: If the file is not a zip or tar archive
+    """
+    
+    def __init__(self, fileobj):
+        self._zip = None
+        self._tar = None
+        
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            self._zip = zipfile.ZipFile(fileobj)
+            return
+        
+        fileobj.seek(0)
+        try:
+            self._tar = tarfile.open(fileobj=fileobj, mode="r:*")
+        except tarfile.TarError:
+            raise ValueError("The file is not a zip or tar archive.")
+    
+    def read(self, name):
+        """
+        Read a member.
+        
+        Returns:
+            bytes: The member content, or None if there is no such member
+        """
+        try:
+            if self._zip is not None:
+                return self._zip.read(name)
+            member = self._tar.extractfile(name)
+            return member.read() if member is not None else None
+        except KeyError:
+            return None
+    
+    def close(self):
+        (self._zip or self._tar).close()
+
+def export_projects(store, fileobj, archive_type="zip", project_ids=None, progress=None):
+    """
+    Export projects to a zip or tar archive with a manifest.
+    
+    Projects are loaded and written one at a time. Each project is a JSON
+    member with its HTML, prompt history and dates, followed by its revision
+    history; the manifest at the end lists every project with the content
+    hash of its HTML and the SHA-256 checksum of every member.
+    
+    Args:
+        store (ProjectStore): The store to export from
+        fileobj (file): A binary file opened for writing
+        archive_type (str): "zip", "tar" or "tar.gz"
+        project_ids (list, optional): The projects to export; all if None
+        progress (callable, optional): Called with the number of exported projects and the total
+        
+    Returns:
+        dict: The number of exported projects, the bytes written and the seconds taken
+    """
+    start = time.perf_counter()
+    if project_ids is None:
+        project_ids = [project["id"] for project in store.list()]
+    
+    writer = ArchiveWriter(fileobj, archive_type)
+    manifest = {"version": ARCHIVE_VERSION, "created_at": datetime.datetime.now().isoformat(), "projects": [], "checksums": {}}
+    
+    try:
+        for index, project_id in enumerate(project_ids):
+            project_data = store.load(project_id)
+            if project_data is None:
+                continue
+            
+            data = json.dumps(project_data, indent=2).encode("utf-8")
+            writer.add(_project_member(project_id), data)
+            manifest["checksums"][_project_member(project_id)] = checksum(data)
+            
+            revisions = store.revision_entries(project_id)
+            if revisions:
+                data = "".join(json.dumps(entry) + "\n" for entry in revisions).encode("utf-8")
+                writer.add(_revisions_member(project_id), data)
+                manifest["checksums"][_revisions_member(project_id)] = checksum(data)
+            
+            manifest["projects"].append({
+                "id": project_id,
+                "name": project_data["name"],
+                "hash": blob_key(project_data["html_content"]),
+                "updated_at": project_data["updated_at"]
+            })
+            
+            if progress is not None:
+                progress(index + 1, len(project_ids))
+        
+        writer.add(MANIFEST_NAME, json.dumps(manifest, indent=2).encode("utf-8"))
+    finally:
+        writer.close()
+    
+    return {"projects": len(manifest["projects"]), "bytes": writer.bytes, "seconds": time.perf_counter() - start}
+
+def import_projects(store, fileobj, save=None, delete=None, progress=None):
+    """
+    Import the projects of an archive written by export_projects().
+    
+    Projects are read and verified one at a time: every project must have a
+    UUID matching its manifest entry, every member its checksum in the
+    manifest, every HTML its content hash and every revision log must replay.
+    Projects whose ID or HTML is already in the store are skipped. A project
+    that fails verification or that the store rejects is counted as failed,
+    is not left half-imported, and the import goes on.
+    
+    Args:
+        store (ProjectStore): The store to import into
+        fileobj (file): A seekable binary file with the archive
+        save (callable, optional): Stores a complete project; store.save if None
+        delete (callable, optional): Deletes a project by ID, to undo a save
+            whose revisions are rejected; store.delete if None
+        progress (callable, optional): Called with the number of processed projects and the total
+        
+    Returns:
+        dict: The number of imported, skipped and failed projects, the error
+            messages, the bytes read and the seconds taken
+            
+    Raises:
+        ValueError: If the archive has no readable manifest
+    """
+    start = time.perf_counter()
+    reader = ArchiveReader(fileobj)
+    counts = {"imported": 0, "skipped": 0, "failed": 0, "errors": [], "bytes": 0}
+    
+    try:
+        data = reader.read(MANIFEST_NAME)
+        try:
+            manifest = json.loads(data) if data is not None else None
+        except ValueError:
+            manifest = None
+        if not manifest or manifest.get("version") != ARCHIVE_VERSION:
+            raise ValueError("The archive has no supported manifest.json.")
+        
+        existing = store.list()
+        existing_ids = {project["id"] for project in existing}
+        existing_hashes = {project["hash"] for project in existing}
+        
+        for index, entry in enumerate(manifest["projects"]):
+            if not isinstance(entry, dict) or not is_project_id(entry.get("id")):
+                counts["failed"] += 1
+                counts["errors"].append(f"Manifest entry {index + 1}: the project ID is not valid")
+            elif entry["id"] in existing_ids or entry.get("hash") in existing_hashes:
+                counts["skipped"] += 1
+            else:
+                error = _import_project(store, reader, manifest["checksums"], entry, save or store.save, delete or store.delete, counts)
+                if error:
+                    counts["failed"] += 1
+                    counts["errors"].append(f"{entry.get('name')} ({entry['id']}): {error}")
+                else:
+                    counts["imported"] += 1
+                    existing_ids.add(entry["id"])
+                    existing_hashes.add(entry["hash"])
+            
+            if progress is not None:
+                progress(index + 1, len(manifest["projects"]))
+    finally:
+        reader.close()
+    
+    counts["seconds"] = time.perf_counter() - start
+    return counts
+
+def _import_project(store, reader, checksums, entry, save, delete, counts):
+    # Returns an error message, or None if the project was imported
+    members = {}
+    
+    for name in (_project_member(entry["id"]), _revisions_member(entry["id"])):
+        if name not in checksums:
+            continue
+        data = reader.read(name)
+        if data is None:
+            return f"{name} is missing"
+        if checksum(data) != checksums[name]:
+            return f"{name} does not match its checksum"
+        counts["bytes"] += len(data)
+        members[name] = data
+    
+    if _project_member(entry["id"]) not in members:
+        return "the project is not in the archive"
+    
+    try:
+        project_data = json.loads(members[_project_member(entry["id"])])
+        revisions = [json.loads(line) for line in members.get(_revisions_member(entry["id"]), b"").decode("utf-8").splitlines() if line]
+        if project_data["id"] != entry["id"]:
+            return "the project ID does not match the manifest"
+        if blob_key(project_data["html_content"]) != entry.get("hash"):
+            return "the HTML does not match its content hash"
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return f"the project is not readable: {e}"
+    
+    try:
+        check_entries(revisions)
+    except (ValueError, KeyError, TypeError) as e:
+        return f"the revision history is not valid: {e}"
+    
+    try:
+        save(project_data)
+    except Exception as e:
+        return f"the project could not be stored: {e}"
+    
+    if revisions:
+        try:
+            store.replace_revisions(entry["id"], revisions)
+        except Exception as e:
+            # Without its history the project would be skipped by a re-import
+            delete(entry["id"])
+            return f"the revision history could not be stored: {e}"
+    
+    return None
+
+def project_zip(project_data):
+    """
+    Build a zip of one project, ready to unpack and host.
+    
+    Args:
+        project_data (dict): The complete project
+        
+    Returns:
+        bytes: A zip with index.html, README.md and prompt_history.json
+    """
+    buffer = io.BytesIO()
+    
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("index.html", project_data["html_content"])
+        archive.writestr("README.md", generate_readme(project_data["name"], project_data["prompt_history"]))
+        archive.writestr("prompt_history.json", json.dumps(project_data["prompt_history"], indent=2))
+    
+    return buffer.getvalue()
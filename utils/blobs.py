@@ -0,0 +1,132 @@
+import os
+import zlib
+import hashlib
+import threading
+
+# zlib level of stored blobs; HTML typically shrinks 4-8x
+BLOB_COMPRESSION_LEVEL = 6
+
+def blob_key(text):
+    """
+    Get the content address of a text.
+    
+    Args:
+        text (str): The content
+        
+    Returns:
+        str: The SHA-256 hex digest of the UTF-8 encoded content
+    """
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def compress_blob(text):
+    """
+    Compress a text for storage.
+    """
+    return zlib.compress((text or "").encode("utf-8"), BLOB_COMPRESSION_LEVEL)
+
+def decompress_blob(data):
+    """
+    Decompress a stored text.
+    """
+    return zlib.decompress(data).decode("utf-8")
+
+class BlobStore:
+    """
+    A directory of zlib-compressed texts addressed by their SHA-256.
+    
+    Identical content is stored once. Blobs are written atomically and never
+    change, so readers need no locking; the owner of the store keeps the
+    reference counts and deletes blobs that are no longer referenced.
+    """
+    
+    def __init__(self, blobs_dir):
+        self.blobs_dir = blobs_dir
+        os.makedirs(blobs_dir, exist_ok=True)
+    
+    def put(self, text):
+        """
+        Store a text unless it is already stored.
+        
+        Args:
+            text (str): The content
+            
+        Returns:
+            tuple: The blob key and whether a new blob was written
+        """
+        key = blob_key(text)
+        path = self._path(key)
+        
+        if os.path.exists(path):
+            return key, False
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(compress_blob(text))
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        return key, True
+    
+    def get(self, key):
+        """
+        Read a text.
+        
+        Args:
+            key (str): The blob key
+            
+        Returns:
+            str: The content or None if there is no such blob
+        """
+        try:
+            with open(self._path(key), "rb") as f:
+                return decompress_blob(f.read())
+        except (OSError, ValueError):
+            return None
+    
+    def delete(self, key):
+        """
+        Delete a blob.
+        
+        Returns:
+            bool: True if the blob existed
+        """
+        try:
+            os.remove(self._path(key))
+            return True
+        except OSError:
+            return False
+    
+    def keys(self):
+        """
+        Iterate over the keys of every stored blob.
+        """
+        for prefix in os.listdir(self.blobs_dir):
+            prefix_dir = os.path.join(self.blobs_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for filename in os.listdir(prefix_dir):
+                if filename.endswith(".zz"):
+                    yield filename[:-3]
+    
+    def info(self):
+        """
+        Get the number of blobs and their compressed size on disk.
+        """
+        count = 0
+        stored = 0
+        for key in self.keys():
+            try:
+                stored += os.path.getsize(self._path(key))
+                count += 1
+            except OSError:
+                continue
+        return {"blobs": count, "stored_bytes": stored}
+    
+    def _path(self, key):
+        return os.path.join(self.blobs_dir, key[:2], f"{key}.zz")
@@ -0,0 +1,198 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from utils.project import PROJECTS_DIR
+
+# Response cache settings
+CACHE_DIR = os.path.join(PROJECTS_DIR, ".cache", "responses")
+CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def make_cache_key(data):
+    """
+    Make a content-addressed cache key for a chat completion request.
+    
+    Args:
+        data (dict): The request body
+        
+    Returns:
+        str: A SHA-256 hex digest of the model, messages and sampling parameters
+    """
+    keyed = {
+        "model": data.get("model"),
+        "messages": data.get("messages"),
+        "temperature": data.get("temperature"),
+        "max_tokens": data.get("max_tokens")
+    }
+    encoded = json.dumps(keyed, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+class ResponseCache:
+    """
+    A two-tier cache of raw model replies.
+    
+    The first tier is an in-memory LRU bounded by entry count and total size,
+    the second a directory of gzip-compressed entries shared by every process.
+    Entries older than the TTL are ignored and removed on access.
+    """
+    
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def get(self, key):
+        """
+        Look up a reply.
+        
+        Args:
+            key (str): The cache key
+            
+        Returns:
+            str: The cached reply or None if there is no fresh entry
+        """
+        now = time.time()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                content, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return content
+                self._remove(key)
+        
+        entry = self._read_disk(key)
+        if entry is not None:
+            content, created_at = entry
+            if now - created_at <= self.ttl:
+                with self._lock:
+                    self._insert(key, content, created_at)
+                    self.stats["disk_hits"] += 1
+                return content
+            self._delete_disk(key)
+        
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+    
+    def put(self, key, content):
+        """
+        Store a reply in both tiers.
+        
+        Args:
+            key (str): The cache key
+            content (str): The raw model reply
+        """
+        created_at = time.time()
+        
+        with self._lock:
+            self._insert(key, content, created_at)
+            self.stats["writes"] += 1
+        
+        self._write_disk(key, content, created_at)
+    
+    def clear(self):
+        """
+        Remove every entry from both tiers.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".json.gz"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, filename))
+                except OSError:
+                    pass
+    
+    def info(self):
+        """
+        Get the cache statistics.
+        
+        Returns:
+            dict: Hit and miss counters plus the size of the memory tier
+        """
+        with self._lock:
+            return dict(self.stats, memory_entries=len(self._entries), memory_bytes=self._size)
+    
+    def _insert(self, key, content, created_at):
+        if key in self._entries:
+            self._remove(key)
+        
+        size = len(content)
+        if size > self.max_bytes:
+            return
+        
+        self._entries[key] = (content, created_at)
+        self._size += size
+        
+        # Evict least recently used entries beyond the bounds
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+    
+    def _remove(self, key):
+        content, _ = self._entries.pop(key)
+        self._size -= len(content)
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+    
+    def _read_disk(self, key):
+        try:
+            with gzip.open(self._path(key), "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+            return entry["content"], entry["created_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _write_disk(self, key, content, created_at):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        try:
+            with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+                json.dump({"key": key, "created_at": created_at, "content": content}, f)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def _delete_disk(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+def get_response_cache():
+    """
+    Get the shared, process-wide response cache.
+    
+    Returns:
+        ResponseCache: The response cache
+    """
+    global _response_cache
+    
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    
+    return _response_cache
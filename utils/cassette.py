@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+from urllib.parse import urlsplit
+
+# Record/replay settings. With OPENROUTER_CASSETTE set, every OpenRouter
+# call is recorded to or replayed from that file instead of the network
+CASSETTE_FILE = os.getenv("OPENROUTER_CASSETTE", "")
+CASSETTE_MODE = os.getenv("OPENROUTER_CASSETTE_MODE", "replay")
+CASSETTE_SPEED = float(os.getenv("OPENROUTER_CASSETTE_SPEED", "1"))
+CASSETTE_STRICT = os.getenv("OPENROUTER_CASSETTE_STRICT", "").lower() in ("1", "true", "yes")
+
+CASSETTE_MODES = ("record", "replay")
+CASSETTE_VERSION = 2
+
+def request_key(method, path, body):
+    """
+    Get the key a recorded request is matched by.
+    
+    Args:
+        method (str): The HTTP method
+        path (str): The URL path, without the host
+        body (str): The encoded JSON request body, or None
+        
+    Returns:
+        str: A SHA-256 hex digest of the method, path and canonical body
+    """
+    if body:
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            pass
+    return hashlib.sha256(f"{method} {path}\n{body or ''}".encode("utf-8")).hexdigest()
+
+class Cassette:
+    """
+    A file of recorded OpenRouter responses.
+    
+    The file is JSON Lines: a header with the cassette version, then one
+    interaction per line, appended as it is recorded. Each interaction keeps the response status, the delay until the response
+    headers and, for streams, every server-sent event line with its offset
+    from the start of the request. API keys and other headers are never
+    stored. Replays match a request by its method, path and body; a request
+    that was not recorded gets the next recorded response of the same kind
+    in turn, unless the cassette is strict.
+    
+    Args:
+        path (str): The cassette file
+        mode (str): "record" to start a new recording, "replay" to serve one
+        speed (float): Replay speed, 1 for the recorded timing, 0 for no delays
+        strict (bool): Whether requests that were not recorded fail with a 404
+    """
+    
+    def __init__(self, path, mode=CASSETTE_MODE, speed=CASSETTE_SPEED, strict=CASSETTE_STRICT):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.strict = strict
+        self.interactions = []
+        self.stats = {"recorded": 0, "replayed": 0, "exact": 0, "missed": 0}
+        self._by_key = {}
+        self._by_kind = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+        
+        if mode == "replay":
+            self._load()
+        else:
+            self._start()
+    
+    def find(self, method, path, body, stream):
+        """
+        Find the recorded response for a request.
+        
+        Requests recorded more than once are answered with each recording in turn.
+        
+        Args:
+            method (str): The HTTP method
+            path (str): The URL path
+            body (str): The encoded request body, or None
+            stream (bool): Whether the response is streamed
+            
+        Returns:
+            dict: The interaction, or None if there is no match
+        """
+        key = request_key(method, path, body)
+        
+        with self._lock:
+            candidates = self._by_key.get(key)
+            exact = candidates is not None
+            if not exact and not self.strict:
+                candidates = self._by_kind.get((method, path, stream))
+            
+            if not candidates:
+                self.stats["missed"] += 1
+                return None
+            
+            cursor_key = key if exact else (method, path, stream)
+            cursor = self._cursors.get(cursor_key, 0)
+            self._cursors[cursor_key] = cursor + 1
+            
+            self.stats["replayed"] += 1
+            if exact:
+                self.stats["exact"] += 1
+            
+            return self.interactions[candidates[cursor % len(candidates)]]
+    
+    def add(self, interaction):
+        """
+        Append an interaction to the cassette file.
+        
+        Args:
+            interaction (dict): The recorded request and response
+        """
+        with self._lock:
+            self._index(interaction)
+            self.stats["recorded"] += 1
+            # Appended with the lock held, so concurrent recordings are written in turn
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(interaction) + "\n")
+    
+    def info(self):
+        """
+        Get the number of interactions and the record/replay counters.
+        
+        Returns:
+            dict: The statistics
+        """
+        with self._lock:
+            return dict(self.stats, interactions=len(self.interactions), mode=self.mode, path=self.path)
+    
+    def _index(self, interaction):
+        index = len(self.interactions)
+        self.interactions.append(interaction)
+        self._by_key.setdefault(interaction["key"], []).append(index)
+        kind = (interaction["method"], interaction["path"], interaction["stream"])
+        self._by_kind.setdefault(kind, []).append(index)
+    
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                lines = f.read().splitlines()
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Could not read cassette {self.path}: {e}")
+        
+        if not isinstance(header, dict) or header.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {self.path}: {header.get('version') if isinstance(header, dict) else None}")
+        
+        for number, line in enumerate(lines):
+            try:
+                interaction = json.loads(line)
+            except ValueError:
+                # A last line cut short by an interrupted recording is skipped
+                if number == len(lines) - 1:
+                    break
+                raise ValueError(f"Could not read cassette {self.path}: line {number + 2} is not valid JSON")
+            self._index(interaction)
+    
+    def _start(self):
+        # A recording replaces the file with just the header
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"version": CASSETTE_VERSION}) + "\n")
+
+class CassetteResponse:
+    """
+    A recorded response, played back with its recorded timing.
+    
+    Closing the response interrupts a replay in progress the way closing a
+    real connection does, so cancellation works the same.
+    """
+    
+    def __init__(self, interaction, speed, started_at):
+        self.status_code = interaction["status"]
+        self._interaction = interaction
+        self._speed = speed
+        self._started_at = started_at
+        self._closed = threading.Event()
+    
+    @property
+    def text(self):
+        if self._interaction.get("body") is not None:
+            return self._interaction["body"]
+        return "\n".join(line for _, line in self._interaction.get("lines") or [])
+    
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+    
+    def json(self):
+        return json.loads(self.text)
+    
+    def wait_until(self, offset):
+        """
+        Sleep until the given offset from the start of the request, scaled by the replay speed.
+        """
+        if self._speed > 0:
+            delay = self._started_at + offset / self._speed - time.monotonic()
+            if delay > 0:
+                self._closed.wait(delay)
+        
+        if self._closed.is_set():
+            raise requests.ConnectionError("The replayed response was closed.")
+    
+    def iter_lines(self):
+        for offset, line in self._interaction.get("lines") or []:
+            self.wait_until(offset)
+            yield line
+    
+    def close(self):
+        self._closed.set()
+
+class RecordingResponse:
+    """
+    A streamed response whose lines are recorded while they are read.
+    
+    The interaction is added to the cassette when the response is closed,
+    unless the stream was abandoned before its end (e.g. a cancelled hedge).
+    """
+    
+    def __init__(self, response, interaction, cassette, started_at):
+        self.response = response
+        self.interaction = interaction
+        self.cassette = cassette
+        self.started_at = started_at
+        self.complete = False
+        self._saved = False
+    
+    @property
+    def status_code(self):
+        return self.response.status_code
+    
+    def close(self):
+        self.response.close()
+        if not self._saved and (self.complete or self.interaction["body"] is not None):
+            self._saved = True
+            self.cassette.add(self.interaction)
+
+class CassetteClient:
+    """
+    An HTTP client that records to or replays from a cassette.
+    
+    It has the same surface as utils.api.HttpClient, so generations, the
+    response cache, telemetry and the UI run unchanged on top of it. In
+    record mode the requests go through the wrapped client.
+    
+    Args:
+        cassette (Cassette): The cassette
+        client (HttpClient, optional): The client that sends the requests in record mode
+    """
+    
+    http2 = False
+    
+    def __init__(self, cassette, client=None):
+        if cassette.mode == "record" and client is None:
+            raise ValueError("Recording a cassette needs an HTTP client.")
+        
+        self.cassette = cassette
+        self._client = client
+    
+    def post(self, url, headers, data, stream=False):
+        """
+        Send or replay a POST request. See HttpClient.post().
+        """
+        return self._request("POST", url, headers, data, stream)
+    
+    def get(self, url, headers):
+        """
+        Send or replay a GET request. See HttpClient.get().
+        """
+        return self._request("GET", url, headers, None, False)
+    
+    def iter_lines(self, response):
+        """
+        Iterate over the lines of a streamed response. See HttpClient.iter_lines().
+        """
+        if isinstance(response, CassetteResponse):
+            yield from response.iter_lines()
+            return
+        
+        lines = response.interaction["lines"]
+        for line in self._client.iter_lines(response.response):
+            lines.append([round(time.monotonic() - response.started_at, 4), line])
+            if line.strip() == "data: [DONE]":
+                response.complete = True
+            yield line
+        response.complete = True
+    
+    def text(self, response):
+        """
+        Read the body of a response as text. See HttpClient.text().
+        """
+        if isinstance(response, CassetteResponse):
+            return response.text
+        
+        body = self._client.text(response.response)
+        response.interaction["body"] = body
+        return body
+    
+    def close(self):
+        """
+        Close the wrapped client.
+        """
+        if self._client is not None:
+            self._client.close()
+    
+    def _request(self, method, url, headers, data, stream):
+        path = urlsplit(url).path
+        started_at = time.monotonic()
+        
+        if self.cassette.mode == "replay":
+            interaction = self.cassette.find(method, path, data, stream)
+            if interaction is None:
+                interaction = {
+                    "status": 404,
+                    "headers_after": 0,
+                    "body": json.dumps({"error": {"code": 404, "message": f"No recorded response for {method} {path} in {self.cassette.path}"}}),
+                    "lines": None
+                }
+            
+            response = CassetteResponse(interaction, self.cassette.speed, started_at)
+            response.wait_until(interaction["headers_after"])
+            return response
+        
+        if method == "GET":
+            response = self._client.get(url, headers)
+        else:
+            response = self._client.post(url, headers, data, stream)
+        
+        interaction = {
+            "method": method,
+            "path": path,
+            "key": request_key(method, path, data),
+            "stream": stream,
+            "request": json.loads(data) if data else None,
+            "status": response.status_code,
+            "headers_after": round(time.monotonic() - started_at, 4),
+            "body": None,
+            "lines": [] if stream else None
+        }
+        
+        if stream:
+            return RecordingResponse(response, interaction, self.cassette, started_at)
+        
+        interaction["body"] = response.text
+        self.cassette.add(interaction)
+        return response
@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 def init_session_state():
     """
@@ -86,6 +87,45 @@ def init_session_state():
     if "is_generating" not in st.session_state:
         st.session_state.is_generating = False
     
+    # Generation Mode ("New site", "Edit current page" or "Variants")
+    if "generation_mode" not in st.session_state:
+        st.session_state.generation_mode = "New site"
+    
+    # Stream generations into the editor and preview as they arrive
+    if "stream_generation" not in st.session_state:
+        st.session_state.stream_generation = True
+    
+    # Skip the response cache and always call the model
+    if "bypass_cache" not in st.session_state:
+        st.session_state.bypass_cache = False
+    
+    # Background generation job shown on the Home page
+    if "job_id" not in st.session_state:
+        st.session_state.job_id = None
+    
+    # Candidates of a variants generation shown on the Home page
+    if "variant_job_ids" not in st.session_state:
+        st.session_state.variant_job_ids = []
+    
+    # Number of candidates in variants mode
+    if "variant_count" not in st.session_state:
+        st.session_state.variant_count = 3
+    
+    # Previous generation offered for a near-identical prompt
+    if "similar_offer" not in st.session_state:
+        st.session_state.similar_offer = None
+    
+    # Page of the Projects page and the search and order it belongs to
+    if "projects_page" not in st.session_state:
+        st.session_state.projects_page = 0
+    
+    if "projects_view" not in st.session_state:
+        st.session_state.projects_view = None
+    
+    # Zip of one project, built when asked for on the Projects page
+    if "project_zip" not in st.session_state:
+        st.session_state.project_zip = None
+    
     # Current Project
     if "current_project" not in st.session_state:
         st.session_state.current_project = None
@@ -97,6 +137,16 @@ def init_session_state():
     if "font_size" not in st.session_state:
         st.session_state.font_size = 14
 
+def get_session_id():
+    """
+    Get the ID of the current Streamlit session.
+    
+    Returns:
+        str: The session ID, or "default" outside a Streamlit script run
+    """
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "default"
+
 def load_custom_css():
     """
     Load the custom CSS for the application.
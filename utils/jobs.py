@@ -0,0 +1,429 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+from utils.project import PROJECTS_DIR
+from utils.cache import make_cache_key
+from utils.similarity import get_prompt_index
+from utils.api import (
+    GenerationCancelled,
+    OpenRouterError,
+    astream_completion,
+    build_request_data,
+    edit_html_with_ai,
+    extract_html,
+    get_concurrency_key,
+    get_generation_tracker,
+    iter_sync,
+    MAX_CONCURRENT_GENERATIONS
+)
+
+# Background job settings
+JOBS_DIR = os.path.join(PROJECTS_DIR, ".cache", "jobs")
+JOB_WORKERS = int(os.getenv("GENERATION_JOB_WORKERS", str(MAX_CONCURRENT_GENERATIONS)))
+JOB_RETENTION = int(os.getenv("GENERATION_JOB_RETENTION", str(24 * 3600)))
+
+# Seconds a finished job stays in memory before it is served from disk
+FINISHED_JOB_TTL = 300
+
+# Job statuses; "interrupted" jobs were lost when the server restarted
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "failed", "cancelled", "interrupted")
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+class Job:
+    """
+    A generation running in the background.
+    
+    The raw model reply is buffered while the job runs, so a page that
+    connects late can replay it from the beginning.
+    """
+    
+    def __init__(self, job_id, kind, prompt, owner, params):
+        self.id = job_id
+        self.kind = kind
+        self.prompt = prompt
+        self.owner = owner
+        self.params = params
+        self.status = "queued"
+        self.html = None
+        self.error = None
+        self.notice = None
+        self.ttft = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.chunks = []
+        self.token = None
+        self.condition = threading.Condition()
+    
+    def publish(self, chunk):
+        """
+        Append a chunk of the model reply and wake the followers.
+        """
+        with self.condition:
+            if self.ttft is None:
+                self.ttft = time.time() - self.started_at
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+    
+    def set_status(self, status):
+        """
+        Change the status and wake the followers.
+        """
+        with self.condition:
+            self.status = status
+            if status == "running":
+                self.started_at = time.time()
+            elif status in FINISHED_STATUSES:
+                self.finished_at = time.time()
+            self.condition.notify_all()
+    
+    def to_dict(self):
+        """
+        Get a snapshot of the job. The buffered reply and the API key are
+        never included.
+        
+        Returns:
+            dict: The job
+        """
+        with self.condition:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "prompt": self.prompt,
+                "status": self.status,
+                "html": self.html,
+                "error": self.error,
+                "notice": self.notice,
+                "ttft": self.ttft,
+                "model": self.params.get("model"),
+                "temperature": self.params.get("temperature"),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
+
+class JobQueue:
+    """
+    A process-wide queue of generation jobs served by a pool of worker threads.
+    
+    Jobs run independently of the Streamlit script run that submitted them,
+    so a rerun, a navigation or a browser refresh does not lose the work.
+    Every job is saved to disk when its status changes; a refreshed page
+    reconnects to it by its ID. Submitting a job supersedes the previous job
+    of the same session and cancelling one goes through the same
+    GenerationTracker entry. Upstream concurrency stays bounded by the
+    generation engine.
+    """
+    
+    def __init__(self, jobs_dir=JOBS_DIR, workers=JOB_WORKERS, retention=JOB_RETENTION):
+        self.jobs_dir = jobs_dir
+        self.retention = retention
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._prune_disk()
+        
+        for _ in range(workers):
+            threading.Thread(target=self._work, name="generation-job", daemon=True).start()
+    
+    def submit(self, kind, prompt, api_key, owner, use_cache=True, current_html=None, prompt_history=None, model=None, temperature=None):
+        """
+        Queue a generation.
+        
+        Args:
+            kind (str): "generate" for a new site, "edit" for a patch of current_html
+            prompt (str): The user's prompt or edit instruction
+            api_key (str): The OpenRouter API key, kept in memory only
+            owner (str): The Streamlit session ID of the submitter
+            use_cache (bool): Whether to serve and store the reply in the response cache
+            current_html (str, optional): The document to edit
+            prompt_history (list, optional): The previous prompts for the page
+            model (str, optional): The preferred model of a new site
+            temperature (float, optional): The sampling temperature of a new site
+            
+        Returns:
+            str: The job ID
+        """
+        params = {
+            "use_cache": use_cache,
+            "current_html": current_html,
+            "prompt_history": prompt_history or [],
+            "model": model,
+            "temperature": temperature
+        }
+        job = Job(uuid.uuid4().hex, kind, prompt, owner, params)
+        job.token = get_generation_tracker().begin(owner)
+        
+        with self._lock:
+            self._forget_finished()
+            self._jobs[job.id] = job
+        
+        self._save(job)
+        self._queue.put((job, api_key))
+        return job.id
+    
+    def get(self, job_id):
+        """
+        Get a snapshot of a job.
+        
+        Args:
+            job_id (str): The job ID
+            
+        Returns:
+            dict: The job (see Job.to_dict()) or None if it does not exist
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        
+        if job is not None:
+            return job.to_dict()
+        
+        return self._load(job_id)
+    
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+        
+        Args:
+            job_id (str): The job ID
+            
+        Returns:
+            bool: True if the job was still active
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+        
+        return get_generation_tracker().cancel(job.owner, job.token)
+    
+    def follow(self, job_id, timeout=0.5):
+        """
+        Iterate over the model reply of a job from the beginning.
+        
+        Args:
+            job_id (str): The job ID
+            timeout (float): Seconds between checks while no chunk arrives
+            
+        Returns:
+            generator: A generator that yields chunks of the model reply until
+                the job is finished
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        
+        if job is None:
+            return
+        
+        index = 0
+        while True:
+            with job.condition:
+                if index == len(job.chunks) and job.status in ACTIVE_STATUSES:
+                    job.condition.wait(timeout)
+                new_chunks = job.chunks[index:]
+                index += len(new_chunks)
+                finished = job.status in FINISHED_STATUSES and index == len(job.chunks)
+            
+            for chunk in new_chunks:
+                yield chunk
+            
+            if finished:
+                return
+    
+    def wait(self, job_id, poll=None, poll_interval=0.25):
+        """
+        Wait for a job to finish.
+        
+        Args:
+            job_id (str): The job ID
+            poll (callable, optional): Called every poll_interval seconds while
+                waiting, see run_sync()
+            poll_interval (float): Seconds between calls to poll
+            
+        Returns:
+            dict: The finished job or None if it does not exist
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        
+        while job is not None:
+            with job.condition:
+                if job.status in ACTIVE_STATUSES:
+                    job.condition.wait(poll_interval)
+                if job.status not in ACTIVE_STATUSES:
+                    break
+            
+            if poll is not None:
+                poll()
+        
+        return self.get(job_id)
+    
+    def info(self):
+        """
+        Get the number of jobs in memory by status.
+        
+        Returns:
+            dict: The counts of queued, running and finished jobs
+        """
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        
+        return {
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "finished": sum(1 for status in statuses if status in FINISHED_STATUSES)
+        }
+    
+    def _work(self):
+        while True:
+            job, api_key = self._queue.get()
+            try:
+                self._run(job, api_key)
+            finally:
+                self._queue.task_done()
+    
+    def _run(self, job, api_key):
+        token = job.token
+        params = job.params
+        
+        if token.cancelled:
+            job.set_status("cancelled")
+            self._finish(job, "interrupted")
+            return
+        
+        job.set_status("running")
+        self._save(job)
+        
+        try:
+            if job.kind == "edit":
+                html = self._edit(job, api_key)
+            else:
+                data = build_request_data(job.prompt, temperature=params["temperature"], model=params["model"])
+                html = self._generate(job, data, api_key)
+            
+            if not html:
+                raise ValueError("The model returned no HTML.")
+            
+            # Cached new sites can be offered for near-identical prompts later;
+            # variants candidates are not, they were asked for on purpose
+            if job.kind == "generate" and params["use_cache"] and params["model"] is None:
+                get_prompt_index().add(job.prompt, make_cache_key(data), get_concurrency_key(api_key))
+            
+            job.html = html
+            job.set_status("done")
+            outcome = "finished"
+        
+        except GenerationCancelled:
+            job.set_status("cancelled")
+            outcome = "interrupted"
+        
+        except OpenRouterError as e:
+            job.error = f"API error: {e.status_code} - {e.message}"
+            job.set_status("failed")
+            outcome = "failed"
+        
+        except Exception as e:
+            job.error = f"Error generating HTML: {str(e)}"
+            job.set_status("failed")
+            outcome = "failed"
+        
+        self._finish(job, outcome)
+    
+    def _generate(self, job, data, api_key):
+        for chunk in iter_sync(astream_completion(data, api_key, job.params["use_cache"], job.token)):
+            job.publish(chunk)
+        return extract_html("".join(job.chunks))
+    
+    def _edit(self, job, api_key):
+        params = job.params
+        
+        def fall_back(error):
+            job.notice = f"The edit could not be applied as a patch ({error}). The full page was regenerated instead."
+        
+        return edit_html_with_ai(
+            job.prompt,
+            params["current_html"],
+            api_key,
+            params["prompt_history"],
+            params["use_cache"],
+            job.token,
+            on_fallback=fall_back,
+            on_chunk=job.publish
+        )
+    
+    def _finish(self, job, outcome):
+        get_generation_tracker().end(job.owner, job.token, outcome)
+        self._save(job)
+    
+    def _forget_finished(self):
+        # Finished jobs are dropped from memory after a while; they stay on disk
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > FINISHED_JOB_TTL:
+                del self._jobs[job_id]
+    
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+    
+    def _save(self, job):
+        path = self._path(job.id)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(job.to_dict(), f)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def _load(self, job_id):
+        # Job IDs come from query parameters, so only accept plain hex IDs
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        # Not in memory but still active: the process that ran it is gone
+        if job["status"] in ACTIVE_STATUSES:
+            job["status"] = "interrupted"
+        
+        return job
+    
+    def _prune_disk(self):
+        now = time.time()
+        for filename in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, filename)
+            try:
+                if now - os.path.getmtime(path) > self.retention:
+                    os.remove(path)
+            except OSError:
+                pass
+
+def get_job_queue():
+    """
+    Get the process-wide generation job queue.
+    
+    Returns:
+        JobQueue: The job queue
+    """
+    global _job_queue
+    
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    
+    return _job_queue
@@ -1,18 +1,1325 @@
 import os
 import json
 import uuid
+import time
+import difflib
+import sqlite3
 import datetime
+import threading
+from contextlib import contextmanager
 import streamlit as st
+from utils.blobs import BlobStore, blob_key, compress_blob, decompress_blob
+from utils.revisions import RevisionLog, new_revisions, replay, rebuild_entries, revision_entry, revision_info
+from utils.search import SearchIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Define the projects directory
 PROJECTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "projects")
 
+# Storage backend: "json" (one file per project) or "sqlite"
+PROJECT_STORE = os.getenv("PROJECT_STORE", "json")
+PROJECT_STORES = ("json", "sqlite")
+
+# Metadata of every project, so listing never opens the project files
+PROJECTS_INDEX_FILE = os.path.join(PROJECTS_DIR, ".index.json")
+PROJECTS_INDEX_VERSION = 1
+
+# Content-addressed HTML blobs of the "json" backend, inside PROJECTS_DIR
+PROJECTS_BLOBS_DIR = ".blobs"
+
+# Revision logs of the "json" backend, inside PROJECTS_DIR
+PROJECTS_REVISIONS_DIR = ".revisions"
+
+# Reference counts of the blobs that revision snapshots point to, inside PROJECTS_REVISIONS_DIR
+PROJECTS_SNAPSHOT_REFS_FILE = ".snapshots.json"
+
+# SQLite database of the "sqlite" backend
+PROJECTS_DB_FILE = os.getenv("PROJECTS_DB_FILE", os.path.join(PROJECTS_DIR, "projects.db"))
+
+# Seconds a write waits for another session or process to release the database
+PROJECTS_DB_TIMEOUT = 30
+
+# Full-text search index of the projects, shared by both backends
+SEARCH_INDEX_FILE = os.getenv("SEARCH_INDEX_FILE", os.path.join(PROJECTS_DIR, ".search.db"))
+
+# Seconds a cached project listing is served without checking the store for
+# writes from other processes; writes in this process are seen immediately
+PROJECT_CATALOG_CHECK_INTERVAL = float(os.getenv("PROJECT_CATALOG_CHECK_INTERVAL", "1"))
+
+# Fields kept in the index
+INDEX_FIELDS = ("id", "name", "created_at", "updated_at", "size", "hash")
+
+# Orders of paginated listings: the field and whether it is sorted descending
+PROJECT_SORTS = {
+    "updated": ("updated_at", True),
+    "created": ("created_at", True),
+    "name": ("name", False),
+    "size": ("size", True)
+}
+
+# Metadata of a revision, see utils.revisions
+REVISION_FIELDS = ("revision", "created_at", "kind", "base", "hash", "size")
+
 # Ensure the projects directory exists
 os.makedirs(PROJECTS_DIR, exist_ok=True)
 
+_project_store = None
+_project_store_lock = threading.Lock()
+
+_project_catalog = None
+_project_catalog_lock = threading.Lock()
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+def _write_json(path, data, indent=None):
+    # Write to a temporary file first, so readers never see a partial document
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(data, f, indent=indent)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    return os.path.getsize(path)
+
+def content_hash(html_content):
+    """
+    Get the hash of a project's HTML content, which is also its blob key.
+    
+    Args:
+        html_content (str): The HTML content
+        
+    Returns:
+        str: The SHA-256 hex digest
+    """
+    return blob_key(html_content)
+
+def _project_size(html_size, prompt_history):
+    # Uncompressed bytes of the HTML and the prompts
+    return html_size + sum(len(prompt.encode("utf-8")) for prompt in prompt_history)
+
+def _sort_key(sort):
+    field, _ = PROJECT_SORTS[sort]
+    if field == "name":
+        return lambda project: (project["name"].lower(), project["id"])
+    return lambda project: (project[field], project["id"])
+
+def _page_projects(projects, offset, limit, sort, query, presorted=False):
+    # Filter, sort and slice metadata in memory
+    if sort not in PROJECT_SORTS:
+        raise ValueError(f"Unknown project sort: {sort}")
+    
+    if not presorted:
+        projects = sorted(projects, key=_sort_key(sort), reverse=PROJECT_SORTS[sort][1])
+    if query:
+        query = query.lower()
+        projects = [project for project in projects if query in project["name"].lower()]
+    
+    end = offset + limit if limit else None
+    return ProjectPage(projects[offset:end], len(projects), offset, limit)
+
+class ProjectPage(list):
+    """
+    One page of a project listing: the metadata dicts of the page, plus the
+    number of projects that matched across all pages.
+    
+    Args:
+        projects (list): The metadata of the projects on the page
+        total (int): The number of matching projects
+        offset (int): The position of the first project on the page
+        limit (int): The page size, or None for all remaining projects
+    """
+    
+    def __init__(self, projects, total, offset=0, limit=None):
+        super().__init__(projects)
+        self.total = total
+        self.offset = offset
+        self.limit = limit
+
+def _index_entry(record):
+    # Works on complete projects and on stored records that reference a blob
+    if "html_hash" in record:
+        html_hash, html_size = record["html_hash"], record["html_size"]
+    else:
+        html_content = record.get("html_content") or ""
+        html_hash, html_size = content_hash(html_content), len(html_content.encode("utf-8"))
+    
+    return {
+        "id": record["id"],
+        "name": record["name"],
+        "created_at": record["created_at"],
+        "updated_at": record["updated_at"],
+        "size": _project_size(html_size, record.get("prompt_history") or []),
+        "hash": html_hash
+    }
+
+class ProjectStore:
+    """
+    The interface of a project storage backend.
+    
+    A project is a dict with an id, a name, the HTML content, the prompt
+    history and ISO creation and update dates. Listings return only the
+    metadata (see INDEX_FIELDS). Every backend must be safe to use from
+    many Streamlit sessions and from several processes at once.
+    """
+    
+    name = None
+    
+    def save(self, project_data):
+        """
+        Store a new project, keeping its ID and dates.
+        
+        Args:
+            project_data (dict): The complete project
+        """
+        raise NotImplementedError
+    
+    def load(self, project_id):
+        """
+        Load a project.
+        
+        Returns:
+            dict: The project data or None if the project doesn't exist
+        """
+        raise NotImplementedError
+    
+    def update(self, project_id, html_content=None, prompt_history=None):
+        """
+        Replace the HTML content and/or prompt history of a project.
+        
+        Returns:
+            bool: True if the project was updated, False if it doesn't exist
+        """
+        raise NotImplementedError
+    
+    def delete(self, project_id):
+        """
+        Delete a project.
+        
+        Returns:
+            bool: True if the project was deleted, False if it doesn't exist
+        """
+        raise NotImplementedError
+    
+    def list(self):
+        """
+        List the metadata of every project.
+        
+        Returns:
+            list: The metadata dicts, newest first
+        """
+        raise NotImplementedError
+    
+    def page(self, offset=0, limit=None, sort="updated", query=None):
+        """
+        List one page of the project metadata.
+        
+        Args:
+            offset (int): The number of matching projects to skip
+            limit (int, optional): The page size; all remaining projects if None
+            sort (str): A key of PROJECT_SORTS
+            query (str, optional): Only list projects whose name contains this, ignoring case
+            
+        Returns:
+            ProjectPage: The page, with the number of matching projects as .total
+        """
+        return _page_projects(self.list(), offset, limit, sort, query)
+    
+    def exists(self, project_id):
+        """
+        Check whether a project exists without loading it.
+        """
+        raise NotImplementedError
+    
+    def generation(self):
+        """
+        Get a token that changes whenever a project is saved, updated or deleted.
+        
+        It is read cheaply, without listing the projects, and covers writes
+        from every process.
+        
+        Returns:
+            object: The token, or None if the backend can't tell
+        """
+        return None
+    
+    def iter_projects(self):
+        """
+        Iterate over every complete project, one at a time.
+        
+        Returns:
+            generator: A generator that yields project dicts
+        """
+        for entry in self.list():
+            project_data = self.load(entry["id"])
+            if project_data is not None:
+                yield project_data
+    
+    def rebuild_index(self):
+        """
+        Rebuild the metadata index from the stored projects.
+        
+        Returns:
+            int: The number of indexed projects
+        """
+        return len(self.list())
+    
+    def check_index(self):
+        """
+        Compare the metadata index with the stored projects.
+        
+        Returns:
+            dict: The IDs of projects missing from the index, of index entries
+                without a project, and of entries whose metadata is stale
+        """
+        return {"missing": [], "orphaned": [], "stale": []}
+    
+    def revision_entries(self, project_id):
+        """
+        Get the encoded revisions of a project's HTML.
+        
+        Every save and every update that changes the HTML adds a revision.
+        
+        Returns:
+            list: The revision entries, oldest first (see utils.revisions)
+        """
+        raise NotImplementedError
+    
+    def replace_revisions(self, project_id, entries):
+        """
+        Replace the revision history of a project, e.g. when it is migrated.
+        
+        Args:
+            project_id (str): The ID of the project
+            entries (list): The revision entries, oldest first
+        """
+        raise NotImplementedError
+    
+    def compact_revisions(self, project_id, keep=None):
+        """
+        Re-encode the revision history of a project, optionally dropping old revisions.
+        
+        Args:
+            project_id (str): The ID of the project
+            keep (int, optional): The number of latest revisions to keep
+            
+        Returns:
+            dict: The number of kept and removed revisions
+        """
+        raise NotImplementedError
+    
+    def revisions(self, project_id):
+        """
+        List the revisions of a project.
+        
+        Returns:
+            list: The revision numbers, dates, kinds, hashes and sizes, oldest first
+        """
+        return [revision_info(entry) for entry in self.revision_entries(project_id)]
+    
+    def checkout(self, project_id, revision):
+        """
+        Get the HTML of a project as it was at a revision.
+        
+        Returns:
+            str: The HTML or None if there is no such revision
+        """
+        return replay(self.revision_entries(project_id), revision)
+    
+    def diff(self, project_id, old_revision, new_revision, context=3):
+        """
+        Compare two revisions of a project.
+        
+        Args:
+            project_id (str): The ID of the project
+            old_revision (int): The revision to compare from
+            new_revision (int): The revision to compare to
+            context (int): Lines of context around each change
+            
+        Returns:
+            str: A unified diff, or None if either revision doesn't exist
+        """
+        old_text = self.checkout(project_id, old_revision)
+        new_text = self.checkout(project_id, new_revision)
+        
+        if old_text is None or new_text is None:
+            return None
+        
+        return "".join(difflib.unified_diff(
+            old_text.splitlines(keepends=True),
+            new_text.splitlines(keepends=True),
+            fromfile=f"revision {old_revision}",
+            tofile=f"revision {new_revision}",
+            n=context
+        ))
+    
+    def collect_garbage(self):
+        """
+        Delete stored HTML that no project references any more.
+        
+        Returns:
+            dict: The number of removed blobs
+        """
+        return {"removed": 0}
+    
+    def info(self):
+        """
+        Get the backend name, the number of projects and their total size.
+        """
+        projects = self.list()
+        return {"backend": self.name, "projects": len(projects), "bytes": sum(p["size"] for p in projects)}
+
+class JsonProjectStore(ProjectStore):
+    """
+    One indent-2 JSON file per project in PROJECTS_DIR.
+    
+    A project file holds the metadata and prompt history; the HTML is kept
+    once per distinct content in a BlobStore under PROJECTS_BLOBS_DIR and
+    referenced by its hash, so saving the same page again writes only the
+    small project file. Files from before blobs with the HTML inline are
+    still read, and converted on their next update.
+    
+    Every version of the HTML is also appended to a per-project revision log
+    under PROJECTS_REVISIONS_DIR, as a line delta against the previous
+    version with a snapshot every REVISION_SNAPSHOT_INTERVAL revisions. A
+    snapshot is logged by its hash only: its HTML is a blob like any other,
+    so the first revision of a project costs no more than a reference to the
+    blob it was saved with. The current HTML is always a whole blob, so
+    loading a project never replays the log.
+    
+    Project files are replaced atomically. Writes, and the metadata index in
+    PROJECTS_INDEX_FILE, are serialized by a thread lock and, where
+    available, a file lock shared with other processes. The index doubles as
+    the reference count of the blobs, together with the snapshot reference
+    counts in PROJECTS_SNAPSHOT_REFS_FILE: a blob is deleted as soon as no
+    indexed project has its hash and no revision log refers to it.
+    """
+    
+    name = "json"
+    
+    def __init__(self, projects_dir=PROJECTS_DIR, index_file=PROJECTS_INDEX_FILE, blobs_dir=None):
+        self.projects_dir = projects_dir
+        self.index_file = index_file
+        self.blobs = BlobStore(blobs_dir or os.path.join(projects_dir, PROJECTS_BLOBS_DIR))
+        self.revision_log = RevisionLog(os.path.join(projects_dir, PROJECTS_REVISIONS_DIR))
+        self.snapshot_refs_file = os.path.join(self.revision_log.revisions_dir, PROJECTS_SNAPSHOT_REFS_FILE)
+        self._lock = threading.Lock()
+        os.makedirs(projects_dir, exist_ok=True)
+    
+    def save(self, project_data):
+        with self._locked_index():
+            entries = self._entries()
+            record = self._write_record(project_data)
+            entries[record["id"]] = _index_entry(record)
+            self._write_index(entries)
+            # The first revision refers to the blob just written
+            self._store_revisions(entries, record["id"], [revision_entry(1, record["updated_at"], project_data.get("html_content") or "")])
+    
+    def load(self, project_id):
+        record = self._read_record(project_id)
+        
+        if record is None or "html_hash" not in record:
+            return record
+        
+        html_content = self.blobs.get(record["html_hash"])
+        
+        return {
+            "id": record["id"],
+            "name": record["name"],
+            "html_content": html_content or "",
+            "prompt_history": record.get("prompt_history", []),
+            "created_at": record["created_at"],
+            "updated_at": record["updated_at"]
+        }
+    
+    def update(self, project_id, html_content=None, prompt_history=None):
+        with self._locked_index():
+            record = self._read_record(project_id)
+            
+            if record is None:
+                return False
+            
+            entries = self._entries()
+            old_hash = _index_entry(record)["hash"]
+            
+            if html_content is None and "html_hash" not in record:
+                html_content = record.get("html_content") or ""
+            
+            previous_at = record["updated_at"]
+            record["updated_at"] = datetime.datetime.now().isoformat()
+            
+            if html_content is not None and blob_key(html_content) != old_hash:
+                previous_text = self.blobs.get(old_hash) if "html_hash" in record else record.get("html_content")
+                self._store_revisions(entries, project_id, new_revisions(
+                    self.revision_log.last(project_id), previous_text or "", previous_at, html_content, record["updated_at"]
+                ), append=True)
+            
+            if html_content is not None:
+                record.pop("html_content", None)
+                record["html_hash"], _ = self.blobs.put(html_content)
+                record["html_size"] = len(html_content.encode("utf-8"))
+            
+            if prompt_history is not None:
+                record["prompt_history"] = prompt_history
+            
+            _write_json(self._project_file(project_id), record, indent=2)
+            entries[project_id] = _index_entry(record)
+            self._write_index(entries)
+            self._release(entries, old_hash)
+        
+        return True
+    
+    def delete(self, project_id):
+        with self._locked_index():
+            record = self._read_record(project_id)
+            
+            if record is None:
+                return False
+            
+            entries = self._entries()
+            os.remove(self._project_file(project_id))
+            entries.pop(project_id, None)
+            self._write_index(entries)
+            self._store_revisions(entries, project_id, [])
+            self._release(entries, _index_entry(record)["hash"])
+        
+        return True
+    
+    def list(self):
+        # Served from the index alone; the index is rebuilt if it is missing or unreadable
+        entries = self._read_index()
+        
+        if entries is None:
+            self.rebuild_index()
+            entries = self._read_index() or {}
+        
+        projects = list(entries.values())
+        
+        # Sort projects by updated_at date (newest first)
+        projects.sort(key=lambda x: x["updated_at"], reverse=True)
+        
+        return projects
+    
+    def exists(self, project_id):
+        return os.path.exists(self._project_file(project_id))
+    
+    def rebuild_index(self):
+        with self._locked_index():
+            entries = self._scan_projects()
+            self._write_index(entries)
+            self._write_snapshot_refs(self._count_snapshot_refs())
+        
+        return len(entries)
+    
+    def check_index(self):
+        entries = self._read_index() or {}
+        scanned = self._scan_projects()
+        
+        return {
+            "missing": sorted(set(scanned) - set(entries)),
+            "orphaned": sorted(set(entries) - set(scanned)),
+            "stale": sorted(project_id for project_id in set(scanned) & set(entries) if scanned[project_id] != entries[project_id])
+        }
+    
+    def generation(self):
+        # Every write replaces the index file
+        try:
+            stat = os.stat(self.index_file)
+        except OSError:
+            return None
+        
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    
+    def revision_entries(self, project_id):
+        return [self._attach_snapshot(entry) for entry in self.revision_log.entries(project_id)]
+    
+    def replace_revisions(self, project_id, entries):
+        with self._locked_index():
+            self._store_revisions(self._entries(), project_id, entries)
+    
+    def compact_revisions(self, project_id, keep=None):
+        with self._locked_index():
+            entries = self.revision_entries(project_id)
+            rebuilt = rebuild_entries(entries, keep)
+            self._store_revisions(self._entries(), project_id, rebuilt)
+        
+        return {"revisions": len(rebuilt), "removed": len(entries) - len(rebuilt)}
+    
+    def revisions(self, project_id):
+        return [revision_info(entry) for entry in self.revision_log.entries(project_id)]
+    
+    def checkout(self, project_id, revision):
+        # Only the snapshot the revision is based on is read from the blobs
+        entries = self.revision_log.entries(project_id)
+        target = next((entry for entry in entries if entry["revision"] == revision), None)
+        
+        if target is None:
+            return None
+        
+        return replay([self._attach_snapshot(entry) for entry in entries if target["base"] <= entry["revision"] <= revision], revision)
+    
+    def collect_garbage(self):
+        # Blobs left behind by an interrupted write or a repaired index
+        with self._locked_index():
+            refs = self._count_snapshot_refs()
+            self._write_snapshot_refs(refs)
+            referenced = {entry["hash"] for entry in self._entries().values()} | set(refs)
+            removed = sum(1 for key in list(self.blobs.keys()) if key not in referenced and self.blobs.delete(key))
+        
+        return {"removed": removed}
+    
+    def info(self):
+        return dict(super().info(), **self.blobs.info())
+    
+    def _project_file(self, project_id):
+        return os.path.join(self.projects_dir, f"{project_id}.json")
+    
+    def _read_record(self, project_id):
+        project_file = self._project_file(project_id)
+        
+        if not os.path.exists(project_file):
+            return None
+        
+        with open(project_file, "r") as f:
+            return json.load(f)
+    
+    def _write_record(self, project_data):
+        html_content = project_data.get("html_content") or ""
+        html_hash, _ = self.blobs.put(html_content)
+        
+        record = {
+            "id": project_data["id"],
+            "name": project_data["name"],
+            "html_hash": html_hash,
+            "html_size": len(html_content.encode("utf-8")),
+            "prompt_history": project_data.get("prompt_history") or [],
+            "created_at": project_data["created_at"],
+            "updated_at": project_data["updated_at"]
+        }
+        _write_json(self._project_file(record["id"]), record, indent=2)
+        return record
+    
+    def _release(self, entries, html_hash, refs=None):
+        # Called with the index locked, so no other writer can reference the blob meanwhile
+        if any(entry["hash"] == html_hash for entry in entries.values()):
+            return
+        if html_hash in (refs if refs is not None else self._snapshot_refs()):
+            return
+        self.blobs.delete(html_hash)
+    
+    def _store_revisions(self, entries, project_id, revisions, append=False):
+        # Called with the index locked. Appends to or replaces a revision log;
+        # snapshots are stored as blobs and logged by hash. New references
+        # are counted before the log is written and dropped ones after, so
+        # an interrupted write can only leave a blob behind for gc
+        dropped = [] if append else self._snapshot_hashes(project_id)
+        added = [entry for entry in revisions if entry["kind"] == "snapshot"]
+        refs = self._snapshot_refs() if added or dropped else None
+        stored = []
+        
+        for entry in revisions:
+            if entry["kind"] == "snapshot":
+                if entry["data"] is not None:
+                    self.blobs.put(entry["data"])
+                refs[entry["hash"]] = refs.get(entry["hash"], 0) + 1
+                entry = dict(entry, data=None)
+            stored.append(entry)
+        
+        if added:
+            self._write_snapshot_refs(refs)
+        
+        if append:
+            self.revision_log.append(project_id, stored)
+        elif stored:
+            self.revision_log.write(project_id, stored)
+        else:
+            self.revision_log.delete(project_id)
+        
+        if dropped:
+            for html_hash in dropped:
+                refs[html_hash] = refs.get(html_hash, 0) - 1
+                if refs[html_hash] <= 0:
+                    del refs[html_hash]
+            self._write_snapshot_refs(refs)
+            
+            for html_hash in set(dropped):
+                self._release(entries, html_hash, refs)
+    
+    def _attach_snapshot(self, entry):
+        # Fill in the HTML of a snapshot logged by hash
+        if entry["kind"] == "snapshot" and entry["data"] is None:
+            return dict(entry, data=self.blobs.get(entry["hash"]))
+        return entry
+    
+    def _snapshot_hashes(self, project_id):
+        # The blobs a project's revision log refers to, once per snapshot
+        return [entry["hash"] for entry in self.revision_log.entries(project_id) if entry["kind"] == "snapshot" and entry["data"] is None]
+    
+    def _snapshot_refs(self):
+        try:
+            with open(self.snapshot_refs_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self._count_snapshot_refs()
+    
+    def _count_snapshot_refs(self):
+        # Read every revision log; used when the counts are missing or repaired
+        refs = {}
+        for project_id in self.revision_log.project_ids():
+            for html_hash in self._snapshot_hashes(project_id):
+                refs[html_hash] = refs.get(html_hash, 0) + 1
+        return refs
+    
+    def _write_snapshot_refs(self, refs):
+        _write_json(self.snapshot_refs_file, refs)
+    
+    @contextmanager
+    def _locked_index(self):
+        # Serializes writes between threads, and between processes where
+        # file locks are available
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            
+            with open(f"{self.index_file}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _read_index(self):
+        try:
+            with open(self.index_file, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if index.get("version") != PROJECTS_INDEX_VERSION:
+            return None
+        
+        return index["projects"]
+    
+    def _entries(self):
+        # Called with the index locked
+        entries = self._read_index()
+        return entries if entries is not None else self._scan_projects()
+    
+    def _write_index(self, entries):
+        _write_json(self.index_file, {"version": PROJECTS_INDEX_VERSION, "projects": entries})
+    
+    def _scan_projects(self):
+        # Parse every project file; only used to build or repair the index
+        entries = {}
+        
+        for filename in os.listdir(self.projects_dir):
+            if filename.startswith(".") or not filename.endswith(".json"):
+                continue
+            
+            project_file = os.path.join(self.projects_dir, filename)
+            try:
+                with open(project_file, "r") as f:
+                    record = json.load(f)
+                entries[record["id"]] = _index_entry(record)
+            except (OSError, ValueError, KeyError):
+                continue
+        
+        return entries
+
+class SqliteProjectStore(ProjectStore):
+    """
+    A SQLite database in WAL mode.
+    
+    Metadata lives in an indexed table of its own, so listings never read
+    HTML; the prompt history is in a separate table. The HTML is stored once
+    per distinct content as a zlib-compressed blob keyed by its hash, with a
+    reference count kept in the same transaction as the projects that use
+    it. Revisions of the HTML are rows of their own, compressed deltas with
+    periodic snapshots, so checking one out reads only the rows from its
+    snapshot onwards. A snapshot row holds no data: it references the blob
+    with its hash, counted like a project. Each thread has its own connection, and writes run in
+    immediate transactions that wait up to PROJECTS_DB_TIMEOUT seconds for
+    other sessions or processes, while WAL lets readers continue during a
+    write.
+    """
+    
+    name = "sqlite"
+    
+    # Bumped when the schema changes; see _migrate()
+    SCHEMA_VERSION = 5
+    
+    def __init__(self, db_file=PROJECTS_DB_FILE, timeout=PROJECTS_DB_TIMEOUT):
+        self.db_file = db_file
+        self.timeout = timeout
+        self._local = threading.local()
+        
+        with self._transaction() as db:
+            self._migrate(db)
+    
+    def save(self, project_data):
+        html_content = project_data.get("html_content") or ""
+        prompt_history = project_data.get("prompt_history") or []
+        
+        with self._transaction() as db:
+            html_hash = self._ref_blob(db, html_content)
+            db.execute(
+                "INSERT INTO projects (id, name, created_at, updated_at, size, hash) VALUES (?, ?, ?, ?, ?, ?)",
+                (project_data["id"], project_data["name"], project_data["created_at"], project_data["updated_at"],
+                 _project_size(len(html_content.encode("utf-8")), prompt_history), html_hash)
+            )
+            self._write_prompts(db, project_data["id"], prompt_history)
+            self._write_revisions(db, project_data["id"], [revision_entry(1, project_data["updated_at"], html_content)])
+    
+    def load(self, project_id):
+        db = self._connection()
+        row = db.execute(
+            "SELECT p.id, p.name, p.created_at, p.updated_at, b.data FROM projects p "
+            "LEFT JOIN blobs b ON b.hash = p.hash WHERE p.id = ?",
+            (project_id,)
+        ).fetchone()
+        
+        if row is None:
+            return None
+        
+        prompts = db.execute("SELECT prompt FROM project_prompts WHERE project_id = ? ORDER BY position", (project_id,)).fetchall()
+        
+        return {
+            "id": row[0],
+            "name": row[1],
+            "html_content": decompress_blob(row[4]) if row[4] is not None else "",
+            "prompt_history": [prompt for (prompt,) in prompts],
+            "created_at": row[2],
+            "updated_at": row[3]
+        }
+    
+    def update(self, project_id, html_content=None, prompt_history=None):
+        with self._transaction() as db:
+            row = db.execute("SELECT hash, updated_at FROM projects WHERE id = ?", (project_id,)).fetchone()
+            if row is None:
+                return False
+            
+            html_hash, previous_at = row
+            updated_at = datetime.datetime.now().isoformat()
+            if html_content is not None and blob_key(html_content) != html_hash:
+                previous = db.execute("SELECT data FROM blobs WHERE hash = ?", (html_hash,)).fetchone()
+                self._write_revisions(db, project_id, new_revisions(
+                    self._last_revision(db, project_id), decompress_blob(previous[0]) if previous else "", previous_at, html_content, updated_at
+                ))
+                self._unref_blob(db, html_hash)
+                html_hash = self._ref_blob(db, html_content)
+            
+            if prompt_history is not None:
+                db.execute("DELETE FROM project_prompts WHERE project_id = ?", (project_id,))
+                self._write_prompts(db, project_id, prompt_history)
+            
+            db.execute(
+                "UPDATE projects SET updated_at = ?, size = ?, hash = ? WHERE id = ?",
+                (updated_at, self._stored_size(db, project_id, html_hash), html_hash, project_id)
+            )
+        
+        return True
+    
+    def delete(self, project_id):
+        with self._transaction() as db:
+            row = db.execute("SELECT hash FROM projects WHERE id = ?", (project_id,)).fetchone()
+            if row is None:
+                return False
+            
+            # The prompts and revisions are removed by ON DELETE CASCADE
+            self._unref_snapshots(db, project_id)
+            db.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+            self._unref_blob(db, row[0])
+        
+        return True
+    
+    def list(self):
+        rows = self._connection().execute(
+            "SELECT id, name, created_at, updated_at, size, hash FROM projects ORDER BY updated_at DESC"
+        ).fetchall()
+        return [dict(zip(INDEX_FIELDS, row)) for row in rows]
+    
+    def page(self, offset=0, limit=None, sort="updated", query=None):
+        # Filtered, sorted and sliced by SQLite, using the name and updated_at indexes
+        if sort not in PROJECT_SORTS:
+            raise ValueError(f"Unknown project sort: {sort}")
+        
+        field, descending = PROJECT_SORTS[sort]
+        order = f"{field} COLLATE NOCASE" if field == "name" else field
+        direction = "DESC" if descending else "ASC"
+        pattern = "%" + (query or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        
+        db = self._connection()
+        total = db.execute("SELECT COUNT(*) FROM projects WHERE name LIKE ? ESCAPE '\\'", (pattern,)).fetchone()[0]
+        rows = db.execute(
+            f"SELECT id, name, created_at, updated_at, size, hash FROM projects WHERE name LIKE ? ESCAPE '\\' "
+            f"ORDER BY {order} {direction}, id {direction} LIMIT ? OFFSET ?",
+            (pattern, limit if limit else -1, offset)
+        ).fetchall()
+        return ProjectPage([dict(zip(INDEX_FIELDS, row)) for row in rows], total, offset, limit)
+    
+    def exists(self, project_id):
+        return self._connection().execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is not None
+    
+    def rebuild_index(self):
+        # The size column is derived from the HTML and prompts; recompute it
+        with self._transaction() as db:
+            rows = db.execute("SELECT id, hash FROM projects").fetchall()
+            for project_id, html_hash in rows:
+                db.execute("UPDATE projects SET size = ? WHERE id = ?", (self._stored_size(db, project_id, html_hash), project_id))
+        
+        return len(rows)
+    
+    def generation(self):
+        return self._connection().execute("SELECT generation FROM catalog_state").fetchone()[0]
+    
+    def revision_entries(self, project_id):
+        return self._read_revisions(self._connection(), project_id)
+    
+    def replace_revisions(self, project_id, entries):
+        with self._transaction() as db:
+            self._unref_snapshots(db, project_id)
+            db.execute("DELETE FROM project_revisions WHERE project_id = ?", (project_id,))
+            self._write_revisions(db, project_id, entries)
+    
+    def compact_revisions(self, project_id, keep=None):
+        with self._transaction() as db:
+            entries = self._read_revisions(db, project_id)
+            rebuilt = rebuild_entries(entries, keep)
+            self._unref_snapshots(db, project_id)
+            db.execute("DELETE FROM project_revisions WHERE project_id = ?", (project_id,))
+            self._write_revisions(db, project_id, rebuilt)
+        
+        return {"revisions": len(rebuilt), "removed": len(entries) - len(rebuilt)}
+    
+    def revisions(self, project_id):
+        rows = self._connection().execute(
+            "SELECT revision, created_at, kind, base, hash, size FROM project_revisions WHERE project_id = ? ORDER BY revision",
+            (project_id,)
+        ).fetchall()
+        return [dict(zip(REVISION_FIELDS, row)) for row in rows]
+    
+    def checkout(self, project_id, revision):
+        # Only the rows from the revision's snapshot onwards are read
+        db = self._connection()
+        row = db.execute("SELECT base FROM project_revisions WHERE project_id = ? AND revision = ?", (project_id, revision)).fetchone()
+        
+        if row is None:
+            return None
+        
+        return replay(self._read_revisions(db, project_id, row[0], revision), revision)
+    
+    def collect_garbage(self):
+        # Recount the references from scratch, then drop the unreferenced blobs
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE blobs SET refcount = (SELECT COUNT(*) FROM projects WHERE projects.hash = blobs.hash) + "
+                "(SELECT COUNT(*) FROM project_revisions r WHERE r.hash = blobs.hash AND LENGTH(r.data) = 0)"
+            )
+            removed = db.execute("DELETE FROM blobs WHERE refcount = 0").rowcount
+        
+        return {"removed": removed}
+    
+    def info(self):
+        blobs, stored = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()
+        return dict(super().info(), blobs=blobs, stored_bytes=stored)
+    
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        
+        if db is None:
+            db = sqlite3.connect(self.db_file, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        
+        return db
+    
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+        # wait for each other instead of failing halfway with SQLITE_BUSY
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+    
+    def _migrate(self, db):
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        
+        if version < 1:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                "id TEXT PRIMARY KEY, name TEXT NOT NULL, created_at TEXT NOT NULL, "
+                "updated_at TEXT NOT NULL, size INTEGER NOT NULL, hash TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS projects_updated_at ON projects (updated_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS projects_name ON projects (name COLLATE NOCASE)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS project_html ("
+                "project_id TEXT PRIMARY KEY REFERENCES projects (id) ON DELETE CASCADE, html_content TEXT NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS project_prompts ("
+                "project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE, position INTEGER NOT NULL, "
+                "prompt TEXT NOT NULL, PRIMARY KEY (project_id, position))"
+            )
+        
+        if version < 2:
+            # Move the HTML into content-addressed blobs, one per distinct page
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "hash TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, refcount INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS projects_hash ON projects (hash)")
+            for project_id, html_content in db.execute("SELECT project_id, html_content FROM project_html").fetchall():
+                db.execute("UPDATE projects SET hash = ? WHERE id = ?", (self._ref_blob(db, html_content), project_id))
+            db.execute("DROP TABLE project_html")
+        
+        if version < 3:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS project_revisions ("
+                "project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE, revision INTEGER NOT NULL, "
+                "created_at TEXT NOT NULL, kind TEXT NOT NULL, base INTEGER NOT NULL, hash TEXT NOT NULL, "
+                "size INTEGER NOT NULL, data BLOB NOT NULL, PRIMARY KEY (project_id, revision))"
+            )
+        
+        if version < 4:
+            # A counter bumped by every change to the projects table, so
+            # cached listings can tell when to reload
+            db.execute("CREATE TABLE IF NOT EXISTS catalog_state (generation INTEGER NOT NULL)")
+            db.execute("INSERT INTO catalog_state (generation) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM catalog_state)")
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                db.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS projects_{event.lower()}_generation AFTER {event} ON projects "
+                    "BEGIN UPDATE catalog_state SET generation = generation + 1; END"
+                )
+        
+        if version < 5:
+            # Move revision snapshots into the refcounted blobs; a snapshot
+            # row with empty data refers to the blob with its hash
+            db.execute("CREATE INDEX IF NOT EXISTS project_revisions_hash ON project_revisions (hash)")
+            rows = db.execute("SELECT project_id, revision, data FROM project_revisions WHERE kind = 'snapshot' AND LENGTH(data) > 0").fetchall()
+            for project_id, revision, data in rows:
+                self._ref_blob(db, json.loads(decompress_blob(data)))
+                db.execute("UPDATE project_revisions SET data = ? WHERE project_id = ? AND revision = ?", (b"", project_id, revision))
+        
+        db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+    
+    def _ref_blob(self, db, html_content):
+        # Only new content is compressed and written
+        html_hash = blob_key(html_content)
+        if db.execute("UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (html_hash,)).rowcount == 0:
+            db.execute(
+                "INSERT INTO blobs (hash, data, size, refcount) VALUES (?, ?, ?, 1)",
+                (html_hash, compress_blob(html_content), len(html_content.encode("utf-8")))
+            )
+        return html_hash
+    
+    def _unref_blob(self, db, html_hash):
+        db.execute("UPDATE blobs SET refcount = refcount - 1 WHERE hash = ?", (html_hash,))
+        db.execute("DELETE FROM blobs WHERE hash = ? AND refcount <= 0", (html_hash,))
+    
+    def _write_prompts(self, db, project_id, prompt_history):
+        db.executemany(
+            "INSERT INTO project_prompts (project_id, position, prompt) VALUES (?, ?, ?)",
+            [(project_id, position, prompt) for position, prompt in enumerate(prompt_history)]
+        )
+    
+    def _write_revisions(self, db, project_id, entries):
+        rows = []
+        for entry in entries:
+            if entry["kind"] == "snapshot":
+                self._ref_blob(db, entry["data"])
+                data = b""
+            else:
+                data = compress_blob(json.dumps(entry["data"]))
+            rows.append((project_id, *(entry[field] for field in REVISION_FIELDS), data))
+        
+        db.executemany(
+            "INSERT INTO project_revisions (project_id, revision, created_at, kind, base, hash, size, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+    
+    def _read_revisions(self, db, project_id, first=1, last=None):
+        rows = db.execute(
+            "SELECT r.revision, r.created_at, r.kind, r.base, r.hash, r.size, r.data, b.data FROM project_revisions r "
+            "LEFT JOIN blobs b ON LENGTH(r.data) = 0 AND b.hash = r.hash "
+            "WHERE r.project_id = ? AND r.revision >= ? AND (? IS NULL OR r.revision <= ?) ORDER BY r.revision",
+            (project_id, first, last, last)
+        ).fetchall()
+        return [dict(zip(REVISION_FIELDS, row[:6]), data=self._revision_data(row[6], row[7])) for row in rows]
+    
+    def _revision_data(self, data, blob):
+        # Snapshot rows are empty and read from the blob they refer to
+        if data:
+            return json.loads(decompress_blob(data))
+        return decompress_blob(blob) if blob is not None else None
+    
+    def _unref_snapshots(self, db, project_id):
+        for (html_hash,) in db.execute("SELECT hash FROM project_revisions WHERE project_id = ? AND LENGTH(data) = 0", (project_id,)).fetchall():
+            self._unref_blob(db, html_hash)
+    
+    def _last_revision(self, db, project_id):
+        row = db.execute(
+            "SELECT revision, created_at, kind, base, hash, size FROM project_revisions WHERE project_id = ? ORDER BY revision DESC LIMIT 1",
+            (project_id,)
+        ).fetchone()
+        return dict(zip(REVISION_FIELDS, row)) if row else None
+    
+    def _stored_size(self, db, project_id, html_hash):
+        row = db.execute("SELECT size FROM blobs WHERE hash = ?", (html_hash,)).fetchone()
+        prompts = [prompt for (prompt,) in db.execute("SELECT prompt FROM project_prompts WHERE project_id = ?", (project_id,))]
+        return _project_size(row[0] if row else 0, prompts)
+
+class ProjectCatalog:
+    """
+    A process-wide cache of the project listing.
+    
+    Streamlit reruns the sidebar and the Projects page on every interaction,
+    so the listing is kept in memory and reloaded only when it changed.
+    Writes through this module invalidate it at once; writes from other
+    processes are noticed through the store's generation token, which is
+    checked at most every check_interval seconds.
+    
+    Args:
+        store (ProjectStore): The storage backend
+        check_interval (float): Seconds between generation checks
+    """
+    
+    def __init__(self, store, check_interval=PROJECT_CATALOG_CHECK_INTERVAL):
+        self.store = store
+        self.check_interval = check_interval
+        self._projects = None
+        self._sorted = {}
+        self._generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "checks": 0, "loads": 0, "invalidations": 0}
+    
+    def list(self):
+        """
+        List the metadata of every project, newest first.
+        
+        Returns:
+            list: A copy of the cached listing
+        """
+        with self._lock:
+            return list(self._current())
+    
+    def page(self, offset=0, limit=None, sort="updated", query=None):
+        """
+        List one page of the project metadata. See ProjectStore.page().
+        
+        Each order is sorted once per reload of the listing, so a rerun costs
+        at most a scan of the names when searching.
+        
+        Returns:
+            ProjectPage: The page, with the number of matching projects as .total
+        """
+        if sort not in PROJECT_SORTS:
+            raise ValueError(f"Unknown project sort: {sort}")
+        
+        with self._lock:
+            projects = self._current()
+            if sort not in self._sorted:
+                self._sorted[sort] = sorted(projects, key=_sort_key(sort), reverse=PROJECT_SORTS[sort][1])
+            ordered = self._sorted[sort]
+        
+        return _page_projects(ordered, offset, limit, sort, query, presorted=True)
+    
+    def invalidate(self):
+        """
+        Drop the cached listing after a write.
+        """
+        with self._lock:
+            self._projects = None
+            self._sorted = {}
+            self.stats["invalidations"] += 1
+    
+    def info(self):
+        """
+        Get the cache counters and the number of cached projects.
+        """
+        with self._lock:
+            return dict(self.stats, projects=len(self._projects) if self._projects is not None else 0)
+    
+    def _current(self):
+        # Called with the lock held
+        now = time.monotonic()
+        
+        if self._projects is not None and now - self._checked_at < self.check_interval:
+            self.stats["hits"] += 1
+            return self._projects
+        
+        # Read the token before the listing, so a write in between
+        # causes another reload rather than a stale cache
+        generation = self.store.generation()
+        self._checked_at = now
+        self.stats["checks"] += 1
+        
+        if self._projects is not None and generation is not None and generation == self._generation:
+            self.stats["hits"] += 1
+            return self._projects
+        
+        self._projects = self.store.list()
+        self._sorted = {}
+        self._generation = generation
+        self.stats["loads"] += 1
+        return self._projects
+
+def create_project_store(backend=PROJECT_STORE):
+    """
+    Create a project storage backend.
+    
+    Args:
+        backend (str): "json" or "sqlite"
+        
+    Returns:
+        ProjectStore: The backend
+    """
+    if backend == "sqlite":
+        return SqliteProjectStore()
+    if backend == "json":
+        return JsonProjectStore()
+    raise ValueError(f"Unknown project store: {backend}")
+
+def get_project_store():
+    """
+    Get the process-wide project storage backend selected by PROJECT_STORE.
+    
+    Returns:
+        ProjectStore: The backend
+    """
+    global _project_store
+    
+    if _project_store is None:
+        with _project_store_lock:
+            if _project_store is None:
+                _project_store = create_project_store()
+    
+    return _project_store
+
+def get_project_catalog():
+    """
+    Get the process-wide cached project listing.
+    
+    Returns:
+        ProjectCatalog: The catalog of the store selected by PROJECT_STORE
+    """
+    global _project_catalog
+    
+    if _project_catalog is None:
+        with _project_catalog_lock:
+            if _project_catalog is None:
+                _project_catalog = ProjectCatalog(get_project_store())
+    
+    return _project_catalog
+
+def get_search_index():
+    """
+    Get the process-wide full-text search index of the projects.
+    
+    The first call brings the index up to date with the project store, so
+    projects written while it was not maintained are indexed once.
+    
+    Returns:
+        SearchIndex: The search index
+    """
+    global _search_index
+    
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                search_index = SearchIndex(SEARCH_INDEX_FILE)
+                search_index.sync(get_project_store())
+                _search_index = search_index
+    
+    return _search_index
+
+def _index_project(project_id, project_data=None):
+    # Index a project after a write, or remove it if it no longer exists. A
+    # failure never fails the write; the next sync() picks the project up
+    try:
+        if project_data is None:
+            project_data = get_project_store().load(project_id)
+        if project_data is None:
+            get_search_index().remove(project_id)
+        else:
+            get_search_index().add(project_data)
+    except sqlite3.Error:
+        pass
+
+def migrate_projects(source, target, overwrite=False):
+    """
+    Copy every project from one backend to another, one project at a time.
+    
+    IDs, dates and revision histories are kept, so the migration can be
+    rerun after an interruption; projects already in the target are skipped.
+    
+    Args:
+        source (ProjectStore): The backend to copy from
+        target (ProjectStore): The backend to copy to
+        overwrite (bool): Whether to replace projects that already exist in the target
+        
+    Returns:
+        dict: The number of copied and skipped projects
+    """
+    counts = {"copied": 0, "skipped": 0}
+    
+    for project_data in source.iter_projects():
+        if target.exists(project_data["id"]):
+            if not overwrite:
+                counts["skipped"] += 1
+                continue
+            target.delete(project_data["id"])
+        
+        target.save(project_data)
+        revisions = source.revision_entries(project_data["id"])
+        if revisions:
+            target.replace_revisions(project_data["id"], revisions)
+        counts["copied"] += 1
+    
+    return counts
+
+def rebuild_index():
+    """
+    Rebuild the project index from the stored projects.
+    
+    Returns:
+        int: The number of indexed projects
+    """
+    count = get_project_store().rebuild_index()
+    get_project_catalog().invalidate()
+    return count
+
+def check_index():
+    """
+    Compare the project index with the stored projects.
+    
+    Returns:
+        dict: The IDs of projects missing from the index, of index entries
+            without a project, and of entries whose metadata is stale
+    """
+    return get_project_store().check_index()
+
 def save_project(project_name, html_content, prompt_history=None):
     """
-    Save a project to the projects directory.
+    Save a project to the project store.
     
     Args:
         project_name (str): The name of the project
@@ -35,16 +1342,26 @@ def save_project(project_name, html_content, prompt_history=None):
         "updated_at": datetime.datetime.now().isoformat()
     }
     
-    # Save project to file
-    project_file = os.path.join(PROJECTS_DIR, f"{project_id}.json")
-    with open(project_file, "w") as f:
-        json.dump(project_data, f, indent=2)
+    get_project_store().save(project_data)
+    get_project_catalog().invalidate()
+    _index_project(project_id, project_data)
     
     return project_id
 
+def add_project(project_data):
+    """
+    Store a complete project, keeping its ID and dates, e.g. from an archive.
+    
+    Args:
+        project_data (dict): The project, with the keys returned by load_project()
+    """
+    get_project_store().save(project_data)
+    get_project_catalog().invalidate()
+    _index_project(project_data["id"], project_data)
+
 def load_project(project_id):
     """
-    Load a project from the projects directory.
+    Load a project from the project store.
     
     Args:
         project_id (str): The ID of the project to load
@@ -52,19 +1369,11 @@ def load_project(project_id):
     Returns:
         dict: The project data or None if the project doesn't exist
     """
-    project_file = os.path.join(PROJECTS_DIR, f"{project_id}.json")
-    
-    if not os.path.exists(project_file):
-        return None
-    
-    with open(project_file, "r") as f:
-        project_data = json.load(f)
-    
-    return project_data
+    return get_project_store().load(project_id)
 
 def delete_project(project_id):
     """
-    Delete a project from the projects directory.
+    Delete a project from the project store.
     
     Args:
         project_id (str): The ID of the project to delete
@@ -72,38 +1381,33 @@ def delete_project(project_id):
     Returns:
         bool: True if the project was deleted, False otherwise
     """
-    project_file = os.path.join(PROJECTS_DIR, f"{project_id}.json")
-    
-    if not os.path.exists(project_file):
-        return False
-    
-    os.remove(project_file)
-    return True
+    deleted = get_project_store().delete(project_id)
+    get_project_catalog().invalidate()
+    _index_project(project_id)
+    return deleted
 
-def list_projects():
+def list_projects(offset=0, limit=None, sort="updated", query=None):
     """
-    List all projects in the projects directory.
+    List the projects in the project store, one page at a time.
     
+    Only the metadata is read, never the HTML content or prompt history, and
+    it is served from the process-wide catalog until the projects change.
+    
+    Args:
+        offset (int): The number of matching projects to skip
+        limit (int, optional): The page size; all remaining projects if None
+        sort (str): "updated" or "created" (newest first), "name" or "size" (largest first)
+        query (str, optional): Only list projects whose name contains this, ignoring case
+        
     Returns:
-        list: A list of project data dictionaries
+        ProjectPage: The metadata of the projects on the page (see
+            INDEX_FIELDS), with the number of matching projects as .total
     """
-    projects = []
-    
-    for filename in os.listdir(PROJECTS_DIR):
-        if filename.endswith(".json"):
-            project_file = os.path.join(PROJECTS_DIR, filename)
-            with open(project_file, "r") as f:
-                project_data = json.load(f)
-                projects.append(project_data)
-    
-    # Sort projects by updated_at date (newest first)
-    projects.sort(key=lambda x: x["updated_at"], reverse=True)
-    
-    return projects
+    return get_project_catalog().page(offset, limit, sort, query)
 
 def update_project(project_id, html_content=None, prompt_history=None):
     """
-    Update a project in the projects directory.
+    Update a project in the project store.
     
     Args:
         project_id (str): The ID of the project to update
@@ -113,23 +1417,77 @@ def update_project(project_id, html_content=None, prompt_history=None):
     Returns:
         bool: True if the project was updated, False otherwise
     """
-    project_file = os.path.join(PROJECTS_DIR, f"{project_id}.json")
-    
-    if not os.path.exists(project_file):
-        return False
-    
-    with open(project_file, "r") as f:
-        project_data = json.load(f)
+    updated = get_project_store().update(project_id, html_content, prompt_history)
+    get_project_catalog().invalidate()
+    if updated:
+        _index_project(project_id)
+    return updated
+
+def search_projects(query, offset=0, limit=20):
+    """
+    Search the names, prompt histories, visible text and markup of the projects.
     
-    if html_content is not None:
-        project_data["html_content"] = html_content
+    Args:
+        query (str): The search as typed; every word must match, as a word or a prefix
+        offset (int): The number of results to skip
+        limit (int): The maximum number of results
+        
+    Returns:
+        ProjectPage: The best matches first, each with the project ID, name,
+            update date, a snippet with the matches in bold and a score, and
+            the number of matches as .total
+    """
+    results, total = get_search_index().search(query, offset, limit)
+    return ProjectPage(results, total, offset, limit)
+
+def list_revisions(project_id):
+    """
+    List the revisions of a project's HTML.
     
-    if prompt_history is not None:
-        project_data["prompt_history"] = prompt_history
+    Args:
+        project_id (str): The ID of the project
+        
+    Returns:
+        list: The revision numbers, dates, kinds, hashes and sizes, oldest first
+    """
+    return get_project_store().revisions(project_id)
+
+def checkout_revision(project_id, revision):
+    """
+    Get the HTML of a project as it was at a revision.
     
-    project_data["updated_at"] = datetime.datetime.now().isoformat()
+    Args:
+        project_id (str): The ID of the project
+        revision (int): The revision number
+        
+    Returns:
+        str: The HTML or None if there is no such revision
+    """
+    return get_project_store().checkout(project_id, revision)
+
+def diff_revisions(project_id, old_revision, new_revision):
+    """
+    Compare two revisions of a project's HTML.
     
-    with open(project_file, "w") as f:
-        json.dump(project_data, f, indent=2)
+    Args:
+        project_id (str): The ID of the project
+        old_revision (int): The revision to compare from
+        new_revision (int): The revision to compare to
+        
+    Returns:
+        str: A unified diff, or None if either revision doesn't exist
+    """
+    return get_project_store().diff(project_id, old_revision, new_revision)
+
+def compact_revisions(project_id, keep=None):
+    """
+    Re-encode the revision history of a project, optionally keeping only the latest revisions.
     
-    return True 
\ No newline at end of file
+    Args:
+        project_id (str): The ID of the project
+        keep (int, optional): The number of latest revisions to keep
+        
+    Returns:
+        dict: The number of kept and removed revisions
+    """
+    return get_project_store().compact_revisions(project_id, keep)
@@ -0,0 +1,332 @@
+import os
+import json
+import difflib
+import threading
+from utils.blobs import blob_key
+
+# A full copy of the HTML is stored every REVISION_SNAPSHOT_INTERVAL
+# revisions; the revisions in between are line deltas against their predecessor
+REVISION_SNAPSHOT_INTERVAL = int(os.getenv("REVISION_SNAPSHOT_INTERVAL", "10"))
+
+# Bytes read at a time when looking for the last line of a revision log
+REVISION_TAIL_CHUNK = 8192
+
+def make_delta(old_text, new_text):
+    """
+    Encode a text as a line delta against an older one.
+    
+    Args:
+        old_text (str): The previous text
+        new_text (str): The new text
+        
+    Returns:
+        list: Operations, either [start, end] to copy lines of the old text
+            or a string to insert
+    """
+    old_lines = old_text.splitlines(keepends=True)
+    new_lines = new_text.splitlines(keepends=True)
+    ops = []
+    
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(new_lines[j1:j2]))
+    
+    return ops
+
+def apply_delta(old_text, ops):
+    """
+    Rebuild a text from the text it was encoded against and its delta.
+    """
+    old_lines = old_text.splitlines(keepends=True)
+    return "".join("".join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+def revision_entry(revision, created_at, text, last=None, previous_text=None):
+    """
+    Encode a revision, as a delta against the previous one where that pays off.
+    
+    A snapshot is written for the first revision, every
+    REVISION_SNAPSHOT_INTERVAL revisions, when the previous text does not
+    match the last revision, and when the delta would not be smaller.
+    
+    Args:
+        revision (int): The revision number
+        created_at (str): The ISO date of the revision
+        text (str): The HTML of the revision
+        last (dict, optional): The previous revision entry
+        previous_text (str, optional): The HTML of the previous revision
+        
+    Returns:
+        dict: The revision entry
+    """
+    entry = {
+        "revision": revision,
+        "created_at": created_at,
+        "kind": "snapshot",
+        "base": revision,
+        "hash": blob_key(text),
+        "size": len(text.encode("utf-8")),
+        "data": text
+    }
+    
+    if last is None or previous_text is None or blob_key(previous_text) != last["hash"]:
+        return entry
+    if revision - last["base"] >= REVISION_SNAPSHOT_INTERVAL:
+        return entry
+    
+    ops = make_delta(previous_text, text)
+    if len(json.dumps(ops)) < len(text):
+        entry.update(kind="delta", base=last["base"], data=ops)
+    
+    return entry
+
+def new_revisions(last, previous_text, previous_at, text, created_at):
+    """
+    Get the entries to append to a revision log for a new version of the HTML.
+    
+    Projects saved before revisions were kept get their previous version as
+    the first revision.
+    
+    Args:
+        last (dict): The last revision entry, or None if there is none
+        previous_text (str): The HTML being replaced
+        previous_at (str): The ISO date of the HTML being replaced
+        text (str): The new HTML
+        created_at (str): The ISO date of the new HTML
+        
+    Returns:
+        list: The entries to append
+    """
+    entries = []
+    
+    if last is None:
+        last = revision_entry(1, previous_at, previous_text)
+        entries.append(last)
+    
+    entries.append(revision_entry(last["revision"] + 1, created_at, text, last, previous_text))
+    return entries
+
+def revision_info(entry):
+    """
+    Get the metadata of a revision entry, without its data.
+    """
+    return {key: value for key, value in entry.items() if key != "data"}
+
+def replay(entries, revision):
+    """
+    Check out a revision from the entries of a revision log.
+    
+    Only the entries from the revision's snapshot onwards are applied.
+    
+    Args:
+        entries (list): The revision entries, oldest first
+        revision (int): The revision number
+        
+    Returns:
+        str: The HTML of the revision, or None if there is no such revision
+        
+    Raises:
+        ValueError: If the log does not reproduce the recorded hash, or the
+            data of a snapshot it needs is missing
+    """
+    by_revision = {entry["revision"]: entry for entry in entries}
+    target = by_revision.get(revision)
+    
+    if target is None:
+        return None
+    
+    text = None
+    for number in range(target["base"], revision + 1):
+        entry = by_revision.get(number)
+        if entry is None:
+            raise ValueError(f"Revision {number} is missing from the revision log")
+        if entry["data"] is None:
+            raise ValueError(f"The snapshot of revision {number} is missing")
+        text = entry["data"] if entry["kind"] == "snapshot" else apply_delta(text, entry["data"])
+    
+    if blob_key(text) != target["hash"]:
+        raise ValueError(f"Revision {revision} does not match its recorded hash")
+    
+    return text
+
+def check_entries(entries):
+    """
+    Check that revision entries form a revision log, e.g. one read from an archive.
+    
+    Every entry must have the fields revision_entry() gives it, revision
+    numbers must increase, and every revision must replay to its recorded hash.
+    
+    Args:
+        entries (list): The revision entries, oldest first
+        
+    Raises:
+        ValueError: If an entry is malformed or a revision cannot be checked out
+    """
+    last = 0
+    
+    for entry in entries:
+        if not isinstance(entry, dict) or entry.get("kind") not in ("snapshot", "delta"):
+            raise ValueError("A revision entry has no valid kind")
+        
+        revision = entry.get("revision")
+        base = entry.get("base")
+        if not isinstance(revision, int) or revision <= last:
+            raise ValueError(f"Revision {revision} is out of order")
+        if not isinstance(base, int) or not 0 < base <= revision or (entry["kind"] == "snapshot" and base != revision):
+            raise ValueError(f"Revision {revision} has an invalid base")
+        if not isinstance(entry.get("hash"), str) or not isinstance(entry.get("created_at"), str):
+            raise ValueError(f"Revision {revision} has no hash or date")
+        
+        data = entry.get("data")
+        if entry["kind"] == "snapshot" and not isinstance(data, str):
+            raise ValueError(f"The snapshot of revision {revision} is missing")
+        if entry["kind"] == "delta" and not (isinstance(data, list) and all(
+            isinstance(op, str) or (isinstance(op, list) and len(op) == 2 and all(isinstance(i, int) for i in op))
+            for op in data
+        )):
+            raise ValueError(f"The delta of revision {revision} is malformed")
+        
+        last = revision
+    
+    for entry in entries:
+        replay(entries, entry["revision"])
+
+def rebuild_entries(entries, keep=None):
+    """
+    Re-encode a revision log, optionally keeping only its latest revisions.
+    
+    Redundant snapshots are turned back into deltas and the first kept
+    revision becomes a snapshot. Revision numbers and dates are unchanged.
+    
+    Args:
+        entries (list): The revision entries, oldest first
+        keep (int, optional): The number of latest revisions to keep
+        
+    Returns:
+        list: The new entries
+    """
+    texts = [replay(entries, entry["revision"]) for entry in entries]
+    start = max(len(entries) - keep, 0) if keep else 0
+    rebuilt = []
+    
+    for entry, text, previous_text in zip(entries[start:], texts[start:], [None] + texts[start:]):
+        last = rebuilt[-1] if rebuilt else None
+        rebuilt.append(revision_entry(entry["revision"], entry["created_at"], text, last, previous_text))
+    
+    return rebuilt
+
+class RevisionLog:
+    """
+    A directory of append-only revision logs, one JSON Lines file per project.
+    
+    New revisions are appended to the end of the file, so a write costs the
+    size of its delta. The owner of the log serializes the writers; readers
+    skip a last line that is still being written.
+    """
+    
+    def __init__(self, revisions_dir):
+        self.revisions_dir = revisions_dir
+        os.makedirs(revisions_dir, exist_ok=True)
+    
+    def append(self, project_id, entries):
+        """
+        Append revision entries to a project's log.
+        """
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        
+        with open(self._path(project_id), "a+b") as f:
+            # Start on a new line after an interrupted append
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    lines = "\n" + lines
+            f.write(lines.encode("utf-8"))
+    
+    def entries(self, project_id):
+        """
+        Read every revision entry of a project, oldest first.
+        """
+        entries = []
+        
+        try:
+            with open(self._path(project_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        
+        return entries
+    
+    def last(self, project_id):
+        """
+        Read the last revision entry of a project without reading the whole log.
+        
+        Returns:
+            dict: The entry, or None if the project has no revisions
+        """
+        try:
+            line = self._last_line(self._path(project_id))
+        except OSError:
+            return None
+        
+        try:
+            return json.loads(line) if line else None
+        except ValueError:
+            # An interrupted append; fall back to the last complete entry
+            entries = self.entries(project_id)
+            return entries[-1] if entries else None
+    
+    def write(self, project_id, entries):
+        """
+        Replace a project's log, e.g. after compaction.
+        """
+        path = self._path(project_id)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def delete(self, project_id):
+        """
+        Delete a project's log.
+        """
+        try:
+            os.remove(self._path(project_id))
+        except OSError:
+            pass
+    
+    def project_ids(self):
+        """
+        List the IDs of the projects that have a revision log.
+        """
+        return [filename[:-6] for filename in os.listdir(self.revisions_dir) if filename.endswith(".jsonl")]
+    
+    def _path(self, project_id):
+        return os.path.join(self.revisions_dir, f"{project_id}.jsonl")
+    
+    def _last_line(self, path):
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            tail = b""
+            
+            while position > 0:
+                step = min(REVISION_TAIL_CHUNK, position)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+                newline = tail.rstrip(b"\n").rfind(b"\n")
+                if newline >= 0:
+                    return tail[newline + 1:].strip().decode("utf-8")
+            
+            return tail.strip().decode("utf-8")
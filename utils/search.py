@@ -0,0 +1,292 @@
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from html.parser import HTMLParser
+
+# Seconds a write waits for another session or process to release the index
+SEARCH_INDEX_TIMEOUT = 30
+
+# Relevance weights of the indexed fields: name, prompts, visible text, tag and class names
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+# Words of context around the matches in a result snippet
+SEARCH_SNIPPET_WORDS = 12
+
+# Elements whose content is never shown
+HIDDEN_TAGS = {"script", "style", "noscript", "template"}
+
+# Attributes whose values are shown to or read out for the user
+TEXT_ATTRIBUTES = {"alt", "title", "placeholder", "aria-label"}
+
+# Characters with a meaning in Streamlit markdown: Markdown and HTML syntax,
+# LaTeX, emoji shortcodes and colored text
+MARKDOWN_SPECIAL = re.compile(r"([\\`*_{}\[\]()#+\-.!|<>~$:])")
+
+class SearchTextExtractor(HTMLParser):
+    """
+    Collect the visible text and the tag, class and ID names of an HTML page.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.markup = []
+        self._hidden = 0
+    
+    def handle_starttag(self, tag, attrs):
+        self.markup.append(tag)
+        
+        for name, value in attrs:
+            if not value:
+                continue
+            if name in ("class", "id"):
+                self.markup.append(value)
+            elif name in TEXT_ATTRIBUTES:
+                self.text.append(value)
+        
+        if tag in HIDDEN_TAGS:
+            self._hidden += 1
+    
+    def handle_endtag(self, tag):
+        if tag in HIDDEN_TAGS and self._hidden:
+            self._hidden -= 1
+    
+    def handle_data(self, data):
+        if not self._hidden and data.strip():
+            self.text.append(data.strip())
+
+def extract_search_fields(html_content):
+    """
+    Get the searchable fields of an HTML page.
+    
+    Args:
+        html_content (str): The HTML content
+        
+    Returns:
+        tuple: The visible text and the space-separated tag, class and ID names
+    """
+    extractor = SearchTextExtractor()
+    
+    try:
+        extractor.feed(html_content or "")
+        extractor.close()
+    except Exception:
+        # Keep whatever was parsed before the markup broke off
+        pass
+    
+    return " ".join(extractor.text), " ".join(extractor.markup)
+
+def build_match_query(query):
+    """
+    Turn a user's search into an FTS5 query.
+    
+    Every word must match, as a whole word or a word prefix; FTS5 operators
+    in the search are treated as plain words.
+    
+    Args:
+        query (str): The search as typed
+        
+    Returns:
+        str: The MATCH expression, or None if the search has no words
+    """
+    words = re.findall(r"\w+", (query or "").lower())
+    return " ".join(f'"{word}"*' for word in words) or None
+
+def escape_markdown(text):
+    """
+    Escape text so that Streamlit markdown shows it as typed.
+    
+    Args:
+        text (str): Text from a user or a page, such as a project name
+        
+    Returns:
+        str: The text with every markdown character backslash-escaped
+    """
+    return MARKDOWN_SPECIAL.sub(r"\\\1", text or "")
+
+def snippet_markdown(snippet):
+    """
+    Turn a search snippet into markdown with only its matches in bold.
+    
+    Args:
+        snippet (str): The snippet, with its matches between ** markers
+        
+    Returns:
+        str: The escaped snippet, keeping the ** markers
+    """
+    return "**".join(escape_markdown(part) for part in (snippet or "").split("**"))
+
+class SearchIndex:
+    """
+    A full-text index of projects in a SQLite FTS5 table.
+    
+    Each project is one document with its name, prompt history, visible
+    text and markup names as separately weighted fields, ranked by BM25.
+    Documents are replaced one at a time as projects are saved, updated and
+    deleted; sync() catches up with writes the index missed by comparing
+    the update dates. Each thread has its own connection in WAL mode, so
+    searches run while another session or process writes.
+    
+    Args:
+        path (str): The index database file
+        timeout (float): Seconds a write waits for the database lock
+    """
+    
+    def __init__(self, path, timeout=SEARCH_INDEX_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS search_docs ("
+                "doc_id INTEGER PRIMARY KEY, project_id TEXT NOT NULL UNIQUE, updated_at TEXT NOT NULL)"
+            )
+            db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS project_search USING fts5("
+                "name, prompts, text, markup, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+    
+    def add(self, project_data):
+        """
+        Index a project, replacing its previous document.
+        
+        Args:
+            project_data (dict): The complete project
+        """
+        text, markup = extract_search_fields(project_data.get("html_content"))
+        prompts = "\n".join(project_data.get("prompt_history") or [])
+        
+        with self._transaction() as db:
+            self._remove(db, project_data["id"])
+            doc_id = db.execute(
+                "INSERT INTO search_docs (project_id, updated_at) VALUES (?, ?)",
+                (project_data["id"], project_data["updated_at"])
+            ).lastrowid
+            db.execute(
+                "INSERT INTO project_search (rowid, name, prompts, text, markup) VALUES (?, ?, ?, ?, ?)",
+                (doc_id, project_data["name"], prompts, text, markup)
+            )
+    
+    def remove(self, project_id):
+        """
+        Remove a project from the index.
+        """
+        with self._transaction() as db:
+            self._remove(db, project_id)
+    
+    def search(self, query, offset=0, limit=20):
+        """
+        Find the projects that match a search, best matches first.
+        
+        Args:
+            query (str): The search as typed
+            offset (int): The number of results to skip
+            limit (int): The maximum number of results
+            
+        Returns:
+            tuple: The results (dicts with the project ID, name, score and a
+                snippet with the matches in bold) and the number of matches
+        """
+        match = build_match_query(query)
+        if match is None:
+            return [], 0
+        
+        db = self._connection()
+        total = db.execute("SELECT COUNT(*) FROM project_search WHERE project_search MATCH ?", (match,)).fetchone()[0]
+        rows = db.execute(
+            "SELECT d.project_id, s.name, d.updated_at, "
+            f"snippet(project_search, -1, '**', '**', '…', {SEARCH_SNIPPET_WORDS}), "
+            f"bm25(project_search, {', '.join(str(weight) for weight in SEARCH_WEIGHTS)}) AS score "
+            "FROM project_search s JOIN search_docs d ON d.doc_id = s.rowid "
+            "WHERE project_search MATCH ? ORDER BY score LIMIT ? OFFSET ?",
+            (match, limit, offset)
+        ).fetchall()
+        
+        results = [
+            {"id": row[0], "name": row[1], "updated_at": row[2], "snippet": row[3], "score": -row[4]}
+            for row in rows
+        ]
+        return results, total
+    
+    def sync(self, store):
+        """
+        Bring the index up to date with a project store.
+        
+        Only projects that are new or were updated since they were indexed
+        are loaded; projects that no longer exist are removed.
+        
+        Args:
+            store (ProjectStore): The project store
+            
+        Returns:
+            dict: The number of added, updated and removed documents
+        """
+        indexed = dict(self._connection().execute("SELECT project_id, updated_at FROM search_docs").fetchall())
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        
+        for entry in store.list():
+            updated_at = indexed.pop(entry["id"], None)
+            if updated_at == entry["updated_at"]:
+                continue
+            
+            project_data = store.load(entry["id"])
+            if project_data is None:
+                continue
+            
+            self.add(project_data)
+            counts["added" if updated_at is None else "updated"] += 1
+        
+        for project_id in indexed:
+            self.remove(project_id)
+            counts["removed"] += 1
+        
+        return counts
+    
+    def rebuild(self, store):
+        """
+        Index every project of a store from scratch.
+        
+        Returns:
+            int: The number of indexed projects
+        """
+        with self._transaction() as db:
+            db.execute("DELETE FROM search_docs")
+            db.execute("DELETE FROM project_search")
+        
+        return self.sync(store)["added"]
+    
+    def info(self):
+        """
+        Get the number of indexed projects.
+        """
+        return {"documents": self._connection().execute("SELECT COUNT(*) FROM search_docs").fetchone()[0]}
+    
+    def _remove(self, db, project_id):
+        row = db.execute("SELECT doc_id FROM search_docs WHERE project_id = ?", (project_id,)).fetchone()
+        if row is not None:
+            db.execute("DELETE FROM project_search WHERE rowid = ?", (row[0],))
+            db.execute("DELETE FROM search_docs WHERE doc_id = ?", (row[0],))
+    
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        
+        return db
+    
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
@@ -0,0 +1,294 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from utils.project import PROJECTS_DIR
+from utils.cache import get_response_cache
+from utils.api import extract_html
+
+# Near-duplicate prompt lookup settings
+SIMILARITY_INDEX_FILE = os.path.join(PROJECTS_DIR, ".cache", "similar_prompts.json")
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.8"))
+SIMILARITY_MAX_ENTRIES = int(os.getenv("SIMILARITY_MAX_ENTRIES", "1000"))
+
+# MinHash signature length and LSH banding (NUM_PERMUTATIONS = BANDS * ROWS)
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = 4
+
+# Words per shingle
+SHINGLE_SIZE = 2
+
+# Lookups whose best match is this close below the threshold count as near misses
+NEAR_MISS_MARGIN = 0.1
+
+# Words that do not change what is being asked for
+STOPWORDS = {
+    "a", "an", "the", "for", "of", "to", "and", "with", "in", "on", "my", "me", "i", "please",
+    "create", "make", "build", "generate", "design", "give", "can", "you", "could", "would"
+}
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed, so signatures are stable across processes and restarts
+_random = random.Random(1234)
+_PERMUTATIONS = [(_random.randrange(1, _MERSENNE_PRIME), _random.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+_prompt_index = None
+_prompt_index_lock = threading.Lock()
+
+def normalize_prompt(prompt):
+    """
+    Normalize a prompt for near-duplicate matching.
+    
+    Args:
+        prompt (str): The user's prompt
+        
+    Returns:
+        list: The lowercased words without punctuation and stopwords
+    """
+    words = re.findall(r"[a-z0-9]+", (prompt or "").lower())
+    return [word for word in words if word not in STOPWORDS]
+
+def shingles(words, size=SHINGLE_SIZE):
+    """
+    Get the word shingles of a normalized prompt.
+    
+    Args:
+        words (list): The normalized words
+        size (int): Words per shingle
+        
+    Returns:
+        set: The shingles; prompts shorter than one shingle yield their words
+    """
+    if len(words) < size:
+        return set(words)
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash(shingle_set):
+    """
+    Compute the MinHash signature of a set of shingles.
+    
+    Args:
+        shingle_set (set): The shingles
+        
+    Returns:
+        tuple: NUM_PERMUTATIONS minimum hash values
+    """
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big") for s in shingle_set]
+    if not hashes:
+        return tuple([_MAX_HASH] * NUM_PERMUTATIONS)
+    return tuple(min((a * h + b) % _MERSENNE_PRIME & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS)
+
+def jaccard(first, second):
+    """
+    Get the Jaccard similarity of two sets.
+    """
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+class PromptIndex:
+    """
+    An index of generated prompts for near-duplicate lookups.
+    
+    Prompts are normalized and split into word shingles, whose MinHash
+    signatures are banded into an LSH table. A lookup only compares against
+    the prompts that share a band, and confirms candidates with the exact
+    Jaccard similarity of the shingles. Replies live in the response cache;
+    the index only maps prompts to cache keys.
+    
+    Every entry belongs to the API key that generated it (by its
+    get_concurrency_key() digest), and lookups only match entries of the
+    same key, so one user's prompts and pages are never offered to another.
+    """
+    
+    def __init__(self, path=SIMILARITY_INDEX_FILE, threshold=SIMILARITY_THRESHOLD, max_entries=SIMILARITY_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._best_scores = deque(maxlen=200)
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "near_misses": 0, "accepted": 0, "declined": 0}
+        self._load()
+    
+    def add(self, prompt, cache_key, owner):
+        """
+        Index the prompt of a cached generation.
+        
+        Args:
+            prompt (str): The user's prompt
+            cache_key (str): The response cache key of the reply
+            owner (str): The concurrency key of the API key that generated it
+        """
+        with self._lock:
+            self._insert(prompt, cache_key, owner, time.time())
+            entries = [
+                {"prompt": entry["prompt"], "key": key[1], "owner": key[0], "created_at": entry["created_at"]}
+                for key, entry in self._entries.items()
+            ]
+        
+        self._save(entries)
+    
+    def lookup(self, prompt, owner):
+        """
+        Find a previous generation for a near-identical prompt.
+        
+        Args:
+            prompt (str): The user's prompt
+            owner (str): The concurrency key of the user's API key; only its
+                own generations are matched
+            
+        Returns:
+            dict: The matched prompt, the new prompt, the similarity and the
+                HTML of the previous generation, or None if nothing is
+                similar enough or the reply is no longer cached
+        """
+        query = shingles(normalize_prompt(prompt))
+        candidates = set()
+        
+        with self._lock:
+            for band in self._bands(minhash(query)):
+                candidates.update(key for key in self._buckets.get(band, ()) if key[0] == owner)
+            scored = sorted(
+                ((jaccard(query, self._entries[key]["shingles"]), key) for key in candidates),
+                reverse=True
+            )
+            self.stats["lookups"] += 1
+        
+        best = scored[0][0] if scored else 0.0
+        
+        for similarity, key in scored:
+            if similarity < self.threshold:
+                break
+            
+            reply = get_response_cache().get(key[1])
+            if reply is None:
+                # The reply was evicted from the cache
+                with self._lock:
+                    self._remove(key)
+                continue
+            
+            with self._lock:
+                self.stats["hits"] += 1
+                self._best_scores.append(similarity)
+                matched = self._entries.get(key, {}).get("prompt", "")
+            
+            return {"prompt": matched, "query": prompt, "similarity": similarity, "html": extract_html(reply)}
+        
+        with self._lock:
+            self.stats["misses"] += 1
+            self._best_scores.append(best)
+            if self.threshold - NEAR_MISS_MARGIN <= best < self.threshold:
+                self.stats["near_misses"] += 1
+        
+        return None
+    
+    def record_choice(self, accepted):
+        """
+        Count whether the user took an offered generation or asked for a fresh one.
+        
+        Args:
+            accepted (bool): True if the offer was used
+        """
+        with self._lock:
+            self.stats["accepted" if accepted else "declined"] += 1
+    
+    def info(self):
+        """
+        Get the lookup statistics.
+        
+        Returns:
+            dict: The counters, the hit and acceptance rates, the median best
+                similarity of recent lookups and the number of entries
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            scores = sorted(self._best_scores)
+            stats["entries"] = len(self._entries)
+        
+        offered = stats["accepted"] + stats["declined"]
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["acceptance_rate"] = stats["accepted"] / offered if offered else 0.0
+        stats["median_best_similarity"] = scores[len(scores) // 2] if scores else 0.0
+        stats["threshold"] = self.threshold
+        return stats
+    
+    def _bands(self, signature):
+        return [(band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]) for band in range(LSH_BANDS)]
+    
+    def _insert(self, prompt, cache_key, owner, created_at):
+        # Entries are keyed by owner and cache key; one reply can belong to several owners
+        key = (owner, cache_key)
+        if key in self._entries:
+            self._remove(key)
+        
+        shingle_set = shingles(normalize_prompt(prompt))
+        if not shingle_set:
+            return
+        
+        signature = minhash(shingle_set)
+        self._entries[key] = {"prompt": prompt, "shingles": shingle_set, "signature": signature, "created_at": created_at}
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(key)
+        
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+    
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in self._bands(entry["signature"]):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+    
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", [])
+        except (OSError, ValueError):
+            return
+        
+        # Entries saved before they had an owner cannot be attributed and are dropped
+        for entry in entries:
+            if entry.get("owner"):
+                self._insert(entry["prompt"], entry["key"], entry["owner"], entry.get("created_at", 0))
+    
+    def _save(self, entries):
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": entries}, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+def get_prompt_index():
+    """
+    Get the process-wide near-duplicate prompt index.
+    
+    Returns:
+        PromptIndex: The prompt index
+    """
+    global _prompt_index
+    
+    if _prompt_index is None:
+        with _prompt_index_lock:
+            if _prompt_index is None:
+                _prompt_index = PromptIndex()
+    
+    return _prompt_index
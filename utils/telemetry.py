@@ -0,0 +1,438 @@
+import os
+import re
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Telemetry settings
+TELEMETRY_BUFFER_SIZE = int(os.getenv("TELEMETRY_BUFFER_SIZE", "1000"))
+METRICS_FILE = os.getenv("GENERATION_METRICS_FILE", "")
+METRICS_FILE_INTERVAL = float(os.getenv("GENERATION_METRICS_INTERVAL", "10"))
+METRICS_PORT = int(os.getenv("GENERATION_METRICS_PORT", "0"))
+
+# Roughly 4 characters per token, used when the API reports no usage
+CHARS_PER_TOKEN = 4
+
+# Words and single symbols, see estimate_tokens()
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Quantiles reported by summary() and the Prometheus output
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Timings kept per event, in seconds
+TIMING_FIELDS = ("queue_time", "connect_time", "ttft", "duration")
+
+METRIC_PREFIX = "deepsite"
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+_metrics_server = None
+
+def percentile(values, fraction):
+    """
+    Get a percentile of a list of numbers by nearest rank.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens of a text.
+    
+    Words count as one token per five characters and every other symbol as
+    one token. This errs on the high side, especially for markup, which is
+    the safe side for budgeting.
+    
+    Args:
+        text (str): The text
+        
+    Returns:
+        int: The estimated token count
+    """
+    if not text:
+        return 0
+    return sum((len(piece) + 4) // 5 for piece in _TOKEN_PATTERN.findall(text))
+
+def estimate_prompt_tokens(data):
+    """
+    Estimate the prompt tokens of a chat completion request.
+    
+    Args:
+        data (dict): The request body
+        
+    Returns:
+        int: The estimated token count
+    """
+    return sum(estimate_tokens(message.get("content", "")) for message in data.get("messages", []))
+
+class RequestEvent:
+    """
+    The measurements of one request, filled in while it runs.
+    
+    Args:
+        kind (str): "upstream" for an HTTP request to the API, "generation"
+            for a generation as seen by the app (queueing, coalescing and
+            cache hits included)
+        data (dict): The request body
+    """
+    
+    def __init__(self, kind, data):
+        self.kind = kind
+        self.model = data.get("model")
+        self.start = time.monotonic()
+        self.queue_time = None
+        self.connect_time = None
+        self.ttft = None
+        self.status = None
+        self.bytes_received = 0
+        self.completion_chars = 0
+        self.usage = None
+        self.prompt_tokens = estimate_prompt_tokens(data)
+    
+    def queued(self):
+        """
+        Mark the end of the wait for a generation slot.
+        """
+        self.queue_time = time.monotonic() - self.start
+    
+    def connected(self, status_code):
+        """
+        Mark the arrival of the response headers.
+        """
+        self.connect_time = time.monotonic() - self.start
+        self.status = status_code
+    
+    def received(self, size):
+        """
+        Count bytes read from the response.
+        """
+        self.bytes_received += size
+    
+    def content(self, text):
+        """
+        Count reply text, marking the first token.
+        """
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.start
+        self.completion_chars += len(text)
+    
+    def to_dict(self, outcome):
+        """
+        Build the structured event.
+        
+        Args:
+            outcome (str): "ok", "error", "cancelled" or "abandoned"
+            
+        Returns:
+            dict: The event
+        """
+        usage = self.usage or {}
+        completion_tokens = usage.get("completion_tokens")
+        
+        return {
+            "time": time.time(),
+            "kind": self.kind,
+            "model": self.model,
+            "outcome": outcome,
+            "status": self.status,
+            "queue_time": self.queue_time,
+            "connect_time": self.connect_time,
+            "ttft": self.ttft,
+            "duration": time.monotonic() - self.start,
+            "prompt_tokens": usage.get("prompt_tokens", self.prompt_tokens),
+            "completion_tokens": completion_tokens if completion_tokens is not None else self.completion_chars // CHARS_PER_TOKEN,
+            "tokens_estimated": completion_tokens is None,
+            "bytes_received": self.bytes_received,
+            "cost": usage.get("cost")
+        }
+
+class Telemetry:
+    """
+    A bounded ring buffer of request events with rolling aggregates.
+    
+    Percentiles are computed over the events in the buffer, so they follow
+    recent traffic. Totals, including the sums and counts of the timings,
+    are cumulative since the process started, as Prometheus counters must
+    be. The metrics file is rewritten from a background thread at most
+    every metrics_interval seconds, not on every event.
+    """
+    
+    def __init__(self, max_events=TELEMETRY_BUFFER_SIZE, metrics_file=METRICS_FILE, metrics_interval=METRICS_FILE_INTERVAL):
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._writer = None
+        self.totals = {}
+        self.timing_totals = {}
+    
+    def record(self, event):
+        """
+        Add an event to the buffer and the totals.
+        
+        Args:
+            event (dict): An event built by RequestEvent.to_dict()
+        """
+        with self._lock:
+            self._events.append(event)
+            key = (event["kind"], event["model"], event["outcome"])
+            totals = self.totals.setdefault(key, {"count": 0, "prompt_tokens": 0, "completion_tokens": 0, "bytes_received": 0, "cost": 0.0})
+            totals["count"] += 1
+            totals["prompt_tokens"] += event["prompt_tokens"] or 0
+            totals["completion_tokens"] += event["completion_tokens"] or 0
+            totals["bytes_received"] += event["bytes_received"] or 0
+            totals["cost"] += event["cost"] or 0.0
+            
+            if event["outcome"] == "ok":
+                for field in TIMING_FIELDS:
+                    if event[field] is not None:
+                        timing = self.timing_totals.setdefault((field, event["kind"]), {"sum": 0.0, "count": 0})
+                        timing["sum"] += event[field]
+                        timing["count"] += 1
+            
+            if self.metrics_file and self._writer is None:
+                self._writer = threading.Thread(target=self._write_periodically, name="metrics-file", daemon=True)
+                self._writer.start()
+        
+        self._changed.set()
+    
+    def events(self, kind=None):
+        """
+        Get the buffered events, oldest first.
+        
+        Args:
+            kind (str, optional): Only return events of this kind
+            
+        Returns:
+            list: The events
+        """
+        with self._lock:
+            return [event for event in self._events if kind is None or event["kind"] == kind]
+    
+    def clear(self):
+        """
+        Drop the buffered events. The cumulative totals are kept.
+        """
+        with self._lock:
+            self._events.clear()
+    
+    def summary(self, kind):
+        """
+        Aggregate the buffered events of one kind.
+        
+        Args:
+            kind (str): "upstream" or "generation"
+            
+        Returns:
+            dict: Counts, error rate, token and byte totals, timing
+                percentiles and output tokens per second
+        """
+        events = self.events(kind)
+        finished = [e for e in events if e["outcome"] == "ok"]
+        
+        summary = {
+            "count": len(events),
+            "errors": sum(1 for e in events if e["outcome"] == "error"),
+            "error_rate": sum(1 for e in events if e["outcome"] == "error") / len(events) if events else 0.0,
+            "prompt_tokens": sum(e["prompt_tokens"] or 0 for e in events),
+            "completion_tokens": sum(e["completion_tokens"] or 0 for e in events),
+            "bytes_received": sum(e["bytes_received"] or 0 for e in events),
+            "cost": sum(e["cost"] or 0.0 for e in events)
+        }
+        
+        for field in TIMING_FIELDS:
+            values = [e[field] for e in finished if e[field] is not None]
+            summary[field] = {f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES}
+            summary[field]["count"] = len(values)
+        
+        # Output speed once the first token arrived
+        speeds = [
+            e["completion_tokens"] / (e["duration"] - e["ttft"])
+            for e in finished
+            if e["ttft"] is not None and e["duration"] > e["ttft"] and e["completion_tokens"]
+        ]
+        summary["tokens_per_second"] = {f"p{int(q * 100)}": percentile(speeds, q) for q in QUANTILES}
+        summary["tokens_per_second"]["count"] = len(speeds)
+        
+        return summary
+    
+    def prometheus(self):
+        """
+        Render the metrics in the Prometheus text exposition format.
+        
+        Returns:
+            str: The metrics
+        """
+        with self._lock:
+            totals = {key: dict(value) for key, value in self.totals.items()}
+            timing_totals = {key: dict(value) for key, value in self.timing_totals.items()}
+            events = list(self._events)
+        
+        lines = []
+        
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+        
+        def labels(**values):
+            return ",".join(f'{key}="{_escape_label(value)}"' for key, value in values.items())
+        
+        counters = [
+            ("requests_total", "count", "Requests by kind, model and outcome"),
+            ("prompt_tokens_total", "prompt_tokens", "Prompt tokens sent"),
+            ("completion_tokens_total", "completion_tokens", "Completion tokens received"),
+            ("received_bytes_total", "bytes_received", "Response bytes received"),
+            ("cost_total", "cost", "Cost reported by the API, in credits")
+        ]
+        for name, field, help_text in counters:
+            metric(name, "counter", help_text)
+            for (kind, model, outcome), value in sorted(totals.items(), key=lambda item: tuple(str(part) for part in item[0])):
+                lines.append(f"{METRIC_PREFIX}_{name}{{{labels(kind=kind, model=model, outcome=outcome)}}} {value[field]}")
+        
+        # Quantiles follow the buffered events; _sum and _count are cumulative
+        for field in TIMING_FIELDS:
+            name = f"{field}_seconds"
+            metric(name, "summary", f"{field.replace('_', ' ').capitalize()} of successful requests, quantiles over recent ones")
+            for kind in ("generation", "upstream"):
+                timing = timing_totals.get((field, kind))
+                if timing is None:
+                    continue
+                values = [e[field] for e in events if e["kind"] == kind and e["outcome"] == "ok" and e[field] is not None]
+                for q in QUANTILES:
+                    lines.append(f"{METRIC_PREFIX}_{name}{{{labels(kind=kind, quantile=q)}}} {percentile(values, q):.6f}")
+                lines.append(f"{METRIC_PREFIX}_{name}_sum{{{labels(kind=kind)}}} {timing['sum']:.6f}")
+                lines.append(f"{METRIC_PREFIX}_{name}_count{{{labels(kind=kind)}}} {timing['count']}")
+        
+        return "\n".join(lines) + "\n"
+    
+    def write_file(self, path):
+        """
+        Atomically write the Prometheus metrics to a file, e.g. for the
+        node_exporter textfile collector.
+        
+        Args:
+            path (str): The metrics file
+        """
+        with self._write_lock:
+            temp_path = f"{path}.tmp"
+            try:
+                with open(temp_path, "w") as f:
+                    f.write(self.prometheus())
+                os.replace(temp_path, path)
+            except OSError:
+                # Metrics must never fail a generation
+                pass
+    
+    def _write_periodically(self):
+        # Rewrites the metrics file after events were recorded, at most once per interval
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            self.write_file(self.metrics_file)
+            time.sleep(self.metrics_interval)
+
+def _escape_label(value):
+    # Backslashes, quotes and newlines must be escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+@contextmanager
+def track_request(kind, data, cancel_token=None):
+    """
+    Measure a request and record its event when it ends.
+    
+    The outcome is "ok" on a normal exit, "cancelled" if the request was
+    cancelled, "abandoned" if the consumer stopped reading a stream early and
+    "error" otherwise.
+    
+    Args:
+        kind (str): "upstream" or "generation"
+        data (dict): The request body
+        cancel_token (CancelToken, optional): The token the request can be cancelled with
+        
+    Yields:
+        RequestEvent: The event to fill in
+    """
+    request = RequestEvent(kind, data)
+    outcome = "error"
+    
+    try:
+        yield request
+        outcome = "ok"
+    except GeneratorExit:
+        outcome = "abandoned"
+        raise
+    except BaseException:
+        if cancel_token is not None and cancel_token.cancelled:
+            outcome = "cancelled"
+        raise
+    finally:
+        get_telemetry().record(request.to_dict(outcome))
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_telemetry().prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """
+    Serve the Prometheus metrics on http://host:port/metrics from a
+    background thread. Does nothing if the server is already running.
+    
+    Args:
+        port (int): The port to listen on
+        host (str): The interface to listen on
+        
+    Returns:
+        ThreadingHTTPServer: The metrics server
+    """
+    global _metrics_server
+    
+    with _telemetry_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    
+    return _metrics_server
+
+def get_telemetry():
+    """
+    Get the process-wide telemetry buffer.
+    
+    The metrics server is started on first use if GENERATION_METRICS_PORT is set.
+    
+    Returns:
+        Telemetry: The telemetry buffer
+    """
+    global _telemetry
+    
+    if _telemetry is None:
+        with _telemetry_lock:
+            if _telemetry is None:
+                _telemetry = Telemetry()
+        
+        if METRICS_PORT:
+            try:
+                start_metrics_server(METRICS_PORT)
+            except OSError:
+                # Another process already serves the port
+                pass
+    
+    return _telemetry